@@ -0,0 +1,328 @@
+"""
+benchmark.py
+------------
+Benchmark suite for the online model loop.
+
+Drives `run_iteration` and `SNDModel._evaluate` through the TestInterface against a
+local MLflow file store, and reports per-stage latency percentiles and peak memory as
+JSON, so regressions show up when lcls_beamline_toolbox (or anything else) is bumped.
+
+Run from the src/ directory:
+    python benchmark.py --iterations 50 --output bench.json
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from importlib import metadata
+
+import numpy as np
+
+from interface.test_interface import TestInterface
+from logging_setup import setup_logging
+from metrics import process_rss_bytes
+from mlflow_run import MLflowRun
+from profiling import StageTimer
+from run import pv_mapping, run_iteration
+from model.snd_model import SNDModel
+
+logger = logging.getLogger("benchmark")
+
+# Working-point step used by the re-initialization scenarios, well above the
+# 3.49e-06 rad t1_tth threshold in run_iteration
+T1_TTH_STEP = 1e-05
+
+
+class RSSSampler:
+    """
+    Sample the process RSS on a background thread while a scenario runs.
+
+    ru_maxrss is a process-wide high-water mark, so after the first scenario it keeps
+    reporting the earlier peak; sampling gives each scenario its own peak.
+
+    Parameters
+    ----------
+    interval : float, optional
+        Sampling interval in seconds (default is 0.01).
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start_bytes = float("nan")
+        self.peak_bytes = float("nan")
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.start_bytes = self.peak_bytes = process_rss_bytes()
+        self.thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop_event.set()
+        self.thread.join()
+        self._sample()
+
+    def _sample(self):
+        self.peak_bytes = max(self.peak_bytes, process_rss_bytes())
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self._sample()
+
+    def result(self):
+        """Return the RSS at the start, the peak and the peak increase, in MB."""
+        return {
+            "rss_start_mb": self.start_bytes / 1e6,
+            "peak_rss_mb": self.peak_bytes / 1e6,
+            "peak_rss_delta_mb": (self.peak_bytes - self.start_bytes) / 1e6,
+        }
+
+
+class PinnedTestInterface(TestInterface):
+    """
+    TestInterface that returns fixed values for some inputs, e.g. to hold or step the
+    working point (t1_tth, delay) while the other inputs are drawn at random.
+
+    Parameters
+    ----------
+    pinned : dict
+        Mapping of input names to the values to return for them. May be updated
+        between iterations.
+    """
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+
+    def get_input_variables(self, input_variables: list) -> dict:
+        values = super().get_input_variables(input_variables)
+        for name in values.keys() & self.pinned.keys():
+            values[name] = self.pinned[name]
+        return values
+
+
+def default_value(snd_model, name):
+    return snd_model.input_variables[snd_model.input_names.index(name)].default_value
+
+
+def run_loop_scenario(snd_model, iterations, working_point):
+    """
+    Time `iterations` calls of run_iteration with the test interface.
+
+    Parameters
+    ----------
+    snd_model : SNDModel
+        The model to evaluate.
+    iterations : int
+        Number of iterations.
+    working_point : callable
+        Called with the iteration index, returns the t1_tth to pin for it.
+
+    Returns
+    -------
+    StageTimer
+        Timer holding the per-stage durations.
+    """
+    timer = StageTimer()
+    snd_model.set_stage_timer(timer)
+    interface = PinnedTestInterface({"delay": default_value(snd_model, "delay")})
+    for i in range(iterations):
+        interface.pinned["t1_tth"] = working_point(i)
+        with timer.stage("iteration"):
+            run_iteration(
+                snd_model, interface, snd_model.input_variables, "test", timer=timer
+            )
+    snd_model.set_stage_timer(None)
+    return timer
+
+
+def run_evaluate_scenario(snd_model, iterations):
+    """Time `iterations` direct calls of SNDModel._evaluate with random motor inputs."""
+    timer = StageTimer()
+    snd_model.set_stage_timer(timer)
+    interface = TestInterface()
+    for _ in range(iterations):
+        input_dict = interface.get_input_variables(snd_model.input_variables)
+        for name in ("t1_tth", "delay"):
+            input_dict[name] = default_value(snd_model, name)
+        with timer.stage("iteration"):
+            snd_model._evaluate(input_dict)
+    snd_model.set_stage_timer(None)
+    return timer
+
+
+def run_fidelity_sweep(snd_model, iterations):
+    """
+    Compare the latency and accuracy of each fidelity level against full fidelity.
+
+    Every level evaluates the same `iterations` random motor configurations at the
+    default working point, propagating both branches without memo or surrogate.
+
+    Returns
+    -------
+    dict
+        For each level, the latency summary of its evaluations, the estimated memory
+        of its cached SND instances and, for each output, the maximum and RMS absolute
+        deviation from full fidelity.
+    """
+    interface = TestInterface()
+    inputs = []
+    for _ in range(iterations):
+        input_dict = interface.get_input_variables(snd_model.input_variables)
+        for name in ("t1_tth", "delay"):
+            input_dict[name] = default_value(snd_model, name)
+        inputs.append(input_dict)
+
+    outputs = {}
+    results = {}
+    # Full fidelity first, as the reference
+    levels = ["full"] + [level for level in snd_model.fidelity_levels if level != "full"]
+    for level in levels:
+        timer = StageTimer()
+        values = []
+        for input_dict in inputs:
+            with timer.stage("evaluate"):
+                output = snd_model._evaluate(input_dict, fidelity=level)
+            values.append([output[name] for name in snd_model.output_names])
+        outputs[level] = np.array(values)
+        deviation = np.abs(outputs[level] - outputs["full"])
+        results[level] = {
+            "stages": timer.summary(),
+            "snd_cache_mb": snd_model.snd_caches[level].nbytes / 1e6,
+            "errors": {
+                name: {
+                    "max_abs": float(deviation[:, j].max()),
+                    "rms": float(np.sqrt(np.mean(deviation[:, j] ** 2))),
+                }
+                for j, name in enumerate(snd_model.output_names)
+            },
+        }
+    return results
+
+
+def scenarios(snd_model, iterations):
+    """Yield (name, callable returning a StageTimer) for each benchmark scenario."""
+    base = default_value(snd_model, "t1_tth")
+    yield "evaluate", lambda: run_evaluate_scenario(snd_model, iterations)
+    # Working point held fixed: no re-initialization
+    yield "steady", lambda: run_loop_scenario(
+        snd_model, iterations, lambda i: default_value(snd_model, "t1_tth")
+    )
+    # New working point every iteration: every re-initialization builds a new SND
+    yield "reinit", lambda: run_loop_scenario(
+        snd_model, iterations, lambda i: base + (i + 1) * T1_TTH_STEP
+    )
+    # Operators stepping between two working points: re-initializations hit the SND cache
+    yield "reinit_cached", lambda: run_loop_scenario(
+        snd_model, iterations, lambda i: base + (i % 2) * T1_TTH_STEP
+    )
+
+
+def package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def main():
+    """
+    Run the benchmark scenarios and write the results as JSON.
+
+    You can run the script with:
+        python benchmark.py
+        python benchmark.py --iterations 100 --scenario steady --output bench.json
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the SND online model loop.")
+    parser.add_argument("--iterations", "-n", type=int, default=50)
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        help="Scenario to run, may be repeated; 'fidelity' runs the accuracy/latency "
+        "sweep over fidelity levels (default: all)",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Report peak Python/numpy allocations with tracemalloc (slows the run)",
+    )
+    parser.add_argument("--output", "-o", help="Write JSON results here instead of stdout")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    # Log like run.py, per-iteration records included, but into a scratch directory
+    log_dir = tempfile.TemporaryDirectory()
+    listener = setup_logging(
+        os.path.join(log_dir.name, "snd_run.log"),
+        os.path.join(log_dir.name, "snd_iterations.jsonl"),
+        level=args.log_level,
+    )
+
+    results = {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "versions": {
+            name: package_version(name)
+            for name in ("lcls_beamline_toolbox", "lume-model", "mlflow", "numpy")
+        },
+        "iterations": args.iterations,
+        "scenarios": {},
+    }
+
+    start = time.perf_counter()
+    snd_model = SNDModel("model/snd_model.yml")
+    snd_model.pv_map = pv_mapping()
+    results["model_init_s"] = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmpdir, MLflowRun(
+        tracking_uri=f"file:{tmpdir}/mlruns", experiment_name="snd-benchmark"
+    ):
+        for name, scenario in scenarios(snd_model, args.iterations):
+            if args.scenario and name not in args.scenario:
+                continue
+            logger.warning("Running scenario %s.", name)
+            if args.trace_memory:
+                tracemalloc.start()
+            with RSSSampler() as rss:
+                timer = scenario()
+            result = {"stages": timer.summary(), "counts": dict(timer.counts)}
+            result.update(rss.result())
+            if args.trace_memory:
+                result["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+            # ru_maxrss is in kB on Linux; a process-wide high-water mark, so it
+            # includes earlier scenarios
+            result["process_max_rss_mb"] = (
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+            )
+            results["scenarios"][name] = result
+
+        if not args.scenario or "fidelity" in args.scenario:
+            logger.warning("Running fidelity sweep.")
+            results["fidelity"] = run_fidelity_sweep(snd_model, args.iterations)
+
+    results["snd_cache"] = snd_model.snd_cache.stats()
+    snd_model.close_pool()
+    atexit.unregister(listener.stop)
+    listener.stop()
+    log_dir.cleanup()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,39 @@
+import collections
 import os
+import threading
+import time
 import epics
+import numpy as np
 
 
 class EPICSInterface:
-    """Interface for interacting with EPICS Process Variables (PVs)."""
+    """
+    Interface for interacting with EPICS Process Variables (PVs).
 
-    def __init__(self, pv_name_list=None):
+    By default every call to `get_input_variables` connects to and reads each PV in turn.
+    In monitor mode a CA monitor is subscribed on every PV once, the latest value and
+    timestamp per PV are kept in arrays, and `get_input_variables` returns a snapshot
+    of them without any network round-trip.
+
+    Parameters
+    ----------
+    pv_name_list : list of str, optional
+        PV names to create PV objects (or monitors) for.
+    monitor : bool, optional
+        Whether to use CA monitors instead of blocking gets (default is False).
+    max_age : float, optional
+        In monitor mode, flag a PV as stale when its timestamp is older than this many
+        seconds (default is None, no age limit). Note that readbacks of motors that are
+        not moving only update on change.
+
+    Attributes
+    ----------
+    on_change : callable or None
+        In monitor mode, called with no arguments after every value update, e.g. to
+        trigger an iteration of the model.
+    """
+
+    def __init__(self, pv_name_list=None, monitor=False, max_age=None):
         """Check environment variables."""
         if "EPICS_CA_ADDR_LIST" not in os.environ:
             raise EnvironmentError(
@@ -16,12 +44,18 @@ class EPICSInterface:
                 "EPICS_CA_AUTO_ADDR_LIST environment variable is not set."
             )
         self.pv_objects = None
+        self.monitor = monitor
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.on_change = None
+        self.connection_failures = collections.Counter()
+        self.last_timestamps = {}
         if pv_name_list is not None:
             self.create_pvs(pv_name_list)
 
     def create_pvs(self, pv_name_list):
         """
-        Create a list of PV objects.
+        Create a list of PV objects. In monitor mode, also subscribe to a CA monitor on each PV.
 
         Parameters
         ----------
@@ -33,7 +67,74 @@ class EPICSInterface:
         list
             A dict of EPICS PV objects.
         """
-        self.pv_objects = {name: epics.PV(name) for name in pv_name_list}
+        if not self.monitor:
+            self.pv_objects = {name: epics.PV(name) for name in pv_name_list}
+            return
+
+        self.pv_index = {name: i for i, name in enumerate(pv_name_list)}
+        self.values = np.full(len(pv_name_list), np.nan)
+        self.timestamps = np.zeros(len(pv_name_list))
+        self.connected = np.zeros(len(pv_name_list), dtype=bool)
+        self.pv_objects = {
+            name: epics.PV(
+                name,
+                auto_monitor=True,
+                callback=self._on_value,
+                connection_callback=self._on_connection,
+            )
+            for name in pv_name_list
+        }
+
+    def _on_value(self, pvname=None, value=None, timestamp=None, **kwargs):
+        """CA monitor callback: store the latest value and timestamp of a PV."""
+        idx = self.pv_index[pvname]
+        with self.lock:
+            self.values[idx] = value
+            self.timestamps[idx] = timestamp if timestamp is not None else time.time()
+        if self.on_change is not None:
+            self.on_change()
+
+    def _on_connection(self, pvname=None, conn=None, **kwargs):
+        """CA connection callback: track the connection state of a PV."""
+        with self.lock:
+            self.connected[self.pv_index[pvname]] = bool(conn)
+        if not conn:
+            self.connection_failures[pvname] += 1
+
+    def get_monitored_variables(self, input_pvs: list) -> dict:
+        """
+        Return a consistent snapshot of the monitored PVs.
+
+        Parameters
+        ----------
+        input_pvs : list of str
+            List of EPICS PV names to return values for.
+
+        Returns
+        -------
+        dict
+            Dictionary mapping PV names to their latest value, POSIX timestamp, and
+            ``connected``/``stale`` flags. A PV is stale when it is disconnected, has
+            not delivered a value yet (its value is NaN), or is older than `max_age`.
+        """
+        with self.lock:
+            values = self.values.copy()
+            timestamps = self.timestamps.copy()
+            connected = self.connected.copy()
+        stale = ~connected | np.isnan(values)
+        if self.max_age is not None:
+            stale |= time.time() - timestamps > self.max_age
+
+        results = {}
+        for pv in input_pvs:
+            idx = self.pv_index[pv]
+            results[pv] = {
+                "value": values[idx],
+                "posixseconds": timestamps[idx],
+                "connected": bool(connected[idx]),
+                "stale": bool(stale[idx]),
+            }
+        return results
 
     def get_input_variables(self, input_pvs: list) -> dict:
         """
@@ -48,7 +149,11 @@ class EPICSInterface:
         -------
         dict
             Dictionary mapping PV names to their values and POSIX timestamps, or error info if retrieval fails.
+            In monitor mode, see `get_monitored_variables`.
         """
+        if self.monitor:
+            return self.get_monitored_variables(input_pvs)
+
         results = {}
         for pv in input_pvs:
             pv = self.pv_objects[pv]
@@ -59,11 +164,47 @@ class EPICSInterface:
 
                     # Extract value and timestamp
                     value = pv.get()
+                    if value is None or time_data is None:
+                        results[pv.pvname] = {"error": "No value"}
+                        self.connection_failures[pv.pvname] += 1
+                        continue
                     timestamp = time_data["posixseconds"]
 
                     results[pv.pvname] = {"value": value, "posixseconds": timestamp}
+                    self.last_timestamps[pv.pvname] = timestamp
                 else:
                     results[pv.pvname] = {"error": "Connection failed"}
+                    self.connection_failures[pv.pvname] += 1
             except Exception as e:
                 results[pv.pvname] = {"error": str(e)}
+                self.connection_failures[pv.pvname] += 1
         return results
+
+    def pv_status(self) -> dict:
+        """
+        Return the health of each PV, e.g. for the metrics endpoint.
+
+        Returns
+        -------
+        dict
+            Dictionary mapping PV names to their ``age`` (seconds since the PV's
+            timestamp, NaN if never read), ``connected`` flag and number of connection
+            ``failures`` so far.
+        """
+        now = time.time()
+        status = {}
+        for name, pv in self.pv_objects.items():
+            if self.monitor:
+                with self.lock:
+                    idx = self.pv_index[name]
+                    timestamp = self.timestamps[idx] if not np.isnan(self.values[idx]) else None
+                    connected = bool(self.connected[idx])
+            else:
+                timestamp = self.last_timestamps.get(name)
+                connected = bool(pv.connected)
+            status[name] = {
+                "age": np.nan if timestamp is None else now - timestamp,
+                "connected": connected,
+                "failures": self.connection_failures[name],
+            }
+        return status
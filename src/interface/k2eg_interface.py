@@ -1,33 +1,63 @@
-import k2eg
-from k2eg.serialization import Scalar
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
 
 
 class K2EGInterface:
     """
     A class to interface with K2EG for reading and writing process variables (PVs).
 
+    `get_input_variables` issues the gets of all requested PVs concurrently, so reading
+    a snapshot takes about as long as the slowest PV rather than the sum of all
+    round-trips.
+
     Attributes
     ----------
     k2eg_client : k2eg.dml
         The K2EG client used to interact with the K2EG system.
     """
 
-    def __init__(self, environment_id: str, app_name: str):
+    def __init__(
+        self,
+        environment_id: str = "lcls",
+        app_name: str = "snd-online-model",
+        pv_name_list: list = None,
+        client=None,
+        max_workers: int = 32,
+    ):
         """
         Initializes the K2EGInterface with a K2EG client.
 
         Parameters
         ----------
-        environment_id : str
-            The environment ID for the K2EG client (e.g., 'lcls').
-        app_name : str
-            The application name for the K2EG client (e.g., 'app-three').
+        environment_id : str, optional
+            The environment ID for the K2EG client (default is 'lcls').
+        app_name : str, optional
+            The application name for the K2EG client (default is 'snd-online-model').
+        pv_name_list : list of str, optional
+            PVs that will be read, reported by `pv_status` before their first read.
+        client : object, optional
+            Client with the ``get(pv_uri, timeout)``, ``put(pv_uri, value, timeout)``
+            and ``close()`` methods of ``k2eg.dml``, e.g. a local stand-in for testing
+            (default is a ``k2eg.dml`` client for `environment_id` and `app_name`).
+        max_workers : int, optional
+            Maximum number of concurrent gets (default is 32).
         """
-        self.k2eg_client = k2eg.dml(environment_id, app_name)
+        if client is None:
+            import k2eg
 
-    def get_pv(
-        self, pv_name: str, timeout: float = 5.0, proto: str = "ca://"
-    ) -> Scalar:
+            client = k2eg.dml(environment_id, app_name)
+        self.k2eg_client = client
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="k2eg-get")
+        self.lock = threading.Lock()
+        self.connection_failures = collections.Counter()
+        self.last_timestamps = dict.fromkeys(pv_name_list or ())
+        self.connected = dict.fromkeys(pv_name_list or (), False)
+
+    def get_pv(self, pv_name: str, timeout: float = 5.0, proto: str = "ca://"):
         """
         Retrieves the value of a process variable (PV) from K2EG.
 
@@ -48,6 +78,39 @@ class K2EGInterface:
         """
         return self.k2eg_client.get(proto + pv_name, timeout)["value"]
 
+    def get_pv_with_timestamp(
+        self, pv_name: str, timeout: float = 5.0, proto: str = "ca://"
+    ) -> dict:
+        """
+        Retrieves the value and POSIX timestamp of a process variable (PV) from K2EG.
+
+        Parameters
+        ----------
+        pv_name : str
+            The name of the process variable to retrieve.
+        timeout : float, optional
+            The maximum time to wait for the PV value (default is 5.0 seconds).
+        proto : str, optional
+            The protocol to use for the PV (default is 'ca://').
+
+        Returns
+        -------
+        dict
+            Dictionary with the ``value`` and ``posixseconds`` of the PV. The timestamp
+            is the time of the read if K2EG does not report one.
+        """
+        reply = self.k2eg_client.get(proto + pv_name, timeout)
+        if reply is None:
+            raise TimeoutError(f"No reply within {timeout} s")
+        time_stamp = reply.get("timeStamp") or {}
+        if "secondsPastEpoch" in time_stamp:
+            posixseconds = (
+                time_stamp["secondsPastEpoch"] + time_stamp.get("nanoseconds", 0) * 1e-9
+            )
+        else:
+            posixseconds = time.time()
+        return {"value": reply["value"], "posixseconds": posixseconds}
+
     def put_pv(
         self,
         pv_name: str,
@@ -71,6 +134,8 @@ class K2EGInterface:
             The protocol to use for the PV (default is 'ca://', which stands for Channel Access).
             Other options include 'pva://' for Process Variable Access.
         """
+        from k2eg.serialization import Scalar
+
         if type == "scalar":
             if not isinstance(value, float):
                 raise TypeError("Value must be an instance of Scalar.")
@@ -83,30 +148,74 @@ class K2EGInterface:
 
         self.k2eg_client.put(proto + pv_name, serialized_value, timeout)
 
-    def get_input_variables(self, input_pvs: list) -> dict:
+    def get_input_variables(self, input_pvs: list, timeout: float = 5.0) -> dict:
         """
-        Retrieves the input variables from K2EG.
+        Retrieve values and timestamps for a list of input PVs, concurrently.
 
         Parameters
         ----------
-        input_pvs : list
-            A list of input variable names to retrieve.
+        input_pvs : list of str
+            List of PV names to retrieve values for.
+        timeout : float, optional
+            The maximum time to wait for each PV value (default is 5.0 seconds). All
+            gets run at the same time, so this also bounds the whole call.
+
+        Returns
+        -------
+        dict
+            Dictionary mapping PV names to their values and POSIX timestamps, or error
+            info if retrieval fails, in the same form as EPICSInterface.
+        """
+        futures = {
+            pv: self.executor.submit(self.get_pv_with_timestamp, pv, timeout)
+            for pv in input_pvs
+        }
+        # Leave the client its own timeout before giving up on a get
+        wait(futures.values(), timeout=timeout + 1.0)
+
+        results = {}
+        with self.lock:
+            for pv, future in futures.items():
+                if not future.done():
+                    future.cancel()
+                    results[pv] = {"error": "Timed out"}
+                elif future.exception() is not None:
+                    results[pv] = {"error": str(future.exception())}
+                else:
+                    results[pv] = future.result()
+                    self.last_timestamps[pv] = results[pv]["posixseconds"]
+                    self.connected[pv] = True
+                    continue
+                self.connection_failures[pv] += 1
+                self.last_timestamps.setdefault(pv, None)
+                self.connected[pv] = False
+        return results
+
+    def pv_status(self) -> dict:
+        """
+        Return the health of each PV read so far, e.g. for the metrics endpoint.
 
         Returns
         -------
         dict
-            A dictionary containing the input variable names and their values.
+            Dictionary mapping PV names to their ``age`` (seconds since the PV's
+            timestamp, NaN if never read), ``connected`` flag (whether the last read
+            succeeded) and number of failed reads so far.
         """
-        input_dict = {}
-        for var in input_pvs:
-            try:
-                input_dict[var] = self.get_pv(var)
-            except Exception as e:
-                raise RuntimeError(f"Failed to get PV {var}: {e}")
-        return input_dict
+        now = time.time()
+        with self.lock:
+            return {
+                name: {
+                    "age": np.nan if timestamp is None else now - timestamp,
+                    "connected": self.connected[name],
+                    "failures": self.connection_failures[name],
+                }
+                for name, timestamp in self.last_timestamps.items()
+            }
 
     def close(self):
         """
         Closes the K2EG client connection.
         """
+        self.executor.shutdown(wait=False, cancel_futures=True)
         self.k2eg_client.close()
@@ -0,0 +1,276 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotFile:
+    """
+    Append-only columnar file of PV snapshots.
+
+    A snapshot file is a directory holding the PV names in ``pvs.json`` and one raw
+    binary file per field (``value.f8``, ``posixseconds.f8``, ``connected.u1``,
+    ``stale.u1``). Each field file is a row-major array of shape (n_snapshots, n_pvs),
+    so it can be appended to one row at a time and memory-mapped for reading.
+    Recordings made before the ``stale`` field existed read as never stale.
+    """
+
+    FIELDS = {
+        "value": np.float64,
+        "posixseconds": np.float64,
+        "connected": np.uint8,
+        "stale": np.uint8,
+    }
+    EXTENSIONS = {"value": "f8", "posixseconds": "f8", "connected": "u1", "stale": "u1"}
+    # Fields that older recordings may lack
+    OPTIONAL_FIELDS = ("stale",)
+
+    @classmethod
+    def field_path(cls, path, field):
+        return os.path.join(path, f"{field}.{cls.EXTENSIONS[field]}")
+
+    @classmethod
+    def read_pvs(cls, path):
+        with open(os.path.join(path, "pvs.json"), "r") as file:
+            return json.load(file)["pvs"]
+
+    @classmethod
+    def complete_rows(cls, path, n_pvs):
+        """
+        Return the number of complete rows of every field file present.
+
+        Parameters
+        ----------
+        path : str
+            Snapshot file directory.
+        n_pvs : int
+            Number of PVs per row.
+
+        Returns
+        -------
+        dict
+            Mapping of field name to number of complete rows, for the field files
+            that exist.
+        """
+        rows = {}
+        for field, dtype in cls.FIELDS.items():
+            field_path = cls.field_path(path, field)
+            if os.path.exists(field_path):
+                row_bytes = np.dtype(dtype).itemsize * n_pvs
+                rows[field] = os.path.getsize(field_path) // row_bytes
+        return rows
+
+    @classmethod
+    def repair(cls, path, n_pvs):
+        """
+        Make every field file hold the same number of complete rows, before appending.
+
+        A recording interrupted mid-row, e.g. by a crash, can leave a partial last row
+        or fewer rows in some field files; appending to it would misalign every later
+        row. Field files are truncated to the rows complete in all of them, and a
+        missing optional field is created with zeros for those rows.
+
+        Parameters
+        ----------
+        path : str
+            Snapshot file directory.
+        n_pvs : int
+            Number of PVs per row.
+
+        Returns
+        -------
+        int
+            The number of rows kept.
+        """
+        rows = cls.complete_rows(path, n_pvs)
+        # A missing required field has no rows; a missing optional one is recreated
+        n_rows = min(
+            rows.get(field, 0)
+            for field in cls.FIELDS
+            if field in rows or field not in cls.OPTIONAL_FIELDS
+        )
+        for field, dtype in cls.FIELDS.items():
+            field_path = cls.field_path(path, field)
+            row_bytes = np.dtype(dtype).itemsize * n_pvs
+            if field in rows:
+                with open(field_path, "r+b") as file:
+                    file.truncate(n_rows * row_bytes)
+            else:
+                with open(field_path, "wb") as file:
+                    file.write(np.zeros((n_rows, n_pvs), dtype=dtype).tobytes())
+        return n_rows
+
+    @classmethod
+    def open(cls, path):
+        """
+        Memory-map the fields of a snapshot file.
+
+        Parameters
+        ----------
+        path : str
+            Snapshot file directory.
+
+        Returns
+        -------
+        tuple of (list of str, dict)
+            PV names, and a dict of field name to read-only array of shape
+            (n_snapshots, n_pvs). A partially written last row is ignored.
+        """
+        pvs = cls.read_pvs(path)
+        arrays = {}
+        for field, dtype in cls.FIELDS.items():
+            field_path = cls.field_path(path, field)
+            if field in cls.OPTIONAL_FIELDS and not os.path.exists(field_path):
+                continue
+            if os.path.getsize(field_path) == 0:
+                # np.memmap cannot map an empty file
+                data = np.zeros(0, dtype=dtype)
+            else:
+                data = np.memmap(field_path, dtype=dtype, mode="r")
+            arrays[field] = data[: len(data) // len(pvs) * len(pvs)].reshape(-1, len(pvs))
+        n_rows = min(len(a) for a in arrays.values())
+        for field in cls.OPTIONAL_FIELDS:
+            if field not in arrays:
+                arrays[field] = np.zeros((n_rows, len(pvs)), dtype=cls.FIELDS[field])
+        return pvs, {field: a[:n_rows] for field, a in arrays.items()}
+
+
+class RecordingInterface:
+    """
+    Wraps an interface and appends every snapshot it returns to a snapshot file.
+
+    The value, timestamp, ``connected`` and ``stale`` flags of each PV are recorded;
+    any other fields of the snapshot are not.
+
+    Parameters
+    ----------
+    interface : object
+        Interface returning ``{pv: {"value": ..., "posixseconds": ...}}`` snapshots,
+        e.g. EPICSInterface.
+    path : str
+        Snapshot file directory. Created if needed; appended to if it already holds
+        a recording of the same PVs, after dropping any partially written last row.
+    pv_name_list : list of str
+        PV names to record, in column order.
+    """
+
+    def __init__(self, interface, path, pv_name_list):
+        self.interface = interface
+        self.path = path
+        self.pvs = list(pv_name_list)
+        os.makedirs(path, exist_ok=True)
+        pvs_path = os.path.join(path, "pvs.json")
+        if os.path.exists(pvs_path):
+            if SnapshotFile.read_pvs(path) != self.pvs:
+                raise ValueError(f"Snapshot file {path} was recorded with different PVs.")
+        else:
+            with open(pvs_path, "w") as file:
+                json.dump({"pvs": self.pvs}, file)
+        n_rows = SnapshotFile.repair(path, len(self.pvs))
+        if n_rows:
+            logger.info(f"Appending to {n_rows} snapshots recorded in {path}.")
+        self.files = {
+            field: open(SnapshotFile.field_path(path, field), "ab")
+            for field in SnapshotFile.FIELDS
+        }
+
+    def get_input_variables(self, input_pvs: list) -> dict:
+        """
+        Retrieve a snapshot from the wrapped interface and record it.
+
+        Parameters
+        ----------
+        input_pvs : list of str
+            List of PV names to retrieve values for.
+
+        Returns
+        -------
+        dict
+            The snapshot returned by the wrapped interface, unchanged.
+        """
+        results = self.interface.get_input_variables(input_pvs)
+        self.write(results)
+        return results
+
+    def write(self, results):
+        """Append one snapshot row. PVs that failed or are missing are recorded as NaN."""
+        rows = {
+            field: np.zeros(len(self.pvs), dtype=dtype)
+            for field, dtype in SnapshotFile.FIELDS.items()
+        }
+        for i, pv in enumerate(self.pvs):
+            d = results.get(pv, {})
+            ok = "value" in d and "error" not in d and d.get("connected", True)
+            rows["value"][i] = d["value"] if "value" in d else np.nan
+            rows["posixseconds"][i] = d.get("posixseconds", np.nan)
+            rows["connected"][i] = ok
+            rows["stale"][i] = bool(d.get("stale", False))
+        for field, file in self.files.items():
+            file.write(rows[field].tobytes())
+            file.flush()
+
+    def close(self):
+        """Close the snapshot file."""
+        for file in self.files.values():
+            file.close()
+
+
+class ReplayInterface:
+    """
+    Interface that streams snapshots back from a snapshot file, one per call, as fast
+    as they are requested.
+
+    Parameters
+    ----------
+    path : str
+        Snapshot file directory written by RecordingInterface.
+    start : int, optional
+        Index of the first snapshot to replay (default is 0).
+    stop : int, optional
+        Index one past the last snapshot to replay (default is the end of the file).
+    """
+
+    def __init__(self, path, start=0, stop=None):
+        self.pvs, self.arrays = SnapshotFile.open(path)
+        self.pv_index = {pv: i for i, pv in enumerate(self.pvs)}
+        self.position = start
+        self.stop = len(self.arrays["value"]) if stop is None else stop
+
+    def get_input_variables(self, input_pvs: list) -> dict:
+        """
+        Return the next recorded snapshot.
+
+        Parameters
+        ----------
+        input_pvs : list of str
+            List of PV names to return values for. Must all be in the recording.
+
+        Returns
+        -------
+        dict
+            Dictionary mapping PV names to their recorded value, POSIX timestamp and
+            ``connected`` and ``stale`` flags, in the same shape as EPICSInterface in
+            monitor mode.
+
+        Raises
+        ------
+        EOFError
+            When all snapshots have been replayed.
+        """
+        if self.position >= self.stop:
+            raise EOFError("End of snapshot file reached.")
+        row = self.position
+        self.position += 1
+        results = {}
+        for pv in input_pvs:
+            idx = self.pv_index[pv]
+            results[pv] = {
+                "value": float(self.arrays["value"][row, idx]),
+                "posixseconds": float(self.arrays["posixseconds"][row, idx]),
+                "connected": bool(self.arrays["connected"][row, idx]),
+                "stale": bool(self.arrays["stale"][row, idx]),
+            }
+        return results
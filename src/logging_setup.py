@@ -0,0 +1,177 @@
+"""
+logging_setup.py
+----------------
+Non-blocking logging for the model loop.
+
+Log records are put on an in-process queue by the calling thread and formatted and
+written by a listener thread, to size-rotated files and the console. Per-iteration
+inputs and outputs go to a separate JSON-lines file, one line per iteration.
+
+Classes
+-------
+LazyQueueHandler
+    QueueHandler that leaves formatting to the listener thread.
+RateLimitFilter
+    Drops repeats of the same warning or error within an interval.
+JsonLinesFormatter
+    Formats the fields of a record as one JSON line.
+
+Functions
+---------
+setup_logging
+    Install the queue handler on the root logger and start the listener thread.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+# Logger of the per-iteration JSON-lines records
+ITERATION_LOGGER = "iterations"
+
+LOG_FORMAT = "%(asctime)s,%(msecs)03d %(name)s %(levelname)s %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records without formatting them.
+
+    The stock QueueHandler merges the message arguments in the calling thread so the
+    record can be pickled. The queue here never leaves the process, so formatting is
+    left to the listener thread. Arguments are therefore formatted after the call
+    returns: pass values that are not modified afterwards.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let through one record per call site and message every `interval` seconds.
+
+    Only records at `level` or above are limited. Records are compared by their
+    unformatted message, so %-style arguments may differ between suppressed repeats,
+    while f-string messages must be identical, such as the same error from a retry
+    loop. The first record passed after a suppression notes how many were dropped.
+
+    Parameters
+    ----------
+    interval : float, optional
+        Minimum time in seconds between identical records (default is 60).
+    level : int, optional
+        Lowest level that is limited (default is logging.WARNING).
+    """
+
+    def __init__(self, interval=60.0, level=logging.WARNING):
+        super().__init__()
+        self.interval = interval
+        self.level = level
+        self.lock = threading.Lock()
+        self.last = {}
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+        key = (record.name, record.lineno, str(record.msg))
+        now = time.monotonic()
+        with self.lock:
+            last_time, suppressed = self.last.get(key, (None, 0))
+            if last_time is not None and now - last_time < self.interval:
+                self.last[key] = (last_time, suppressed + 1)
+                return False
+            self.last[key] = (now, 0)
+            if len(self.last) > 1000:
+                self.last = {
+                    k: v for k, v in self.last.items() if now - v[0] < self.interval
+                }
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Format the ``fields`` dictionary of a record, with its time, as a JSON line.
+
+    Numpy scalars and arrays are converted with ``tolist``.
+    """
+
+    def format(self, record):
+        fields = {"time": record.created}
+        fields.update(getattr(record, "fields", None) or {"message": record.getMessage()})
+        return json.dumps(fields, default=_to_json)
+
+
+def _to_json(value):
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def setup_logging(
+    path="snd_run.log",
+    iteration_path="snd_iterations.jsonl",
+    level=logging.INFO,
+    max_bytes=20_000_000,
+    backup_count=5,
+    error_interval=60.0,
+):
+    """
+    Route all logging through a queue to a listener thread.
+
+    Parameters
+    ----------
+    path : str, optional
+        Log file, rotated at `max_bytes` (default is 'snd_run.log').
+    iteration_path : str, optional
+        JSON-lines file of the ``iterations`` logger, rotated at `max_bytes`
+        (default is 'snd_iterations.jsonl').
+    level : int or str, optional
+        Level of the root logger (default is logging.INFO).
+    max_bytes : int, optional
+        Size in bytes at which log files are rotated (default is 20 MB).
+    backup_count : int, optional
+        Number of rotated files kept per log (default is 5).
+    error_interval : float, optional
+        Minimum time in seconds between identical warnings or errors (default is 60).
+
+    Returns
+    -------
+    logging.handlers.QueueListener
+        The started listener. It is stopped, flushing queued records, at exit.
+    """
+    formatter = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+    file_handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, delay=True
+    )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+        handler.addFilter(lambda record: record.name != ITERATION_LOGGER)
+    iteration_handler = logging.handlers.RotatingFileHandler(
+        iteration_path, maxBytes=max_bytes, backupCount=backup_count, delay=True
+    )
+    iteration_handler.setFormatter(JsonLinesFormatter())
+    iteration_handler.addFilter(lambda record: record.name == ITERATION_LOGGER)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(error_interval))
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+    # Iteration records are written whatever the root level, unless disabled
+    logging.getLogger(ITERATION_LOGGER).setLevel(logging.INFO)
+
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, iteration_handler
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
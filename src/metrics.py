@@ -0,0 +1,201 @@
+"""
+metrics.py
+----------
+In-process metrics for the online model loop, exposed over HTTP in the Prometheus text
+format.
+
+Classes
+-------
+MetricsRegistry
+    Stage latency histograms, event counters and scrape-time gauges, with a small HTTP
+    server for Prometheus to scrape.
+"""
+
+import contextlib
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond memo hits to
+# multi-second SND re-initializations
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels.items()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def process_rss_bytes():
+    """Return the resident set size of this process in bytes (Linux), or NaN."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return float("nan")
+
+
+class MetricsRegistry:
+    """
+    Metrics for the model loop, rendered in the Prometheus text format.
+
+    Implements the same ``stage(name)`` / ``increment(name)`` interface as
+    profiling.StageTimer, so it can be passed as the timer of `run_iteration` and
+    `SNDModel.set_stage_timer`. Stage durations go into the ``snd_stage_seconds``
+    histogram and events into the ``snd_events_total`` counter. Other sources
+    (interfaces, the MLflow logger, ...) register collectors that are called on
+    every scrape.
+
+    Parameters
+    ----------
+    buckets : tuple of float, optional
+        Histogram bucket upper bounds in seconds (default is DEFAULT_BUCKETS).
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = np.asarray(buckets, dtype=float)
+        self.lock = threading.Lock()
+        # stage name -> [bucket counts, sum, count]
+        self.histograms = {}
+        self.counters = {}
+        self.collectors = []
+        self.add_collector(self._collect_process)
+        self.server = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time the enclosed block as stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        """Record a stage duration in seconds."""
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = [np.zeros(len(self.buckets), int), 0.0, 0]
+            histogram[0][np.searchsorted(self.buckets, seconds) :] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def increment(self, name, value=1):
+        """Count an event, e.g. a model re-initialization."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_collector(self, collector):
+        """
+        Register a callable producing metrics at scrape time.
+
+        Parameters
+        ----------
+        collector : callable
+            Called with no arguments; returns an iterable of ``(name, type, help,
+            samples)`` tuples, where samples is a list of ``(labels dict, value)``.
+        """
+        self.collectors.append(collector)
+
+    def _collect_process(self):
+        return [
+            (
+                "snd_process_resident_memory_bytes",
+                "gauge",
+                "Resident set size of the model process.",
+                [({}, process_rss_bytes())],
+            )
+        ]
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns
+        -------
+        str
+            The metrics page.
+        """
+        lines = []
+        with self.lock:
+            lines.append("# HELP snd_stage_seconds Duration of each stage of the model loop.")
+            lines.append("# TYPE snd_stage_seconds histogram")
+            for name, (counts, total, count) in self.histograms.items():
+                for le, bucket_count in zip(self.buckets, counts):
+                    labels = format_labels({"stage": name, "le": repr(float(le))})
+                    lines.append(f"snd_stage_seconds_bucket{labels} {bucket_count}")
+                labels = format_labels({"stage": name, "le": "+Inf"})
+                lines.append(f"snd_stage_seconds_bucket{labels} {count}")
+                lines.append(f"snd_stage_seconds_sum{format_labels({'stage': name})} {total}")
+                lines.append(f"snd_stage_seconds_count{format_labels({'stage': name})} {count}")
+            lines.append("# HELP snd_events_total Count of model loop events.")
+            lines.append("# TYPE snd_events_total counter")
+            for name, value in self.counters.items():
+                lines.append(f"snd_events_total{format_labels({'event': name})} {value}")
+
+        for collector in self.collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector} failed: {e}")
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{format_labels(labels)} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="0.0.0.0"):
+        """
+        Serve the metrics page at ``/metrics`` from a background thread.
+
+        Parameters
+        ----------
+        port : int
+            Port to listen on.
+        host : str, optional
+            Address to bind (default is all interfaces, so the pod can be scraped).
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes would otherwise flood the model log
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(
+            target=self.server.serve_forever, name="metrics-server", daemon=True
+        ).start()
+        logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+
+    def close(self):
+        """Stop the HTTP server, if running."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
@@ -0,0 +1,360 @@
+"""
+mlflow_logger.py
+----------------
+Asynchronous, batched MLflow metric logging with an on-disk spool.
+
+Classes
+-------
+AsyncMetricLogger
+    Queues metrics from the evaluation loop and sends them to MLflow in batches from a
+    background thread, spooling to disk while the tracking server is unreachable.
+ThumbnailLogger
+    Logs image thumbnails as MLflow artifacts from a background thread.
+"""
+
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+
+import numpy as np
+from mlflow.entities import Metric
+from mlflow.tracking import MlflowClient
+
+logger = logging.getLogger(__name__)
+
+# MLflow rejects log_batch requests with more than 1000 metrics
+MAX_METRICS_PER_BATCH = 1000
+
+
+class AsyncMetricLogger:
+    """
+    Background MLflow metric logger fed by a bounded queue.
+
+    `log_metrics` only enqueues and never blocks. A background thread sends queued
+    records with `MlflowClient.log_batch` when `batch_size` records are waiting or
+    `flush_interval` seconds have passed. Records that cannot be sent (or that do not
+    fit in the queue) are appended to a JSON-lines spool file per run, which is replayed
+    after the next successful flush, including spools left behind by earlier processes.
+
+    Parameters
+    ----------
+    run_id : str
+        ID of the MLflow run to log to.
+    client : MlflowClient, optional
+        Client to log with (default is a client for the current tracking URI).
+    batch_size : int, optional
+        Number of queued records that triggers a flush (default is 50).
+    flush_interval : float, optional
+        Maximum time in seconds between flushes (default is 5).
+    max_queue : int, optional
+        Maximum number of queued records (default is 10000).
+    spool_dir : str, optional
+        Directory for the spool files (default is 'mlflow_spool').
+    """
+
+    def __init__(
+        self,
+        run_id,
+        client=None,
+        batch_size=50,
+        flush_interval=5.0,
+        max_queue=10000,
+        spool_dir="mlflow_spool",
+    ):
+        self.run_id = run_id
+        self.client = client or MlflowClient()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.spool_dir = spool_dir
+        os.makedirs(spool_dir, exist_ok=True)
+        self.spool_lock = threading.Lock()
+        self.spooled = self._count_spooled()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, name="mlflow-logger", daemon=True
+        )
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def backlog(self):
+        """Number of records waiting to be sent, queued or spooled."""
+        return self.queue.qsize() + self.spooled
+
+    def log_metrics(self, metrics, timestamp=None, step=0):
+        """
+        Queue metrics for logging without blocking.
+
+        Parameters
+        ----------
+        metrics : dict
+            Dictionary of metric names and values.
+        timestamp : int, optional
+            Timestamp in milliseconds since the epoch (default is now).
+        step : int, optional
+            Metric step (default is 0).
+        """
+        record = {
+            "metrics": {k: float(v) for k, v in metrics.items()},
+            "timestamp": int(time.time() * 1000) if timestamp is None else int(timestamp),
+            "step": step,
+        }
+        self._put(record)
+
+    def log_arrays(self, names, values, timestamp=None, step=0):
+        """
+        Queue metrics given as a sequence of names and an array of values.
+
+        The values are copied and only turned into a name-to-value mapping on the
+        background thread, so the evaluation loop can log an InputState vector and
+        the outputs without building a dictionary.
+
+        Parameters
+        ----------
+        names : tuple of str
+            Metric names, one per value.
+        values : numpy.ndarray
+            Metric values.
+        timestamp : int, optional
+            Timestamp in milliseconds since the epoch (default is now).
+        step : int, optional
+            Metric step (default is 0).
+        """
+        self._put(
+            {
+                "names": names,
+                "values": np.array(values, dtype=float),
+                "timestamp": int(time.time() * 1000) if timestamp is None else int(timestamp),
+                "step": step,
+            }
+        )
+
+    def _put(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            logger.warning("MLflow logging queue is full, spooling record to disk.")
+            self._spool([record])
+
+    @staticmethod
+    def _as_metrics_record(record):
+        """Convert a record queued by `log_arrays` to the ``{"metrics": ...}`` form."""
+        if "names" not in record:
+            return record
+        return {
+            "metrics": dict(zip(record["names"], record["values"].tolist())),
+            "timestamp": record["timestamp"],
+            "step": record["step"],
+        }
+
+    def close(self, timeout=30.0):
+        """
+        Flush queued records and stop the background thread.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time in seconds to wait for the final flush (default is 30).
+        """
+        self.stop_event.set()
+        self.thread.join(timeout)
+
+    def _run(self):
+        """Background loop: collect records into batches and flush them."""
+        while not (self.stop_event.is_set() and self.queue.empty()):
+            records = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(records) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (self.stop_event.is_set() and self.queue.empty()):
+                    break
+                try:
+                    record = self.queue.get(timeout=min(remaining, 0.5))
+                except queue.Empty:
+                    continue
+                records.append(self._as_metrics_record(record))
+            if records and self._send(records):
+                self._replay_spool()
+
+    def _send(self, records, run_id=None):
+        """
+        Send records with log_batch, spooling them on failure.
+
+        Returns
+        -------
+        bool
+            Whether all records were sent.
+        """
+        run_id = run_id or self.run_id
+        metrics = [
+            Metric(key, value, record["timestamp"], record["step"])
+            for record in records
+            for key, value in record["metrics"].items()
+        ]
+        try:
+            for i in range(0, len(metrics), MAX_METRICS_PER_BATCH):
+                self.client.log_batch(
+                    run_id, metrics=metrics[i : i + MAX_METRICS_PER_BATCH]
+                )
+        except Exception as e:
+            logger.warning(f"Failed to log metrics to MLflow, spooling to disk: {e}")
+            # A partially sent batch is re-sent in full, MLflow tolerates duplicates
+            self._spool(records, run_id)
+            return False
+        return True
+
+    def _spool_path(self, run_id):
+        return os.path.join(self.spool_dir, f"{run_id}.jsonl")
+
+    def _spool(self, records, run_id=None):
+        """Append records to the spool file of their run."""
+        with self.spool_lock:
+            with open(self._spool_path(run_id or self.run_id), "a") as file:
+                for record in records:
+                    file.write(json.dumps(self._as_metrics_record(record)) + "\n")
+            self.spooled += len(records)
+
+    @staticmethod
+    def _spool_run_id(name):
+        """
+        Return the run ID of a spool file name, or None if it is not a spool file.
+
+        Spool files are ``<run_id>.jsonl``, renamed to ``<run_id>.jsonl.<n>.replay``
+        while they are being replayed. Replay files left by a process that stopped
+        mid-replay are replayed again.
+        """
+        if name.endswith(".jsonl"):
+            return name[: -len(".jsonl")]
+        if name.endswith(".replay") and ".jsonl." in name:
+            return name[: name.rindex(".jsonl.")]
+        return None
+
+    def _count_spooled(self):
+        """Count records left in the spool by this or a previous process."""
+        count = 0
+        for name in os.listdir(self.spool_dir):
+            if self._spool_run_id(name) is not None:
+                with open(os.path.join(self.spool_dir, name)) as file:
+                    count += sum(1 for line in file if line.strip())
+        return count
+
+    def _replay_spool(self):
+        """Send spooled records, of this and earlier runs, now that the server is reachable."""
+        with self.spool_lock:
+            if not self.spooled:
+                return
+            replays = []
+            for name in sorted(os.listdir(self.spool_dir)):
+                run_id = self._spool_run_id(name)
+                if run_id is None:
+                    continue
+                path = os.path.join(self.spool_dir, name)
+                if name.endswith(".jsonl"):
+                    # A unique name, so an earlier leftover replay file is not overwritten
+                    replay_path = f"{path}.{time.time_ns()}.replay"
+                    os.replace(path, replay_path)
+                    path = replay_path
+                replays.append((run_id, path))
+            self.spooled = 0
+
+        for run_id, replay_path in replays:
+            records = []
+            with open(replay_path) as file:
+                for line in file:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Blank or truncated by a crash while spooling
+                        continue
+            os.remove(replay_path)
+            logger.info("Replaying %d spooled MLflow records for run %s.", len(records), run_id)
+            for i in range(0, len(records), self.batch_size):
+                # _send re-spools the failed chunk, the rest is spooled here
+                if not self._send(records[i : i + self.batch_size], run_id):
+                    self._spool(records[i + self.batch_size :], run_id)
+                    break
+
+
+class ThumbnailLogger:
+    """
+    Background MLflow artifact logger for image thumbnails.
+
+    Each call to `log` saves the thumbnails of one step to ``thumbnails_<step>.npz`` and
+    uploads it to the ``thumbnails`` artifact directory of the run. Uploads are
+    best effort: thumbnails that cannot be uploaded, or that arrive while `max_queue`
+    uploads are waiting, are dropped with a warning.
+
+    Parameters
+    ----------
+    run_id : str
+        ID of the MLflow run to log to.
+    client : MlflowClient, optional
+        Client to log with (default is a client for the current tracking URI).
+    max_queue : int, optional
+        Maximum number of thumbnail sets waiting for upload (default is 4).
+    """
+
+    def __init__(self, run_id, client=None, max_queue=4):
+        self.run_id = run_id
+        self.client = client or MlflowClient()
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = threading.Thread(
+            target=self._run, name="mlflow-thumbnails", daemon=True
+        )
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def log(self, thumbnails, step=0):
+        """
+        Queue thumbnails for upload without blocking.
+
+        Parameters
+        ----------
+        thumbnails : dict
+            Mapping of plane names to 2D arrays.
+        step : int, optional
+            Step the thumbnails belong to (default is 0).
+        """
+        if not thumbnails:
+            return
+        try:
+            self.queue.put_nowait((step, thumbnails))
+        except queue.Full:
+            logger.warning("Thumbnail upload queue is full, dropping step %d.", step)
+
+    def close(self, timeout=30.0):
+        """Upload queued thumbnails and stop the background thread."""
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def _run(self):
+        with tempfile.TemporaryDirectory(prefix="snd-thumbnails-") as tmp_dir:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    return
+                step, thumbnails = item
+                path = os.path.join(tmp_dir, f"thumbnails_{step}.npz")
+                try:
+                    np.savez_compressed(path, **thumbnails)
+                    self.client.log_artifact(self.run_id, path, artifact_path="thumbnails")
+                except Exception as e:
+                    logger.warning(f"Failed to log thumbnails of step {step} to MLflow: {e}")
+                finally:
+                    if os.path.exists(path):
+                        os.remove(path)
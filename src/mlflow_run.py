@@ -73,18 +73,28 @@ class MLflowRun:
         client = mlflow.tracking.MlflowClient()
         experiment = client.get_experiment_by_name(self.experiment_name)
 
-        # Get next run name
-        all_runs = client.search_runs(experiment_ids=[experiment.experiment_id])
-        run_numbers = []
-
-        for run in all_runs:
-            tag = run.data.tags.get("mlflow.runName", "")
-            if tag.startswith(self.run_prefix):
-                try:
-                    num = int(tag.replace(self.run_prefix, "").strip())
-                    run_numbers.append(num)
-                except ValueError:
-                    continue
-
-        next_run_number = max(run_numbers, default=0) + 1
+        # Last run number handed out, cached as an experiment tag so startup does not
+        # depend on how many runs the experiment holds
+        counter_tag = f"last_run_number/{self.run_prefix}"
+        cached_number = int(experiment.tags.get(counter_tag, 0))
+
+        # Also check the latest matching run, in case runs were created without the tag
+        latest_runs = client.search_runs(
+            experiment_ids=[experiment.experiment_id],
+            filter_string=f"attributes.run_name LIKE '{self.run_prefix}%'",
+            order_by=["attributes.start_time DESC"],
+            max_results=1,
+        )
+        latest_number = 0
+        if latest_runs:
+            tag = latest_runs[0].data.tags.get("mlflow.runName", "")
+            try:
+                latest_number = int(tag.replace(self.run_prefix, "").strip())
+            except ValueError:
+                pass
+
+        next_run_number = max(cached_number, latest_number) + 1
+        client.set_experiment_tag(
+            experiment.experiment_id, counter_tag, str(next_run_number)
+        )
         return self.run_prefix + str(next_run_number)
@@ -0,0 +1,209 @@
+"""
+fidelity.py
+-----------
+Fidelity levels of the SND propagation.
+
+A fidelity level is declared under ``fidelity_levels`` in snd_model.yml with extra SND
+constructor arguments (``snd_kwargs``, e.g. reduced wavefront sampling) and/or
+``precision: single``, which stores the arrays of each built instance in single
+precision. The level "full" always exists and uses the toolbox defaults.
+
+Functions
+---------
+level_factory
+    Build the SND factory of a fidelity level.
+single_precision
+    Cast the double precision arrays held by an object to single precision.
+supported_kwargs
+    SND arguments of a fidelity level, keeping only those the installed SND accepts.
+needs_escalation
+    Whether outputs are close enough to their alignment targets to need full fidelity.
+"""
+
+import functools
+import inspect
+import logging
+import types
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FULL_FIDELITY = "full"
+
+SINGLE_DTYPES = {
+    np.dtype(np.float64): np.float32,
+    np.dtype(np.complex128): np.complex64,
+}
+
+
+def single_precision(obj):
+    """
+    Cast the float64 and complex128 arrays reachable from `obj` to single precision.
+
+    Attributes, dicts and lists are walked recursively, like
+    `snd_cache.estimate_nbytes`, and their arrays are replaced in place. Arrays inside
+    tuples cannot be replaced and are left as they are. An array referenced from
+    several places is cast once and stays shared; views become independent copies.
+
+    Parameters
+    ----------
+    obj : object
+        Object to convert, e.g. a freshly built SND instance.
+
+    Returns
+    -------
+    int
+        Number of bytes saved.
+    """
+    seen = set()
+    stack = [obj]
+    cast_arrays = {}
+    saved = 0
+
+    def cast(value):
+        nonlocal saved
+        dtype = SINGLE_DTYPES.get(value.dtype)
+        if dtype is None:
+            return value
+        if id(value) not in cast_arrays:
+            # Keep the original alive so its id is not reused while walking
+            cast_arrays[id(value)] = (value, value.astype(dtype))
+            saved += value.nbytes - cast_arrays[id(value)][1].nbytes
+        return cast_arrays[id(value)][1]
+
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        if isinstance(item, dict):
+            entries = list(item.items())
+        elif isinstance(item, list):
+            entries = list(enumerate(item))
+        elif isinstance(item, (tuple, set)):
+            stack.extend(item)
+            continue
+        elif isinstance(
+            item, (np.ndarray, type, types.ModuleType, types.FunctionType, types.MethodType)
+        ):
+            continue
+        elif hasattr(item, "__dict__"):
+            for name, value in list(vars(item).items()):
+                if isinstance(value, np.ndarray):
+                    setattr(item, name, cast(value))
+                else:
+                    stack.append(value)
+            continue
+        else:
+            continue
+        for key, value in entries:
+            if isinstance(value, np.ndarray):
+                item[key] = cast(value)
+            else:
+                stack.append(value)
+    return saved
+
+
+def _build_single(factory, level, **kwargs):
+    snd = factory(**kwargs)
+    saved = single_precision(snd)
+    logger.debug("Fidelity level %s: single precision saved %.1f MB.", level, saved / 1e6)
+    return snd
+
+
+def level_factory(snd_class, level, config=None):
+    """
+    Build the SND factory of a fidelity level.
+
+    Parameters
+    ----------
+    snd_class : callable
+        The SND class.
+    level : str
+        Name of the fidelity level.
+    config : dict, optional
+        The level's entry in ``fidelity_levels``: ``snd_kwargs`` (extra SND
+        constructor arguments) and ``precision`` ('double' or 'single').
+
+    Returns
+    -------
+    callable or None
+        Factory called as ``factory(two_theta=..., delay=...)``, or None if the level
+        builds the same instances as full fidelity.
+    """
+    config = config or {}
+    precision = config.get("precision", "double")
+    if precision not in ("double", "single"):
+        raise ValueError(
+            f"Fidelity level {level}: precision must be 'double' or 'single', got {precision!r}."
+        )
+    snd_kwargs = supported_kwargs(snd_class, level, config.get("snd_kwargs"))
+    if not snd_kwargs and precision == "double":
+        return None
+    factory = functools.partial(snd_class, **snd_kwargs) if snd_kwargs else snd_class
+    if precision == "single":
+        factory = functools.partial(_build_single, factory, level)
+    return factory
+
+
+def supported_kwargs(snd_class, level, snd_kwargs=None):
+    """
+    Keep the SND constructor arguments of a fidelity level that SND accepts.
+
+    Arguments not named in the signature of `snd_class` are dropped with a warning, so
+    a level written for one lcls_beamline_toolbox version degrades to the defaults on
+    another instead of failing at start-up. Arguments that would only be caught by a
+    ``**kwargs`` parameter are dropped too, since their meaning is unknown.
+
+    Parameters
+    ----------
+    snd_class : callable
+        The SND class.
+    level : str
+        Name of the fidelity level, for logging.
+    snd_kwargs : dict, optional
+        Extra SND constructor arguments of the level.
+
+    Returns
+    -------
+    dict
+        The arguments to build SND instances of the level with.
+    """
+    snd_kwargs = dict(snd_kwargs or {})
+    try:
+        parameters = inspect.signature(snd_class).parameters
+    except (TypeError, ValueError):
+        parameters = {}
+    named = (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+    parameters = {name for name, p in parameters.items() if p.kind in named}
+    unsupported = sorted(snd_kwargs.keys() - parameters)
+    if unsupported:
+        logger.warning(
+            "Fidelity level %s: SND does not accept %s, ignoring them.", level, unsupported
+        )
+    return {k: v for k, v in snd_kwargs.items() if k in parameters}
+
+
+def needs_escalation(output_dict, escalation):
+    """
+    Check whether any output is within its alignment tolerance of its target.
+
+    Near the target the cheap levels' error is comparable to the tolerance, so the
+    outputs are recomputed at full fidelity there.
+
+    Parameters
+    ----------
+    output_dict : dict
+        Output names and values from a reduced fidelity evaluation.
+    escalation : dict
+        Mapping of output names to ``{"target": ..., "tolerance": ...}``.
+
+    Returns
+    -------
+    bool
+    """
+    return any(
+        abs(output_dict[name] - band.get("target", 0.0)) <= band["tolerance"]
+        for name, band in escalation.items()
+    )
@@ -0,0 +1,410 @@
+"""
+images.py
+---------
+Export of the 2D beam profiles computed by the SND propagation.
+
+Profiles are copied, as float32, into one shared-memory ring buffer per detector
+plane. Co-located consumers map the buffers and can read the latest images without
+a further copy and without running a second model process.
+
+Ring buffer layout (one shared-memory block named ``<prefix>_<plane>``): an int64
+header ``[n_slots, height, width, latest_seq, slot_seq_0, ..., slot_seq_n-1]`` followed
+by ``n_slots`` float32 images of shape (height, width). Image number ``seq`` (starting
+at 1) is written to slot ``seq % n_slots``. A slot's sequence number is set to -1
+while it is being written, so a reader can check that the image it read is the one
+it expected.
+
+Classes
+-------
+ImageRing
+    Writer side of a shared-memory image ring buffer.
+ImageRingReader
+    Reader side, for consumers in other processes.
+ImageExporter
+    Resolves the profile of each configured plane on an SND instance and writes it to
+    the plane's ring buffer.
+
+Functions
+---------
+find_profile
+    Look up the dotted path of a detector plane's profile on an SND instance.
+thumbnail
+    Block-averaged downsampling of an image.
+"""
+
+import collections
+import logging
+import sys
+import types
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HEADER_FIELDS = 4
+IMAGE_DTYPE = np.float32
+
+
+def resolve_path(obj, path):
+    """
+    Follow a dotted path, e.g. ``"dd.profile"``, from `obj`.
+
+    Each step is an attribute, or a key of a dict. A path ending in a method, e.g. a
+    getter, returns the result of calling it.
+    """
+    for name in path.split("."):
+        if isinstance(obj, dict):
+            try:
+                obj = obj[name]
+            except KeyError:
+                raise AttributeError(f"no key {name!r}") from None
+        else:
+            obj = getattr(obj, name)
+    return obj() if callable(obj) else obj
+
+
+def find_profile(obj, plane, attribute="profile", max_depth=4):
+    """
+    Find the dotted path of a detector plane's 2D profile, searching breadth first.
+
+    The detector is the first object reached through an attribute or dict key named
+    `plane`, or whose ``name`` is `plane`, that holds a 2D array in `attribute`.
+
+    Parameters
+    ----------
+    obj : object
+        A propagated SND instance.
+    plane : str
+        Name of the detector plane, e.g. 'dd'.
+    attribute : str, optional
+        Attribute of the detector holding its profile (default is 'profile').
+    max_depth : int, optional
+        Maximum number of steps from `obj` to the detector (default is 4).
+
+    Returns
+    -------
+    str or None
+        The path, for `resolve_path`, or None if no such detector is found.
+    """
+    seen = {id(obj)}
+    queue = collections.deque([(obj, "", 0)])
+    while queue:
+        item, path, depth = queue.popleft()
+        if isinstance(item, dict):
+            children = [(k, v) for k, v in item.items() if isinstance(k, str)]
+        elif hasattr(item, "__dict__") and not isinstance(
+            item, (type, types.ModuleType, types.FunctionType, types.MethodType)
+        ):
+            children = list(vars(item).items())
+        else:
+            continue
+        for key, child in children:
+            if id(child) in seen or isinstance(child, np.ndarray):
+                continue
+            seen.add(id(child))
+            child_path = f"{path}.{key}" if path else key
+            named = key == plane or getattr(child, "name", None) == plane
+            if named and np.ndim(getattr(child, attribute, None)) == 2:
+                return f"{child_path}.{attribute}"
+            if depth + 1 < max_depth:
+                queue.append((child, child_path, depth + 1))
+    return None
+
+
+def thumbnail(image, size=64):
+    """
+    Downsample an image by block averaging so neither side exceeds `size` pixels.
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        2D image.
+    size : int, optional
+        Maximum height and width of the thumbnail (default is 64).
+
+    Returns
+    -------
+    numpy.ndarray
+        The thumbnail, as float32.
+    """
+    factor = max(1, -(-max(image.shape) // size))
+    height, width = (image.shape[0] // factor) * factor, (image.shape[1] // factor) * factor
+    blocks = image[:height, :width].reshape(height // factor, factor, width // factor, factor)
+    return blocks.mean(axis=(1, 3), dtype=np.float64).astype(IMAGE_DTYPE)
+
+
+class _RingLayout:
+    """Header and image views over a ring buffer's shared memory."""
+
+    def _map(self, buf, n_slots, height, width):
+        self.header = np.ndarray((HEADER_FIELDS + n_slots,), dtype=np.int64, buffer=buf)
+        self.images = np.ndarray(
+            (n_slots, height, width),
+            dtype=IMAGE_DTYPE,
+            buffer=buf,
+            offset=self.header.nbytes,
+        )
+        self.slot_seq = self.header[HEADER_FIELDS:]
+
+    @staticmethod
+    def nbytes(n_slots, height, width):
+        return 8 * (HEADER_FIELDS + n_slots) + np.dtype(IMAGE_DTYPE).itemsize * (
+            n_slots * height * width
+        )
+
+
+class ImageRing(_RingLayout):
+    """
+    Shared-memory ring buffer of images of a fixed shape, written by this process.
+
+    Parameters
+    ----------
+    name : str
+        Name of the shared-memory block.
+    shape : tuple of int
+        Image shape (height, width).
+    n_slots : int, optional
+        Number of images kept (default is 4).
+
+    Raises
+    ------
+    FileExistsError
+        If a block of that name exists, e.g. the ring of another running model.
+    """
+
+    def __init__(self, name, shape, n_slots=4):
+        height, width = shape
+        size = self.nbytes(n_slots, height, width)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            raise FileExistsError(
+                f"Shared memory {name} exists. Another model may be exporting images "
+                f"under this name; use another prefix, or remove /dev/shm/{name} if it "
+                "was left by a process that did not shut down cleanly."
+            ) from None
+        self.name = name
+        self.shape = (height, width)
+        self._map(self.shm.buf, n_slots, height, width)
+        self.header[:HEADER_FIELDS] = (n_slots, height, width, 0)
+        self.slot_seq[:] = 0
+
+    def write(self, image):
+        """
+        Copy an image into the next slot, as float32, and publish it.
+
+        Returns
+        -------
+        int
+            Sequence number of the image.
+        """
+        seq = int(self.header[3]) + 1
+        slot = seq % len(self.slot_seq)
+        self.slot_seq[slot] = -1
+        self.images[slot] = image
+        self.slot_seq[slot] = seq
+        self.header[3] = seq
+        return seq
+
+    def close(self):
+        """Release and remove the shared-memory block."""
+        del self.header, self.images, self.slot_seq
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ImageRingReader(_RingLayout):
+    """
+    Read-only view of an ImageRing from another process.
+
+    Parameters
+    ----------
+    name : str
+        Name of the shared-memory block, ``<prefix>_<plane>``.
+    """
+
+    def __init__(self, name):
+        # The writer owns the block; do not let this process's resource tracker
+        # remove it on exit
+        if sys.version_info >= (3, 13):
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            from multiprocessing import resource_tracker
+
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Python < 3.13 registers attached blocks too
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        n_slots, height, width = np.ndarray((3,), dtype=np.int64, buffer=self.shm.buf)
+        self._map(self.shm.buf, int(n_slots), int(height), int(width))
+
+    @property
+    def latest_seq(self):
+        """Sequence number of the most recent image (0 before the first)."""
+        return int(self.header[3])
+
+    def read(self, seq=None, copy=True):
+        """
+        Read an image.
+
+        Parameters
+        ----------
+        seq : int, optional
+            Sequence number to read (default is the most recent image).
+        copy : bool, optional
+            Whether to return a copy (default is True). A view avoids the copy, but
+            the slot is overwritten ``n_slots`` images later; check `is_current`
+            after using it.
+
+        Returns
+        -------
+        tuple of (int, numpy.ndarray) or None
+            The sequence number and the image, or None if that image is no longer
+            (or not yet) in the ring.
+        """
+        seq = self.latest_seq if seq is None else seq
+        if seq <= 0:
+            return None
+        slot = seq % len(self.slot_seq)
+        image = self.images[slot].copy() if copy else self.images[slot]
+        if not self.is_current(seq):
+            return None
+        return seq, image
+
+    def is_current(self, seq):
+        """Whether image `seq` is still intact in its slot."""
+        return int(self.slot_seq[seq % len(self.slot_seq)]) == seq
+
+    def close(self):
+        """Detach from the shared-memory block."""
+        del self.header, self.images, self.slot_seq
+        self.shm.close()
+
+
+class ImageExporter:
+    """
+    Write the beam profiles of configured detector planes to shared-memory rings.
+
+    Parameters
+    ----------
+    planes : dict or list
+        Mapping of plane names (e.g. dd, do, IP) to the dotted paths of their 2D
+        profile on the SND instance, or to None to find it with `find_profile`
+        (``image_outputs`` in snd_model.yml). A list of plane names finds them all.
+    prefix : str, optional
+        Prefix of the shared-memory block names (default is 'snd').
+    n_slots : int, optional
+        Images kept per plane (default is 4).
+    """
+
+    def __init__(self, planes, prefix="snd", n_slots=4):
+        if not isinstance(planes, dict):
+            planes = dict.fromkeys(planes)
+        self.planes = dict(planes)
+        self.prefix = prefix
+        self.n_slots = n_slots
+        self.rings = {}
+
+    def check(self, snd):
+        """
+        Resolve the profile path of every plane and find those that cannot be read.
+
+        Planes without a path get the one found by `find_profile`.
+
+        Parameters
+        ----------
+        snd : SND
+            A propagated SND instance.
+
+        Returns
+        -------
+        dict
+            Mapping of plane names to the reason their profile is unusable.
+        """
+        problems = {}
+        for plane, path in self.planes.items():
+            if path is None:
+                path = self.planes[plane] = find_profile(snd, plane)
+                if path is None:
+                    problems[plane] = "no detector of that name with a 2D profile"
+                    continue
+                logger.info("Found profile of %s at %s.", plane, path)
+            try:
+                image = np.asarray(resolve_path(snd, path))
+            except AttributeError as e:
+                problems[plane] = f"no attribute {path}: {e}"
+                continue
+            if image.ndim != 2:
+                problems[plane] = f"{path} has shape {image.shape}, expected a 2D array"
+        return problems
+
+    def open(self, snd):
+        """
+        Create the ring of every plane, sized from its current profile on `snd`.
+
+        Raises
+        ------
+        FileExistsError
+            If a ring's shared-memory block exists already. Rings created so far are
+            removed.
+        """
+        try:
+            for plane, path in self.planes.items():
+                if plane not in self.rings:
+                    self._open_ring(plane, np.shape(resolve_path(snd, path)))
+        except FileExistsError:
+            self.close()
+            raise
+
+    def _open_ring(self, plane, shape):
+        ring = self.rings[plane] = ImageRing(f"{self.prefix}_{plane}", shape, self.n_slots)
+        logger.info("Exporting %s profiles %s to shared memory %s.", plane, shape, ring.name)
+        return ring
+
+    def remove(self, planes):
+        """Stop exporting the given planes."""
+        for plane in planes:
+            self.planes.pop(plane, None)
+            ring = self.rings.pop(plane, None)
+            if ring is not None:
+                ring.close()
+
+    def export(self, snd):
+        """
+        Write the current profile of every plane to its ring.
+
+        Planes whose profile cannot be read are skipped with a warning.
+        """
+        for plane, path in self.planes.items():
+            try:
+                image = np.asarray(resolve_path(snd, path))
+            except AttributeError as e:
+                logger.warning(f"No profile for plane {plane} at {path}, skipping it: {e}")
+                continue
+            ring = self.rings.get(plane)
+            if ring is None:
+                ring = self._open_ring(plane, image.shape)
+            elif image.shape != ring.shape:
+                logger.warning(
+                    "Profile of %s changed shape from %s to %s, not exported.",
+                    plane,
+                    ring.shape,
+                    image.shape,
+                )
+                continue
+            ring.write(image)
+
+    def thumbnails(self, size=64):
+        """Return a thumbnail of the latest image of each plane."""
+        thumbnails = {}
+        for plane, ring in self.rings.items():
+            seq = int(ring.header[3])
+            if seq:
+                thumbnails[plane] = thumbnail(ring.images[seq % len(ring.slot_seq)], size)
+        return thumbnails
+
+    def close(self):
+        """Remove all shared-memory rings."""
+        for ring in self.rings.values():
+            ring.close()
+        self.rings.clear()
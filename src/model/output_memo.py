@@ -0,0 +1,93 @@
+"""
+output_memo.py
+--------------
+Memoization of model outputs keyed on inputs quantized with a per-variable deadband.
+
+Classes
+-------
+OutputMemo
+    Small LRU memo mapping quantized input configurations to output dictionaries.
+"""
+
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class OutputMemo:
+    """
+    LRU memo of output dictionaries keyed on deadband-quantized inputs.
+
+    Two input configurations share a key when every input falls in the same deadband
+    bin, so readbacks that only differ by encoder noise reuse the cached outputs.
+
+    Parameters
+    ----------
+    input_names : list of str
+        Input variable names that make up the key.
+    deadbands : dict, optional
+        Deadband per input name, in simulation units. Inputs without a deadband
+        (or with a deadband of 0) must match exactly.
+    max_entries : int, optional
+        Maximum number of memoized configurations (default is 64).
+    """
+
+    def __init__(self, input_names, deadbands=None, max_entries=64):
+        deadbands = deadbands or {}
+        self.input_names = list(input_names)
+        self._names = tuple(self.input_names)
+        self.deadbands = [deadbands.get(name) or None for name in self.input_names]
+        self.quantized = np.array([d is not None for d in self.deadbands])
+        self.quanta = np.array([d or 1.0 for d in self.deadbands])
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, input_dict):
+        """Quantize an input dictionary (or InputState, as a whole vector) into a memo key."""
+        vector = getattr(input_dict, "vector", None)
+        if vector is not None and input_dict.names == self._names:
+            return tuple(
+                np.where(self.quantized, np.round(vector / self.quanta), vector).tolist()
+            )
+        return tuple(
+            input_dict[name] if deadband is None else round(input_dict[name] / deadband)
+            for name, deadband in zip(self.input_names, self.deadbands)
+        )
+
+    def get(self, key):
+        """
+        Return a copy of the memoized outputs for a key, or None on a miss.
+
+        Parameters
+        ----------
+        key : tuple
+            Key returned by `key`.
+
+        Returns
+        -------
+        dict or None
+            Copy of the memoized output dictionary.
+        """
+        output = self.entries.get(key)
+        if output is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return dict(output)
+
+    def put(self, key, output_dict):
+        """Memoize the outputs for a key, evicting the least recently used entry if full."""
+        self.entries[key] = dict(output_dict)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all memoized outputs, e.g. after the SND instance changes."""
+        self.entries.clear()
@@ -0,0 +1,138 @@
+"""
+reinit.py
+---------
+Background construction of SND instances for a new working point.
+
+Classes
+-------
+BackgroundReinitializer
+    Builds the SND for the most recently requested working point on a worker thread,
+    superseding older requests, and hands the result back for an atomic swap.
+"""
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundReinitializer:
+    """
+    Build SND instances for new working points on a background thread.
+
+    Only the most recent request is built: requests arriving while a build is running
+    replace any request that has not started yet, and a build whose working point has
+    been superseded by the time it finishes is discarded (it stays in the SND cache).
+    Working points are compared by their cache key, so readback noise does not
+    supersede a build.
+
+    Parameters
+    ----------
+    build : callable
+        Called as ``build(two_theta, delay)`` on the worker thread, returns an SND.
+    key : callable
+        Called as ``key(two_theta, delay)``, returns a hashable quantized working point.
+    """
+
+    def __init__(self, build, key):
+        self.build = build
+        self.key = key
+        self.lock = threading.Lock()
+        self.requested = None
+        self.building = None
+        self.ready = None
+        self.builds = 0
+        self.superseded = 0
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, name="snd-reinit", daemon=True
+        )
+        self.thread.start()
+
+    @property
+    def pending(self):
+        """Whether a working point has been requested and not yet taken."""
+        with self.lock:
+            in_flight = (self.requested, self.building, self.ready)
+        return any(x is not None for x in in_flight)
+
+    def request(self, two_theta, delay):
+        """
+        Request an SND for a working point, superseding earlier requests.
+
+        Parameters
+        ----------
+        two_theta : float
+            Crystal position in radians.
+        delay : float
+            Delay in ps.
+        """
+        key = self.key(two_theta, delay)
+        with self.lock:
+            latest = self.requested or self.building or (self.ready and self.ready[0])
+            if latest is not None and self.key(*latest) == key:
+                return
+            if latest is not None:
+                logger.info("Superseding SND build for working point %s.", latest)
+            self.requested = (two_theta, delay)
+            self.ready = None
+        self.wake.set()
+
+    def cancel(self):
+        """Drop pending and finished builds, e.g. when the working point changes back."""
+        with self.lock:
+            self.requested = None
+            self.building = None
+            self.ready = None
+
+    def take(self):
+        """
+        Return the finished build, if any, and clear it.
+
+        Returns
+        -------
+        tuple of ((float, float), SND) or None
+            The working point and its SND instance.
+        """
+        with self.lock:
+            ready, self.ready = self.ready, None
+        return ready
+
+    def close(self, timeout=None):
+        """Stop the worker thread after the current build."""
+        self.stop_event.set()
+        self.wake.set()
+        self.thread.join(timeout)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.wake.wait()
+            with self.lock:
+                self.wake.clear()
+                working_point, self.requested = self.requested, None
+                self.building = working_point
+            if working_point is None:
+                continue
+            logger.info("Building SND for working point %s in background.", working_point)
+            try:
+                snd = self.build(*working_point)
+            except Exception as e:
+                logger.error(f"Background SND build for {working_point} failed: {e}")
+                with self.lock:
+                    if self.building == working_point:
+                        self.building = None
+                continue
+            with self.lock:
+                self.builds += 1
+                if self.building != working_point:
+                    # Cancelled or superseded while building
+                    self.superseded += 1
+                    logger.info("Discarding superseded SND build for %s.", working_point)
+                    continue
+                self.building = None
+                if self.requested is not None:
+                    self.superseded += 1
+                    logger.info("Discarding superseded SND build for %s.", working_point)
+                    continue
+                self.ready = (working_point, snd)
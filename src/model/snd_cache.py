@@ -0,0 +1,180 @@
+"""
+snd_cache.py
+------------
+Bounded LRU cache of initialized SND instances, keyed by the quantized working point.
+
+Classes
+-------
+SNDCache
+    LRU cache of SND instances keyed by quantized (two_theta, delay).
+"""
+
+import logging
+import threading
+import types
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_nbytes(obj):
+    """
+    Estimate the memory held by an object through the numpy arrays it references.
+
+    Parameters
+    ----------
+    obj : object
+        Object to inspect. Attributes, dicts, lists and tuples are walked recursively.
+
+    Returns
+    -------
+    int
+        Total size in bytes of all distinct numpy arrays reachable from `obj`.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            total += item.nbytes
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set)):
+            stack.extend(item)
+        elif isinstance(
+            item, (type, types.ModuleType, types.FunctionType, types.MethodType)
+        ):
+            continue
+        elif hasattr(item, "__dict__"):
+            stack.extend(vars(item).values())
+    return total
+
+
+class SNDCache:
+    """
+    LRU cache of initialized SND instances keyed by quantized (two_theta, delay).
+
+    Motor positions are recorded when an instance is built and restored when it is
+    handed out again, so a cached instance looks exactly like a freshly built one.
+    `get` and `clear` are serialized by a lock, so instances can be built from a
+    background thread.
+
+    Parameters
+    ----------
+    factory : callable
+        Called as ``factory(two_theta=..., delay=...)`` to build a new SND instance.
+    two_theta_quantum : float, optional
+        Quantization step for two_theta in radians (default matches the re-initialization threshold).
+    delay_quantum : float, optional
+        Quantization step for delay in ps (default matches the re-initialization threshold).
+    max_entries : int, optional
+        Maximum number of cached instances (default is 8).
+    max_mb : float, optional
+        Maximum estimated memory held by cached instances, in MB (default is no limit).
+    """
+
+    def __init__(
+        self,
+        factory,
+        two_theta_quantum=3.49e-06,
+        delay_quantum=0.1,
+        max_entries=8,
+        max_mb=None,
+    ):
+        self.factory = factory
+        self.two_theta_quantum = two_theta_quantum
+        self.delay_quantum = delay_quantum
+        self.max_entries = max_entries
+        self.max_bytes = None if max_mb is None else max_mb * 1e6
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, two_theta, delay):
+        """Quantize a working point into a cache key."""
+        return (
+            int(round(two_theta / self.two_theta_quantum)),
+            int(round(delay / self.delay_quantum)),
+        )
+
+    def get(self, two_theta, delay):
+        """
+        Return an SND instance for the working point, building it on a cache miss.
+
+        Parameters
+        ----------
+        two_theta : float
+            Crystal position in radians.
+        delay : float
+            Delay in ps.
+
+        Returns
+        -------
+        SND
+            An SND instance with its motors at their initial positions.
+        """
+        key = self.key(two_theta, delay)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                snd, positions, _ = entry
+                for name, motor in snd.motor_dict.items():
+                    motor.mv(positions[name])
+                logger.debug("SND cache hit for key %s.", key)
+                return snd
+
+            self.misses += 1
+            logger.debug("SND cache miss for key %s, building new SND.", key)
+            snd = self.factory(two_theta=two_theta, delay=delay)
+            positions = {name: motor.wm() for name, motor in snd.motor_dict.items()}
+            nbytes = estimate_nbytes(snd)
+            self.entries[key] = (snd, positions, nbytes)
+            self.nbytes += nbytes
+            self._evict()
+            return snd
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is within its limits."""
+        # The most recently used entry is always kept, even if it alone exceeds max_mb
+        while len(self.entries) > 1 and (
+            len(self.entries) > self.max_entries
+            or (self.max_bytes is not None and self.nbytes > self.max_bytes)
+        ):
+            key, (_, _, nbytes) = self.entries.popitem(last=False)
+            self.nbytes -= nbytes
+            self.evictions += 1
+            logger.debug("Evicted SND cache entry %s.", key)
+
+    def clear(self):
+        """Drop all cached instances."""
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """
+        Return cache counters.
+
+        Returns
+        -------
+        dict
+            Hits, misses, evictions, number of entries and estimated size in bytes.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "nbytes": self.nbytes,
+        }
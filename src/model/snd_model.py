@@ -1,19 +1,65 @@
 import numpy as np
+import collections
+import contextlib
 import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
 from lume_model.base import LUMEBaseModel
 from lcls_beamline_toolbox.models.split_and_delay_motion import SND
 from pydantic import ConfigDict
+from .fidelity import FULL_FIDELITY, level_factory, needs_escalation
+from .images import ImageExporter
+from .output_memo import OutputMemo
+from .propagation import IncrementalPropagator, propagate
+from .reinit import BackgroundReinitializer
+from .snd_cache import SNDCache
+from .snd_pool import SNDPool
+from .state import InputState
+from .surrogate import PolynomialSurrogate
+from .uncertainty import NoiseModel, summarize
+from .validation import RangeValidator
 
 logger = logging.getLogger(__name__)
 
 inputs = np.zeros(22)
 
+# Inputs that define the SND working point; changing them requires re-initialization
+WORKING_POINT_INPUTS = ("t1_tth", "delay")
+
 
 class SNDModel(LUMEBaseModel):
     model_config = ConfigDict(extra="allow")
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        levels = dict(getattr(self, "fidelity_levels", None) or {})
+        levels.setdefault(FULL_FIDELITY, {})
+        self.fidelity_levels = levels
+        self.fidelity = getattr(self, "fidelity", None) or FULL_FIDELITY
+        self.fidelity_escalation = getattr(self, "fidelity_escalation", None) or {}
+        # One SND cache per fidelity level, since instances differ in sampling or
+        # precision. Levels that build the same instances as full fidelity share its cache.
+        cache_config = getattr(self, "snd_cache_config", None) or {}
+        self.snd_caches = {FULL_FIDELITY: SNDCache(SND, **cache_config)}
+        for level, config in levels.items():
+            factory = level_factory(SND, level, config)
+            self.snd_caches[level] = (
+                SNDCache(factory, **cache_config)
+                if factory is not None
+                else self.snd_caches[FULL_FIDELITY]
+            )
+        self.snd_cache = self.snd_caches[self.fidelity]
+        self._level_snds = {}
+        self.output_memo = OutputMemo(
+            self.input_names, getattr(self, "input_deadbands", None)
+        )
+        self.propagator = IncrementalPropagator(
+            self.input_names, getattr(self, "propagation_branches", None)
+        )
+        self.validator = RangeValidator.from_variables(
+            self.input_variables, self.input_validation_config
+        )
         t1_tth_idx = self.input_names.index("t1_tth")
         delay_idx = self.input_names.index("delay")
         self.snd = self.initialize_model(
@@ -21,11 +67,27 @@ class SNDModel(LUMEBaseModel):
             delay=self.input_variables[delay_idx].default_value,
         )
         self.pv_map = None
+        self.surrogate = None
+        self._pool = None
+        self._pool_warmer = None
+        # Uncertainty blocks still running on the pool after their call's budget ran out
+        self._uncertainty_running = set()
+        self._sensitivity = None
+        self._input_state = None
+        self._reinitializer = None
+        self.noise_model = NoiseModel(
+            self.input_names, getattr(self, "input_noise", None) or {}
+        )
+        self.stage_timer = None
+        self.image_exporter = None
 
     def initialize_model(self, two_theta=0.6575353, delay=0):
         """
         Initialize the model with default values for crystal position and delay. Units are in simulation units.
 
+        Instances are taken from the model's SND cache, so returning to a recently used
+        working point swaps the cached instance in instead of rebuilding it.
+
         Parameters
         ----------
         t1_tth : float, optional
@@ -38,28 +100,241 @@ class SNDModel(LUMEBaseModel):
         SND
             The initialized SND model instance.
         """
-        self.snd = SND(two_theta=two_theta, delay=delay)
+        snd = self.snd_cache.get(two_theta=two_theta, delay=delay)
+        self._swap_snd(snd, two_theta, delay)
+        logger.debug("SND cache stats: %s", self.snd_cache.stats())
         return self.snd
 
+    def _swap_snd(self, snd, two_theta, delay):
+        """Make `snd` the current instance, dropping state tied to the previous one."""
+        self.snd = snd
+        self.output_memo.clear()
+        self.propagator.reset()
+        self._level_snds.clear()
+        self._working_point = (two_theta, delay)
+
+    def set_fidelity(self, level):
+        """
+        Switch the fidelity level used for regular evaluations.
+
+        Re-initializes the model at the current working point with an SND instance of
+        the new level (from that level's SND cache).
+
+        Parameters
+        ----------
+        level : str
+            Name of a level in ``fidelity_levels`` of snd_model.yml, or "full".
+        """
+        if level not in self.snd_caches:
+            raise ValueError(
+                f"Unknown fidelity level {level!r}, expected one of {list(self.snd_caches)}."
+            )
+        if level == self.fidelity:
+            return
+        logger.info("Switching fidelity level from %s to %s.", self.fidelity, level)
+        if self._reinitializer is not None:
+            # A pending background build is of the previous level
+            self._reinitializer.cancel()
+        self.fidelity = level
+        self.snd_cache = self.snd_caches[level]
+        self.initialize_model(*self._working_point)
+
+    def _evaluate_at(self, level, input_dict):
+        """Propagate all branches on an SND instance of `level` at the current working point."""
+        if level not in self.snd_caches:
+            raise ValueError(
+                f"Unknown fidelity level {level!r}, expected one of {list(self.snd_caches)}."
+            )
+        if self.snd_caches[level] is self.snd_cache:
+            snd = self.snd
+        else:
+            snd = self._level_snds.get(level)
+            if snd is None:
+                snd = self._level_snds[level] = self.snd_caches[level].get(
+                    *self._working_point
+                )
+        with self._stage(f"propagate_{level}"):
+            output_dict = propagate(snd, input_dict)
+        if snd is self.snd:
+            # The motors of the regular instance moved behind the propagator's back
+            self.propagator.reset()
+        return output_dict
+
+    def _stage(self, name):
+        if self.stage_timer is None:
+            return contextlib.nullcontext()
+        return self.stage_timer.stage(name)
+
+    def request_working_point(self, two_theta, delay):
+        """
+        Build the SND for a new working point in the background.
+
+        The current instance keeps evaluating, flagged by `stale_working_point`, until
+        `swap_ready_working_point` installs the new one. A request supersedes earlier
+        ones; requesting the current working point cancels pending builds.
+
+        Parameters
+        ----------
+        two_theta : float
+            Crystal position in radians.
+        delay : float
+            Delay in ps.
+        """
+        if self.at_working_point(two_theta, delay):
+            if self._reinitializer is not None:
+                self._reinitializer.cancel()
+            return
+        if self._reinitializer is None:
+            self._reinitializer = BackgroundReinitializer(
+                lambda tth, d: self.snd_cache.get(two_theta=tth, delay=d),
+                self.snd_cache.key,
+            )
+        self._reinitializer.request(two_theta, delay)
+
+    @property
+    def stale_working_point(self):
+        """Whether a new working point has been requested but not swapped in yet."""
+        return self._reinitializer is not None and self._reinitializer.pending
+
+    def swap_ready_working_point(self):
+        """
+        Swap in the SND built by `request_working_point`, if it is ready.
+
+        Returns
+        -------
+        tuple of (float, float) or None
+            The new (two_theta, delay) if an instance was swapped in, else None.
+        """
+        ready = None if self._reinitializer is None else self._reinitializer.take()
+        if ready is None:
+            return None
+        (two_theta, delay), snd = ready
+        self._swap_snd(snd, two_theta, delay)
+        return two_theta, delay
+
+    def at_working_point(self, two_theta, delay):
+        """
+        Whether a t1_tth/delay pair maps to the working point the SND was built at.
+
+        Working points are compared after quantization with the SND cache quanta, so
+        readback noise below a quantum does not count as a change.
+
+        Parameters
+        ----------
+        two_theta : float
+            Crystal position in radians.
+        delay : float
+            Delay in ps.
+
+        Returns
+        -------
+        bool
+        """
+        return self.snd_cache.key(two_theta, delay) == self.snd_cache.key(
+            *self._working_point
+        )
+
+    def update_input_ranges(self, half_width=0.0001):
+        """
+        Re-center the defaults and ranges of the motor inputs on the current motor positions.
+
+        Called after `initialize_model`, so inputs are validated around the new working
+        point. The lume-model variables and the validator bounds are updated together.
+
+        Parameters
+        ----------
+        half_width : float, optional
+            Half width of the new value ranges, in simulation units (default is 0.0001).
+        """
+        names = [name for name in self.input_names if name in self.snd.motor_dict]
+        positions = np.array([self.snd.motor_dict[name].wm() for name in names])
+        for name, position in zip(names, positions):
+            variable = self.input_variables[self.validator.index[name]]
+            variable.default_value = position
+            variable.value_range = [position - half_width, position + half_width]
+        self.validator.set_bounds(names, positions - half_width, positions + half_width)
+
+    def set_input_validation_config(self, config):
+        """
+        Set the validation mode ("none", "warn" or "error") of the inputs.
+
+        Parameters
+        ----------
+        config : dict or None
+            Mapping of input names to validation modes; unlisted inputs warn.
+        """
+        self.input_validation_config = config
+        self.validator.set_modes(config)
+
+    def evaluate(self, input_dict, **kwargs):
+        """
+        Validate the inputs and evaluate the model.
+
+        Replaces lume-model's per-variable input validation with a single vectorized
+        range check (see RangeValidator); outputs are validated by lume-model as before.
+
+        Parameters
+        ----------
+        input_dict : dict or InputState
+            Input variable names and their values in simulation units.
+        **kwargs
+            Passed to `_evaluate`.
+
+        Returns
+        -------
+        dict
+            Dictionary of output variable names and their evaluated values.
+        """
+        vector = getattr(input_dict, "vector", None)
+        if vector is None:
+            vector = self.batch_to_array([input_dict])[0]
+        self.validator.validate(vector)
+        output_dict = self._evaluate(input_dict, **kwargs)
+        self.output_validator(output_dict)
+        return output_dict
+
     def input_transform(self, input_dict):
         """
         Transform input dictionary values from PV units to simulation units.
 
         Parameters
         ----------
-        input_dict : dict
-            Dictionary of input variable names and their values in PV units.
+        input_dict : dict or InputState
+            Dictionary of input variable names and their values in PV units. An
+            InputState is converted in place with its precomputed conversion vector.
 
         Returns
         -------
-        dict
+        dict or InputState
             Dictionary of input variable names and their values in simulation units.
         """
+        if isinstance(input_dict, InputState):
+            return input_dict.to_simulation_units()
         return {
             name: value * self.pv_map["unit_conversion"][name]
             for name, value in input_dict.items()
         }
 
+    def get_input_state(self):
+        """
+        Return the model's reusable InputState, creating it on first use.
+
+        The state is laid out by input_names and converts with the ``unit_conversion``
+        of `pv_map`, so `pv_map` must be set before the first call if inputs come in
+        PV units.
+
+        Returns
+        -------
+        InputState
+            The input state, holding the values of the last iteration.
+        """
+        if self._input_state is None:
+            self._input_state = InputState(
+                self.input_names,
+                None if self.pv_map is None else self.pv_map["unit_conversion"],
+            )
+        return self._input_state
+
     def output_transform(self, output_dict):
         """
         Transform output dictionary values from simulation units to PV units.
@@ -77,39 +352,451 @@ class SNDModel(LUMEBaseModel):
         # TODO: Not sure if any transformation is needed here. Remove if not needed.
         return output_dict
 
-    def _evaluate(self, input_dict, transform=True):
+    def _evaluate(self, input_dict, transform=True, fidelity=None):
         """
         Evaluate the SND model with the given input dictionary.
 
+        Inputs that fall in the same deadband bins (``input_deadbands`` in snd_model.yml)
+        as a recent evaluation return the memoized outputs without propagating. If a
+        surrogate is set and trusted for the inputs, its prediction is returned. Otherwise
+        only the branches affected by changed inputs (``propagation_branches``) are
+        re-propagated, at the current fidelity level. If that level is not full fidelity
+        and an output lands within its ``fidelity_escalation`` tolerance, the outputs
+        are recomputed at full fidelity.
+
         Parameters
         ----------
         input_dict : dict
             Dictionary of input variable names and their values.
         transform : bool, optional
             Whether to transform input values from PV units to simulation units (default is True).
+        fidelity : str, optional
+            Evaluate at this fidelity level on demand, bypassing the memo, the
+            surrogate and escalation (default is the current level with all of them).
 
         Returns
         -------
         dict
             Dictionary of output variable names and their evaluated values.
         """
-        for name, motor in self.snd.motor_dict.items():
-            motor.mv(input_dict[name])
-
-        self.snd.propagate_delay()
-        self.snd.propagate_cc()
-        output_dict = {
-            "t1_dh_sum": self.snd.get_t1_dh_sum(),
-            "dd_sum": self.snd.get_dd_sum(),
-            "t4_dh_sum": self.snd.get_t4_dh_sum(),
-            "do_sum": self.snd.get_do_sum(),
-            "dd_cx": self.snd.get_dd_cx(),
-            "dd_cy": self.snd.get_dd_cy(),
-            "do_cx": self.snd.get_do_cx(),
-            "do_cy": self.snd.get_do_cy(),
-            "IP_sum": self.snd.get_IP_sum(),
-            "IP_cx": self.snd.get_IP_cx(),
-            "IP_cy": self.snd.get_IP_cy(),
-        }
+        if fidelity is not None:
+            return self._evaluate_at(fidelity, input_dict)
+
+        key = self.output_memo.key(input_dict)
+        output_dict = self.output_memo.get(key)
+        if output_dict is not None:
+            logger.debug("Inputs within deadband of a previous evaluation, reusing outputs.")
+            self._count("memo_hits")
+            return output_dict
 
+        if self.surrogate is not None and self.snd_cache.key(
+            *self.surrogate.working_point
+        ) == self.snd_cache.key(*self._working_point):
+            output_dict = self.surrogate.evaluate(input_dict)
+            if output_dict is not None:
+                self._count("surrogate_hits")
+                return output_dict
+            logger.debug("Inputs outside surrogate envelope or confidence, propagating.")
+
+        output_dict = self.propagator.propagate(self.snd, input_dict)
+        snd = self.snd
+        if (
+            self.snd_cache is not self.snd_caches[FULL_FIDELITY]
+            and self.fidelity_escalation
+            and needs_escalation(output_dict, self.fidelity_escalation)
+        ):
+            logger.debug("Outputs near alignment tolerance, escalating to full fidelity.")
+            self._count("fidelity_escalations")
+            output_dict = self._evaluate_at(FULL_FIDELITY, input_dict)
+            snd = self._level_snds[FULL_FIDELITY]
+        if self.image_exporter is not None:
+            with self._stage("export_images"):
+                self.image_exporter.export(snd)
+        self.output_memo.put(key, output_dict)
         return output_dict
+
+    def enable_image_export(self, prefix="snd", n_slots=4):
+        """
+        Export the 2D beam profiles of each propagation to shared memory.
+
+        The planes, and optionally the SND attribute paths of their profiles, are read
+        from ``image_outputs`` in snd_model.yml. Each plane gets a ring buffer named
+        ``<prefix>_<plane>`` that consumers open with images.ImageRingReader. Only
+        evaluations that propagate export images; memo and surrogate hits do not.
+
+        The profiles are looked up on the current SND after a propagation at the
+        default inputs. Planes whose profile is missing or not 2D are dropped with a
+        warning.
+
+        Parameters
+        ----------
+        prefix : str, optional
+            Prefix of the shared-memory block names (default is 'snd').
+        n_slots : int, optional
+            Images kept per plane (default is 4).
+
+        Returns
+        -------
+        ImageExporter
+            The exporter, also available as `image_exporter`.
+
+        Raises
+        ------
+        ValueError
+            If no image_outputs are configured, or none of them can be read.
+        FileExistsError
+            If a ring buffer of that name exists, e.g. one of another running model.
+        """
+        planes = getattr(self, "image_outputs", None)
+        if not planes:
+            raise ValueError("No image_outputs configured in the model YAML.")
+        exporter = ImageExporter(planes, prefix=prefix, n_slots=n_slots)
+        # Profiles only exist once the SND has propagated
+        propagate(self.snd, {v.name: v.default_value for v in self.input_variables})
+        self.propagator.reset()
+        problems = exporter.check(self.snd)
+        if len(problems) == len(exporter.planes):
+            raise ValueError(f"None of the image_outputs can be read from SND: {problems}")
+        for plane, problem in problems.items():
+            logger.warning(f"Not exporting images of {plane}: {problem}")
+        exporter.remove(problems)
+        self.close_image_export()
+        exporter.open(self.snd)
+        self.image_exporter = exporter
+        return exporter
+
+    def close_image_export(self):
+        """Stop exporting images and remove their shared-memory blocks."""
+        if self.image_exporter is not None:
+            self.image_exporter.close()
+            self.image_exporter = None
+
+    def set_stage_timer(self, timer):
+        """
+        Time the stages of each evaluation (motor moves, branch propagations, output reads).
+
+        Parameters
+        ----------
+        timer : object or None
+            Stage timer with ``stage(name)`` and ``increment(name)`` methods, e.g.
+            profiling.StageTimer, or None to disable timing.
+        """
+        self.stage_timer = timer
+        self.propagator.timer = timer
+
+    def _count(self, name):
+        if self.stage_timer is not None:
+            self.stage_timer.increment(name)
+
+    def train_surrogate(self, n_samples=2000, n_workers=None, seed=0, **kwargs):
+        """
+        Train a polynomial surrogate on SND evaluations at the current working point.
+
+        Motor inputs are sampled uniformly over their value_range; the working point
+        inputs (t1_tth, delay) and non-motor inputs stay at their default values. Once
+        trained, `_evaluate` answers from the surrogate inside its training envelope and
+        falls back to the full propagation elsewhere.
+
+        Parameters
+        ----------
+        n_samples : int, optional
+            Number of SND evaluations to train on (default is 2000).
+        n_workers : int, optional
+            Number of worker processes used for the evaluations (default is the number of CPUs).
+        seed : int, optional
+            Random seed for sampling and fitting (default is 0).
+        **kwargs
+            Passed to PolynomialSurrogate.fit, e.g. n_ensemble or max_uncertainty.
+
+        Returns
+        -------
+        PolynomialSurrogate
+            The trained surrogate, also stored as `self.surrogate`.
+        """
+        active_inputs = [
+            name
+            for name in self.input_names
+            if name in self.snd.motor_dict and name not in WORKING_POINT_INPUTS
+        ]
+        rng = np.random.default_rng(seed)
+        x = np.tile(
+            [var.default_value for var in self.input_variables], (n_samples, 1)
+        ).astype(float)
+        for name in active_inputs:
+            low, high = self.input_variables[self.input_names.index(name)].value_range
+            x[:, self.input_names.index(name)] = rng.uniform(low, high, n_samples)
+
+        logger.info("Sampling %d SND evaluations for surrogate training.", n_samples)
+        outputs = self.evaluate_batch(x, n_workers=n_workers)
+        y = np.column_stack([outputs[name] for name in self.output_names])
+        self.surrogate = PolynomialSurrogate.fit(
+            x,
+            y,
+            self.input_names,
+            self.output_names,
+            active_inputs,
+            self._working_point,
+            seed=seed,
+            **kwargs,
+        )
+        return self.surrogate
+
+    def sensitivity(
+        self, input_dict, variables=None, rel_step=0.01, move_threshold=0.05, n_workers=None
+    ):
+        """
+        Compute the Jacobian of the outputs with respect to the inputs around an operating point.
+
+        Uses central finite differences, with all 2 x len(variables) perturbed evaluations
+        run in parallel on the SND worker pool. The step for each variable is `rel_step`
+        times the width of its value_range. The result is cached and returned again until
+        any variable moves by more than `move_threshold` times its value_range width, or
+        the model is re-initialized at a different working point.
+
+        Parameters
+        ----------
+        input_dict : dict
+            Operating point, as a dictionary of input variable names and their values in
+            simulation units.
+        variables : list of str, optional
+            Inputs to differentiate with respect to (default is all SND motor inputs).
+        rel_step : float, optional
+            Finite-difference step as a fraction of each value_range width (default is 0.01).
+        move_threshold : float, optional
+            Operating-point move, as a fraction of each value_range width, that invalidates
+            the cached result (default is 0.05).
+        n_workers : int, optional
+            Number of worker processes (default is the number of CPUs).
+
+        Returns
+        -------
+        dict
+            Dictionary with keys ``inputs`` (variable names), ``outputs`` (output names),
+            ``jacobian`` (array of shape (len(outputs), len(inputs))), ``steps`` (step per
+            variable) and ``operating_point`` (input dictionary).
+        """
+        if variables is None:
+            variables = [name for name in self.input_names if name in self.snd.motor_dict]
+        idx = [self.input_names.index(name) for name in variables]
+        widths = np.array(
+            [np.diff(self.input_variables[i].value_range)[0] for i in idx], dtype=float
+        )
+        x0 = self.batch_to_array([input_dict])[0]
+
+        cached = self._sensitivity
+        if (
+            cached is not None
+            and cached["inputs"] == list(variables)
+            and cached["working_point"] == self._working_point
+            and np.all(np.abs(x0[idx] - cached["x0"][idx]) <= move_threshold * widths)
+        ):
+            logger.debug("Operating point within threshold, reusing cached Jacobian.")
+            return cached["result"]
+
+        steps = rel_step * widths
+        rows = np.repeat(x0[np.newaxis, :], 2 * len(idx), axis=0)
+        for k, i in enumerate(idx):
+            rows[2 * k, i] += steps[k]
+            rows[2 * k + 1, i] -= steps[k]
+        outputs = self.evaluate_batch(rows, n_workers=n_workers)
+        y = np.column_stack([outputs[name] for name in self.output_names])
+        jacobian = ((y[0::2] - y[1::2]) / (2 * steps[:, np.newaxis])).T
+
+        result = {
+            "inputs": list(variables),
+            "outputs": list(self.output_names),
+            "jacobian": jacobian,
+            "steps": dict(zip(variables, steps)),
+            "operating_point": dict(zip(self.input_names, x0)),
+        }
+        self._sensitivity = {
+            "inputs": list(variables),
+            "working_point": self._working_point,
+            "x0": x0,
+            "result": result,
+        }
+        return result
+
+    def uncertainty(
+        self,
+        input_dict,
+        n_samples=64,
+        time_budget=0.5,
+        percentiles=(5, 50, 95),
+        n_workers=None,
+    ):
+        """
+        Propagate input readback noise to the outputs by Monte Carlo sampling.
+
+        Draws `n_samples` perturbed inputs around `input_dict` from the noise models in
+        the ``input_noise`` section of snd_model.yml and evaluates them in parallel on
+        the SND worker pool, in blocks, with at most one block per worker in flight.
+        Blocks are only submitted while `time_budget` remains and samples not evaluated
+        within it are dropped, so the statistics may rest on fewer samples than
+        requested (``n_samples`` in the result). Blocks still running when the budget
+        runs out occupy their workers in the next call, which submits fewer blocks
+        until they finish.
+
+        Parameters
+        ----------
+        input_dict : dict or InputState
+            Operating point in simulation units.
+        n_samples : int, optional
+            Number of perturbed inputs to draw (default is 64).
+        time_budget : float, optional
+            Maximum time in seconds to wait for the evaluations (default is 0.5).
+        percentiles : tuple of float, optional
+            Percentiles to report (default is (5, 50, 95)).
+        n_workers : int, optional
+            Number of worker processes (default is the number of CPUs).
+
+        Returns
+        -------
+        dict or None
+            See uncertainty.summarize: output names, number of samples used, and mean,
+            standard deviation and percentiles per output. None if sampling is skipped
+            because the pool is being rebuilt after a working-point change.
+        """
+        deadline = time.monotonic() + time_budget
+        pool = self.get_pool(n_workers)
+        if self._pool_warmer is not None and self._pool_warmer.is_alive():
+            logger.debug("SND pool starting, skipping uncertainty sampling.")
+            self._count("uncertainty_skips")
+            return None
+        vector = getattr(input_dict, "vector", None)
+        x0 = self.batch_to_array([input_dict])[0] if vector is None else vector
+        rows = self.noise_model.sample(x0, n_samples)
+        # Small blocks, so the samples finished within the budget are not all-or-nothing
+        n_blocks = min(n_samples, pool.n_workers * 4) or 1
+        blocks = collections.deque(np.array_split(rows, n_blocks))
+        previous = {f for f in self._uncertainty_running if not f.done()}
+        running = set()
+        results = []
+        while blocks or running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            while blocks and len(running) + len(previous) < pool.n_workers:
+                running.add(pool.submit(self.input_names, blocks.popleft()))
+            done, _ = wait(
+                running | previous, timeout=remaining, return_when=FIRST_COMPLETED
+            )
+            previous -= done
+            for future in done & running:
+                running.discard(future)
+                if future.exception() is None:
+                    results.extend(future.result())
+        if blocks or running:
+            self._count("uncertainty_timeouts")
+        self._uncertainty_running = previous | running
+        y = np.array(
+            [[r[name] for name in self.output_names] for r in results], dtype=float
+        ).reshape(len(results), len(self.output_names))
+        return summarize(y, self.output_names, percentiles)
+
+    def get_pool(self, n_workers=None):
+        """
+        Return a pool of SND workers initialized at the current working point.
+
+        The pool is created on first use and rebuilt whenever the model has been
+        re-initialized at a different t1_tth/delay since the pool was started. A rebuilt
+        pool replaces the old one without waiting for its workers to exit, and its
+        workers are started on a background thread, so a working-point change does not
+        stall the caller; evaluations submitted meanwhile queue behind the start-up,
+        and `uncertainty` skips sampling until it is done.
+
+        Parameters
+        ----------
+        n_workers : int, optional
+            Number of worker processes (default is the number of CPUs).
+
+        Returns
+        -------
+        SNDPool
+            Pool of worker processes holding pre-initialized SND instances.
+        """
+        if self._pool is not None and (
+            self._pool.working_point != self._working_point
+            or (n_workers is not None and self._pool.n_workers != n_workers)
+        ):
+            n_workers = n_workers or self._pool.n_workers
+            self._pool.close(wait=False)
+            self._uncertainty_running = set()
+            self._pool = SNDPool(*self._working_point, n_workers=n_workers)
+            logger.info("Rebuilding SND pool, uncertainty sampling paused until it is ready.")
+            self._pool_warmer = threading.Thread(
+                target=self._pool.warm, name="snd-pool-warm", daemon=True
+            )
+            self._pool_warmer.start()
+        if self._pool is None:
+            self._pool = SNDPool(*self._working_point, n_workers=n_workers)
+        return self._pool
+
+    def close_pool(self):
+        """Shut down the SND worker pool, if one is running."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+            self._uncertainty_running = set()
+
+    def batch_to_array(self, inputs):
+        """
+        Convert a batch of input configurations to a 2D array ordered by input_names.
+
+        Parameters
+        ----------
+        inputs : numpy.ndarray or list of dict
+            Either a 2D array of shape (n, len(input_names)), or a list of input
+            dictionaries. Inputs missing from a dictionary take their default value.
+
+        Returns
+        -------
+        numpy.ndarray
+            2D array of shape (n, len(input_names)).
+        """
+        if isinstance(inputs, np.ndarray):
+            rows = np.atleast_2d(inputs).astype(float)
+            if rows.shape[1] != len(self.input_names):
+                raise ValueError(
+                    f"Expected {len(self.input_names)} input columns, got {rows.shape[1]}."
+                )
+            return rows
+        defaults = [var.default_value for var in self.input_variables]
+        return np.array(
+            [
+                [d.get(name, default) for name, default in zip(self.input_names, defaults)]
+                for d in inputs
+            ],
+            dtype=float,
+        )
+
+    def evaluate_batch(self, inputs, n_workers=None, validate=False):
+        """
+        Evaluate many input configurations in parallel on a pool of SND workers.
+
+        Inputs are expected in simulation units.
+
+        Parameters
+        ----------
+        inputs : numpy.ndarray or list of dict
+            Either a 2D array of shape (n, len(input_names)) with columns ordered
+            by input_names, or a list of input dictionaries.
+        n_workers : int, optional
+            Number of worker processes (default is the number of CPUs).
+        validate : bool, optional
+            Whether to check the whole batch against the input ranges first
+            (default is False, since scans deliberately leave the ranges).
+
+        Returns
+        -------
+        dict
+            Dictionary of output variable names and 1D arrays of their values, one per configuration.
+        """
+        rows = self.batch_to_array(inputs)
+        if validate:
+            self.validator.validate(rows)
+        results = self.get_pool(n_workers).map(self.input_names, rows)
+        return {
+            name: np.array([result[name] for result in results])
+            for name in self.output_names
+        }
@@ -0,0 +1,184 @@
+"""
+snd_pool.py
+-----------
+Process pool of pre-initialized SND instances used to evaluate many input configurations
+in parallel.
+
+Classes
+-------
+SNDPool
+    Pool of worker processes, each holding its own SND built at a fixed working point.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+
+from .propagation import propagate
+
+logger = logging.getLogger(__name__)
+
+# SND instance owned by the current worker process
+_worker_snd = None
+
+
+def _init_worker(two_theta, delay):
+    """Build the SND instance for this worker process once, at pool start-up."""
+    global _worker_snd
+    from lcls_beamline_toolbox.models.split_and_delay_motion import SND
+
+    _worker_snd = SND(two_theta=two_theta, delay=delay)
+
+
+def _worker_pid(hold):
+    """Report the worker's pid, holding it briefly so other idle workers take the rest."""
+    time.sleep(hold)
+    return os.getpid()
+
+
+def _evaluate_rows(input_names, rows):
+    """Evaluate a block of input rows on the worker's SND instance."""
+    return [propagate(_worker_snd, dict(zip(input_names, row))) for row in rows]
+
+
+class SNDPool:
+    """
+    Pool of worker processes, each holding a pre-initialized SND instance.
+
+    Parameters
+    ----------
+    two_theta : float
+        Crystal position used to initialize each worker's SND, in radians.
+    delay : float
+        Delay used to initialize each worker's SND, in ps.
+    n_workers : int, optional
+        Number of worker processes (default is the number of CPUs).
+    mp_context : str, optional
+        Multiprocessing start method (default is 'spawn', which is safe with torch loaded).
+    """
+
+    def __init__(self, two_theta, delay, n_workers=None, mp_context="spawn"):
+        self.working_point = (two_theta, delay)
+        self.n_workers = n_workers or os.cpu_count() or 1
+        logger.info(
+            "Starting SND pool with %d workers at two_theta=%s, delay=%s.",
+            self.n_workers,
+            two_theta,
+            delay,
+        )
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=multiprocessing.get_context(mp_context),
+            initializer=_init_worker,
+            initargs=(two_theta, delay),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, input_names, rows):
+        """
+        Submit a block of input rows to a single worker.
+
+        Parameters
+        ----------
+        input_names : list of str
+            Input variable names, in the column order of `rows`.
+        rows : numpy.ndarray
+            2D array of shape (n, len(input_names)) in simulation units.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Future resolving to a list of output dictionaries, one per row.
+        """
+        return self.executor.submit(_evaluate_rows, list(input_names), np.asarray(rows))
+
+    def map(self, input_names, rows):
+        """
+        Evaluate all input rows, split into blocks across the workers.
+
+        Parameters
+        ----------
+        input_names : list of str
+            Input variable names, in the column order of `rows`.
+        rows : numpy.ndarray
+            2D array of shape (n, len(input_names)) in simulation units.
+
+        Returns
+        -------
+        list of dict
+            Output dictionaries, in the same order as `rows`.
+        """
+        rows = np.atleast_2d(np.asarray(rows, dtype=float))
+        # A few blocks per worker keeps the load balanced without paying IPC per row
+        n_blocks = min(len(rows), self.n_workers * 4) or 1
+        futures = [
+            self.submit(input_names, block) for block in np.array_split(rows, n_blocks)
+        ]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def warm(self, timeout=None, hold=0.05):
+        """
+        Start every worker process and wait until each has built its SND instance.
+
+        The executor only spawns a process when a task is submitted, and a worker builds
+        its SND before running its first task, so one task per worker is submitted until
+        all workers have answered.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time in seconds to wait (default is no limit).
+        hold : float, optional
+            Time in seconds each task keeps its worker busy (default is 0.05).
+
+        Returns
+        -------
+        bool
+            Whether all workers are ready.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ready = set()
+        while len(ready) < self.n_workers:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            futures = [
+                self.executor.submit(_worker_pid, hold)
+                for _ in range(self.n_workers - len(ready))
+            ]
+            done, _ = wait(futures, timeout=remaining)
+            ready.update(f.result() for f in done)
+        if len(ready) < self.n_workers:
+            logger.warning(
+                "Only %d of %d SND workers ready after %s s.",
+                len(ready),
+                self.n_workers,
+                timeout,
+            )
+            return False
+        logger.info("All %d SND workers ready.", self.n_workers)
+        return True
+
+    def close(self, wait=True):
+        """
+        Shut down the worker processes.
+
+        Parameters
+        ----------
+        wait : bool, optional
+            Whether to block until the workers have exited (default is True). Pending
+            blocks are cancelled either way.
+        """
+        self.executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,111 @@
+"""
+state.py
+--------
+Fixed-layout, array-backed model input state.
+
+Classes
+-------
+InputState
+    Input values held in a NumPy vector ordered by input_names, with a precomputed
+    PV-to-simulation unit conversion vector and a read/write dict view.
+"""
+
+from collections.abc import MutableMapping
+
+import numpy as np
+
+
+class InputState(MutableMapping):
+    """
+    Model inputs as a NumPy vector ordered by input_names.
+
+    The name-to-index map and the unit conversion vector are computed once, so filling
+    the state from an interface snapshot, converting it to simulation units and handing
+    it to MLflow are array operations instead of per-key dict rebuilds. The state is
+    also a mutable mapping of input names to floats, so it can be passed wherever
+    lume-model or SNDModel expect an input dictionary.
+
+    Parameters
+    ----------
+    input_names : list of str
+        Input variable names, defining the vector layout.
+    unit_conversion : dict, optional
+        Mapping of input names to the factor converting PV units to simulation units,
+        e.g. ``pv_map["unit_conversion"]`` (default is no conversion).
+
+    Attributes
+    ----------
+    vector : numpy.ndarray
+        Input values, ordered by `names`.
+    posixseconds : float or None
+        Latest PV timestamp of the snapshot the state was loaded from, if any.
+    """
+
+    def __init__(self, input_names, unit_conversion=None):
+        self.names = tuple(input_names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.vector = np.zeros(len(self.names))
+        self.conversion = np.array(
+            [1.0 if unit_conversion is None else unit_conversion[n] for n in self.names]
+        )
+        self.posixseconds = None
+
+    def __getitem__(self, name):
+        return float(self.vector[self.index[name]])
+
+    def __setitem__(self, name, value):
+        self.vector[self.index[name]] = value
+
+    def __delitem__(self, name):
+        raise TypeError("InputState has a fixed layout, inputs cannot be removed.")
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return f"InputState({dict(self)})"
+
+    def load_pv_values(self, pv_values, pv_names):
+        """
+        Fill the state from an interface snapshot keyed by PV name.
+
+        Parameters
+        ----------
+        pv_values : dict
+            Dictionary mapping PV names to ``{"value": ..., "posixseconds": ...}``.
+        pv_names : list of str
+            PV names in the same order as `names`.
+
+        Returns
+        -------
+        InputState
+            This state, in PV units.
+        """
+        self.vector[:] = [pv_values[pv]["value"] for pv in pv_names]
+        self.posixseconds = max(pv_values[pv]["posixseconds"] for pv in pv_names)
+        return self
+
+    def load_dict(self, input_dict):
+        """Fill the state from a dictionary of input names and values."""
+        for name, value in input_dict.items():
+            self.vector[self.index[name]] = value
+        self.posixseconds = None
+        return self
+
+    def to_simulation_units(self):
+        """Convert the state in place from PV units to simulation units."""
+        self.vector *= self.conversion
+        return self
+
+    def copy(self):
+        """Return an independent copy of the state."""
+        state = InputState.__new__(InputState)
+        state.names = self.names
+        state.index = self.index
+        state.vector = self.vector.copy()
+        state.conversion = self.conversion
+        state.posixseconds = self.posixseconds
+        return state
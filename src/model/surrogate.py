@@ -0,0 +1,275 @@
+"""
+surrogate.py
+------------
+Polynomial surrogate of the SND model, used as a fast path in front of the full
+wavefront propagation.
+
+Classes
+-------
+PolynomialSurrogate
+    Bootstrap ensemble of quadratic polynomial fits with an input envelope and an
+    uncertainty estimate, so callers can fall back to the physics model.
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def quadratic_features(x):
+    """
+    Build quadratic polynomial features: constant, linear and all pairwise products.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        2D array of shape (n, d) of normalized inputs.
+
+    Returns
+    -------
+    numpy.ndarray
+        2D array of shape (n, 1 + d + d * (d + 1) / 2).
+    """
+    i, j = np.triu_indices(x.shape[1])
+    return np.hstack([np.ones((len(x), 1)), x, x[:, i] * x[:, j]])
+
+
+class PolynomialSurrogate:
+    """
+    Quadratic polynomial surrogate trained on SND evaluations at one working point.
+
+    Inputs are normalized to [-1, 1] over the training envelope. An ensemble of ridge
+    fits on bootstrap resamples gives the prediction (ensemble mean) and its
+    uncertainty (ensemble standard deviation, relative to each output's spread).
+
+    Parameters
+    ----------
+    input_names : list of str
+        All model input names, in the model's order.
+    output_names : list of str
+        Model output names, in the model's order.
+    active_inputs : list of str
+        Inputs that were varied during training and are used as features.
+    lower, upper : numpy.ndarray
+        Training envelope of the active inputs.
+    coefficients : numpy.ndarray
+        Ensemble coefficients of shape (n_ensemble, n_features, n_outputs), in
+        standardized output units.
+    y_mean, y_std : numpy.ndarray
+        Output standardization.
+    working_point : tuple of float
+        (two_theta, delay) of the SND instance the surrogate was trained on.
+    max_uncertainty : float, optional
+        Maximum ensemble standard deviation, relative to the output's training spread,
+        for a prediction to be accepted (default is 0.01).
+    """
+
+    def __init__(
+        self,
+        input_names,
+        output_names,
+        active_inputs,
+        lower,
+        upper,
+        coefficients,
+        y_mean,
+        y_std,
+        working_point,
+        max_uncertainty=0.01,
+    ):
+        self.input_names = list(input_names)
+        self._names = tuple(str(name) for name in self.input_names)
+        self.output_names = list(output_names)
+        self.active_inputs = list(active_inputs)
+        self.active_idx = np.array([self.input_names.index(n) for n in active_inputs])
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.y_mean = np.asarray(y_mean, dtype=float)
+        self.y_std = np.asarray(y_std, dtype=float)
+        self.working_point = tuple(working_point)
+        self.max_uncertainty = max_uncertainty
+
+    @classmethod
+    def fit(
+        cls,
+        x,
+        y,
+        input_names,
+        output_names,
+        active_inputs,
+        working_point,
+        n_ensemble=5,
+        ridge=1e-6,
+        seed=0,
+        **kwargs,
+    ):
+        """
+        Fit the surrogate to SND evaluations.
+
+        Parameters
+        ----------
+        x : numpy.ndarray
+            2D array of shape (n, len(input_names)) of sampled inputs.
+        y : numpy.ndarray
+            2D array of shape (n, len(output_names)) of the corresponding outputs.
+        input_names, output_names, active_inputs, working_point
+            See the class parameters.
+        n_ensemble : int, optional
+            Number of bootstrap fits (default is 5).
+        ridge : float, optional
+            Ridge regularization strength (default is 1e-6).
+        seed : int, optional
+            Seed for the bootstrap resampling (default is 0).
+        **kwargs
+            Passed to the constructor, e.g. max_uncertainty.
+
+        Returns
+        -------
+        PolynomialSurrogate
+            The fitted surrogate.
+        """
+        active_idx = [list(input_names).index(n) for n in active_inputs]
+        x_active = np.asarray(x, dtype=float)[:, active_idx]
+        lower, upper = x_active.min(axis=0), x_active.max(axis=0)
+        y = np.asarray(y, dtype=float)
+        y_mean = y.mean(axis=0)
+        y_std = np.where(y.std(axis=0) > 0, y.std(axis=0), 1.0)
+
+        features = quadratic_features(cls._normalize(x_active, lower, upper))
+        y_norm = (y - y_mean) / y_std
+        penalty = ridge * np.eye(features.shape[1])
+        rng = np.random.default_rng(seed)
+        coefficients = []
+        for _ in range(n_ensemble):
+            sample = rng.integers(0, len(features), len(features))
+            f, t = features[sample], y_norm[sample]
+            coefficients.append(np.linalg.solve(f.T @ f + penalty, f.T @ t))
+
+        surrogate = cls(
+            input_names,
+            output_names,
+            active_inputs,
+            lower,
+            upper,
+            np.array(coefficients),
+            y_mean,
+            y_std,
+            working_point,
+            **kwargs,
+        )
+        rmse = np.sqrt(np.mean((surrogate.predict(x)[0] - y) ** 2, axis=0))
+        logger.info(
+            "Trained surrogate on %d samples, relative training RMSE: %s",
+            len(x),
+            dict(zip(output_names, rmse / y_std)),
+        )
+        return surrogate
+
+    @staticmethod
+    def _normalize(x, lower, upper):
+        """Scale inputs from [lower, upper] to [-1, 1]."""
+        span = np.where(upper > lower, upper - lower, 1.0)
+        return 2.0 * (x - lower) / span - 1.0
+
+    def in_envelope(self, x):
+        """
+        Check which input rows lie inside the training envelope.
+
+        Parameters
+        ----------
+        x : numpy.ndarray
+            2D array of shape (n, len(input_names)).
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array of shape (n,).
+        """
+        x_active = np.atleast_2d(x)[:, self.active_idx]
+        return np.all((x_active >= self.lower) & (x_active <= self.upper), axis=1)
+
+    def predict(self, x):
+        """
+        Predict outputs and their uncertainty.
+
+        Parameters
+        ----------
+        x : numpy.ndarray
+            2D array of shape (n, len(input_names)).
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            Predicted outputs and ensemble standard deviations, both of shape
+            (n, len(output_names)), in output units.
+        """
+        x_active = np.atleast_2d(x)[:, self.active_idx]
+        features = quadratic_features(self._normalize(x_active, self.lower, self.upper))
+        predictions = np.einsum("nf,kfo->kno", features, self.coefficients)
+        mean = predictions.mean(axis=0) * self.y_std + self.y_mean
+        std = predictions.std(axis=0) * self.y_std
+        return mean, std
+
+    def evaluate(self, input_dict):
+        """
+        Evaluate a single input configuration if the surrogate can be trusted there.
+
+        Parameters
+        ----------
+        input_dict : dict
+            Dictionary of input variable names and their values in simulation units.
+
+        Returns
+        -------
+        dict or None
+            Dictionary of output names and predicted values, or None if the inputs are
+            outside the training envelope or the prediction is too uncertain.
+        """
+        vector = getattr(input_dict, "vector", None)
+        if vector is not None and input_dict.names == self._names:
+            # InputState in the same layout: no per-key lookups
+            x = vector[np.newaxis, :]
+        else:
+            x = np.array([[input_dict[name] for name in self.input_names]])
+        if not self.in_envelope(x)[0]:
+            return None
+        mean, std = self.predict(x)
+        if np.any(std[0] > self.max_uncertainty * self.y_std):
+            return None
+        return dict(zip(self.output_names, mean[0]))
+
+    def save(self, path):
+        """Save the surrogate to an .npz file."""
+        np.savez(
+            path,
+            input_names=self.input_names,
+            output_names=self.output_names,
+            active_inputs=self.active_inputs,
+            lower=self.lower,
+            upper=self.upper,
+            coefficients=self.coefficients,
+            y_mean=self.y_mean,
+            y_std=self.y_std,
+            working_point=self.working_point,
+            max_uncertainty=self.max_uncertainty,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load a surrogate saved with `save`."""
+        with np.load(path) as data:
+            return cls(
+                input_names=data["input_names"].tolist(),
+                output_names=data["output_names"].tolist(),
+                active_inputs=data["active_inputs"].tolist(),
+                lower=data["lower"],
+                upper=data["upper"],
+                coefficients=data["coefficients"],
+                y_mean=data["y_mean"],
+                y_std=data["y_std"],
+                working_point=data["working_point"].tolist(),
+                max_uncertainty=float(data["max_uncertainty"]),
+            )
@@ -0,0 +1,133 @@
+"""
+uncertainty.py
+--------------
+Monte Carlo propagation of input readback noise.
+
+Classes
+-------
+NoiseModel
+    Per-input noise distributions from the ``input_noise`` section of snd_model.yml,
+    drawing perturbed input rows around an operating point.
+
+Functions
+---------
+summarize
+    Mean, standard deviation and percentiles of sampled outputs.
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NOISE_DISTRIBUTIONS = ("normal", "uniform")
+
+
+class NoiseModel:
+    """
+    Independent per-input readback noise.
+
+    Parameters
+    ----------
+    input_names : list of str
+        Input variable names, defining the row layout.
+    config : dict
+        Mapping of input names to ``{"distribution": "normal" | "uniform", "scale": ...}``
+        in simulation units. For normal noise the scale is the standard deviation, for
+        uniform noise the half width. Inputs not listed are not perturbed.
+    seed : int, optional
+        Seed of the random generator (default is unseeded).
+    """
+
+    def __init__(self, input_names, config, seed=None):
+        self.input_names = list(input_names)
+        index = {name: i for i, name in enumerate(self.input_names)}
+        unknown = set(config) - index.keys()
+        if unknown:
+            raise ValueError(f"input_noise lists unknown inputs: {sorted(unknown)}")
+        for name, noise in config.items():
+            if noise["distribution"] not in NOISE_DISTRIBUTIONS:
+                raise ValueError(
+                    f"Unknown noise distribution {noise['distribution']!r} for {name}, "
+                    f"expected one of {NOISE_DISTRIBUTIONS}."
+                )
+        self.normal_idx = np.array(
+            [index[n] for n, c in config.items() if c["distribution"] == "normal"], int
+        )
+        self.normal_scale = np.array(
+            [c["scale"] for c in config.values() if c["distribution"] == "normal"], float
+        )
+        self.uniform_idx = np.array(
+            [index[n] for n, c in config.items() if c["distribution"] == "uniform"], int
+        )
+        self.uniform_scale = np.array(
+            [c["scale"] for c in config.values() if c["distribution"] == "uniform"], float
+        )
+        self.rng = np.random.default_rng(seed)
+
+    def sample(self, x0, n_samples):
+        """
+        Draw perturbed input rows around an operating point.
+
+        Parameters
+        ----------
+        x0 : numpy.ndarray
+            Operating point, ordered by input_names.
+        n_samples : int
+            Number of rows to draw.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (n_samples, len(input_names)).
+        """
+        rows = np.tile(np.asarray(x0, dtype=float), (n_samples, 1))
+        rows[:, self.normal_idx] += self.rng.normal(
+            scale=self.normal_scale, size=(n_samples, len(self.normal_idx))
+        )
+        rows[:, self.uniform_idx] += self.rng.uniform(
+            -self.uniform_scale,
+            self.uniform_scale,
+            size=(n_samples, len(self.uniform_idx)),
+        )
+        return rows
+
+
+def summarize(y, output_names, percentiles=(5, 50, 95)):
+    """
+    Summarize sampled outputs.
+
+    Parameters
+    ----------
+    y : numpy.ndarray
+        Sampled outputs of shape (n_samples, len(output_names)).
+    output_names : list of str
+        Output variable names, in the column order of `y`.
+    percentiles : tuple of float, optional
+        Percentiles to report (default is (5, 50, 95)).
+
+    Returns
+    -------
+    dict
+        Dictionary with keys ``outputs`` (output names), ``n_samples``, ``mean`` and
+        ``std`` (arrays of one value per output) and ``percentiles`` (dict of percentile
+        to array). Statistics are NaN when no samples are available.
+    """
+    n = len(y)
+    if n == 0:
+        nan = np.full(len(output_names), np.nan)
+        return {
+            "outputs": list(output_names),
+            "n_samples": 0,
+            "mean": nan,
+            "std": nan,
+            "percentiles": {p: nan for p in percentiles},
+        }
+    return {
+        "outputs": list(output_names),
+        "n_samples": n,
+        "mean": y.mean(axis=0),
+        "std": y.std(axis=0, ddof=1) if n > 1 else np.zeros(y.shape[1]),
+        "percentiles": dict(zip(percentiles, np.percentile(y, percentiles, axis=0))),
+    }
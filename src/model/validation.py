@@ -0,0 +1,158 @@
+"""
+validation.py
+-------------
+Vectorized range validation of model inputs.
+
+Classes
+-------
+RangeValidator
+    Lower/upper bound arrays compiled from the input variables, checking whole input
+    vectors or batches in one pass.
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VALIDATION_MODES = ("none", "warn", "error")
+
+
+class RangeValidator:
+    """
+    Check inputs against per-variable value ranges with array operations.
+
+    Each input has a validation mode, as in lume-model's ``input_validation_config``:
+    "none" skips the input, "warn" logs a warning when it is out of range and "error"
+    raises a ValueError. Non-finite values are out of range.
+
+    Parameters
+    ----------
+    input_names : list of str
+        Input variable names, defining the vector layout.
+    lower, upper : array_like
+        Lower and upper bounds, ordered by input_names.
+    config : dict, optional
+        Mapping of input names to validation modes. Inputs not listed use
+        `default_mode`.
+    default_mode : str, optional
+        Validation mode of inputs not in `config` (default is "warn").
+    """
+
+    def __init__(self, input_names, lower, upper, config=None, default_mode="warn"):
+        self.input_names = list(input_names)
+        self.index = {name: i for i, name in enumerate(self.input_names)}
+        self.lower = np.array(lower, dtype=float)
+        self.upper = np.array(upper, dtype=float)
+        self.default_mode = default_mode
+        self.set_modes(config)
+
+    @classmethod
+    def from_variables(cls, input_variables, config=None, default_mode="warn"):
+        """
+        Compile a validator from lume-model ScalarVariables.
+
+        Parameters
+        ----------
+        input_variables : list of ScalarVariable
+            Input variables with a ``value_range``.
+        config : dict, optional
+            Mapping of input names to validation modes.
+        default_mode : str, optional
+            Validation mode of inputs not in `config` (default is "warn").
+
+        Returns
+        -------
+        RangeValidator
+        """
+        ranges = np.array([var.value_range for var in input_variables], dtype=float)
+        return cls(
+            [var.name for var in input_variables],
+            ranges[:, 0],
+            ranges[:, 1],
+            config,
+            default_mode,
+        )
+
+    def set_modes(self, config=None):
+        """Set the validation mode of each input from a name-to-mode mapping."""
+        config = config or {}
+        modes = [config.get(name, self.default_mode) for name in self.input_names]
+        for mode in set(modes) - set(VALIDATION_MODES):
+            raise ValueError(
+                f"Unknown validation mode {mode!r}, expected one of {VALIDATION_MODES}."
+            )
+        modes = np.array(modes)
+        self.warn = modes == "warn"
+        self.error = modes == "error"
+
+    def set_bounds(self, names, lower, upper):
+        """
+        Update the bounds of some inputs in place.
+
+        Parameters
+        ----------
+        names : list of str
+            Input names to update.
+        lower, upper : array_like
+            New lower and upper bounds, ordered like `names`.
+        """
+        idx = [self.index[name] for name in names]
+        self.lower[idx] = lower
+        self.upper[idx] = upper
+
+    def out_of_range(self, x):
+        """
+        Flag inputs outside their range.
+
+        Parameters
+        ----------
+        x : numpy.ndarray
+            Input vector of shape (n_inputs,) or batch of shape (n, n_inputs),
+            ordered by input_names.
+
+        Returns
+        -------
+        numpy.ndarray of bool
+            Same shape as `x`, True where the value is out of range or not finite.
+        """
+        return ~((x >= self.lower) & (x <= self.upper))
+
+    def validate(self, x):
+        """
+        Validate an input vector or batch according to the validation modes.
+
+        Parameters
+        ----------
+        x : numpy.ndarray
+            Input vector of shape (n_inputs,) or batch of shape (n, n_inputs),
+            ordered by input_names.
+
+        Raises
+        ------
+        ValueError
+            If an input in "error" mode is out of range.
+        """
+        bad = self.out_of_range(x)
+        if not bad.any():
+            return
+        # Per input: number of out-of-range rows (1 or 0 for a single vector)
+        counts = bad.sum(axis=0) if bad.ndim > 1 else bad.astype(int)
+        errors = (counts > 0) & self.error
+        if errors.any():
+            raise ValueError(f"Inputs out of range: {self._describe(x, counts, errors)}")
+        warnings = (counts > 0) & self.warn
+        if warnings.any():
+            logger.warning("Inputs out of range: %s", self._describe(x, counts, warnings))
+
+    def _describe(self, x, counts, mask):
+        """Format the flagged inputs with their range, and value or out-of-range row count."""
+        if x.ndim > 1:
+            found = [f"{counts[i]} of {len(x)} rows" for i in range(len(counts))]
+        else:
+            found = [f"{value:g}" for value in x]
+        return ", ".join(
+            f"{self.input_names[i]}={found[i]} not in [{self.lower[i]:g}, {self.upper[i]:g}]"
+            for i in np.flatnonzero(mask)
+        )
@@ -0,0 +1,136 @@
+"""
+output_publisher.py
+-------------------
+Publishes model outputs to soft PVs from a background thread.
+
+Classes
+-------
+OutputPublisher
+    Writes the latest model outputs to their PVs concurrently, skipping values that
+    moved less than their deadband, without blocking the evaluation loop.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+
+class OutputPublisher:
+    """
+    Publish model outputs to PVs without blocking the evaluation loop.
+
+    `publish` only stores the latest outputs and wakes the publishing thread. If the
+    previous write is still in flight, intermediate outputs are superseded by the most
+    recent ones instead of queueing up. All changed outputs are written concurrently.
+
+    Parameters
+    ----------
+    interface : object
+        Interface providing ``put_pv(pv_name, value, timeout)``, e.g. K2EGInterface.
+    pv_names : dict
+        Mapping of output names to the PV names to write them to.
+    deadbands : dict, optional
+        Mapping of output names to the minimum change that is written (default is 0,
+        only identical values are skipped).
+    timeout : float, optional
+        Timeout in seconds for each PV write (default is 10).
+    """
+
+    def __init__(self, interface, pv_names, deadbands=None, timeout=10.0):
+        self.interface = interface
+        self.pv_names = pv_names
+        self.deadbands = deadbands or {}
+        self.timeout = timeout
+        self.last_published = {}
+        self.pending = None
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.stop_event = threading.Event()
+        self.executor = ThreadPoolExecutor(
+            max_workers=len(pv_names), thread_name_prefix="pv-put"
+        )
+        self.thread = threading.Thread(
+            target=self._run, name="output-publisher", daemon=True
+        )
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def publish(self, output_dict):
+        """
+        Hand the latest outputs to the publishing thread. Never blocks.
+
+        Parameters
+        ----------
+        output_dict : dict
+            Dictionary of output variable names and their values.
+        """
+        with self.lock:
+            self.pending = dict(output_dict)
+        self.event.set()
+
+    def close(self):
+        """Stop the publishing thread after writing the latest pending outputs."""
+        self.stop_event.set()
+        self.event.set()
+        self.thread.join()
+        self.executor.shutdown(wait=True)
+
+    def _changed(self, output_dict):
+        """Return the outputs that moved by more than their deadband since last written."""
+        return {
+            name: value
+            for name, value in output_dict.items()
+            if name in self.pv_names
+            and (
+                name not in self.last_published
+                # Written as "not <=" so NaN on either side counts as a change
+                or not abs(value - self.last_published[name])
+                <= self.deadbands.get(name, 0.0)
+            )
+        }
+
+    def _run(self):
+        """Background loop: write the latest pending outputs to their PVs."""
+        while True:
+            self.event.wait()
+            # Outputs published before close are pending by the time it sets the
+            # stop event, so they are written by this last pass
+            stopping = self.stop_event.is_set()
+            with self.lock:
+                output_dict, self.pending = self.pending, None
+                self.event.clear()
+            if output_dict is not None:
+                self._write(output_dict)
+            if stopping:
+                return
+
+    def _write(self, output_dict):
+        """Write the outputs that changed to their PVs, concurrently."""
+        changed = self._changed(output_dict)
+        futures = {
+            self.executor.submit(
+                self.interface.put_pv,
+                self.pv_names[name],
+                float(value),
+                self.timeout,
+            ): (name, value)
+            for name, value in changed.items()
+        }
+        wait(futures)
+        for future, (name, value) in futures.items():
+            if future.exception() is None:
+                self.last_published[name] = value
+            else:
+                logger.warning(
+                    f"Failed to publish {name} to {self.pv_names[name]}: {future.exception()}"
+                )
+        logger.debug(
+            "Published %d of %d outputs.", len(changed), len(output_dict)
+        )
@@ -0,0 +1,92 @@
+"""
+profiling.py
+------------
+Lightweight per-stage timing of the model loop.
+
+Classes
+-------
+StageTimer
+    Records wall-clock durations per named stage and event counts, and summarizes
+    them as latency percentiles.
+"""
+
+import collections
+import contextlib
+import time
+
+
+def stage(timer, name):
+    """
+    Return a context manager timing `name` on `timer`, or a no-op if `timer` is None.
+
+    Parameters
+    ----------
+    timer : StageTimer or None
+        Timer to record on. Any object with a ``stage(name)`` context manager works.
+    name : str
+        Name of the stage.
+    """
+    return contextlib.nullcontext() if timer is None else timer.stage(name)
+
+
+class StageTimer:
+    """
+    Record per-stage durations and event counts.
+
+    Parameters
+    ----------
+    max_samples : int, optional
+        Number of most recent durations kept per stage (default is 100000).
+    """
+
+    def __init__(self, max_samples=100000):
+        self.samples = collections.defaultdict(
+            lambda: collections.deque(maxlen=max_samples)
+        )
+        self.counts = collections.Counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time the enclosed block as stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        """Record a duration in seconds for stage `name`."""
+        self.samples[name].append(seconds)
+
+    def increment(self, name, value=1):
+        """Count an event, e.g. a model re-initialization."""
+        self.counts[name] += value
+
+    def reset(self):
+        """Drop all recorded durations and counts."""
+        self.samples.clear()
+        self.counts.clear()
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """
+        Summarize the recorded durations.
+
+        Parameters
+        ----------
+        percentiles : tuple of float, optional
+            Percentiles to report (default is (50, 90, 99)).
+
+        Returns
+        -------
+        dict
+            For each stage, the sample count, mean and percentiles in milliseconds.
+        """
+        import numpy as np
+
+        summary = {}
+        for name, samples in self.samples.items():
+            ms = np.fromiter(samples, dtype=float) * 1e3
+            summary[name] = {"count": len(ms), "mean_ms": float(ms.mean())}
+            for p, value in zip(percentiles, np.percentile(ms, percentiles)):
+                summary[name][f"p{p}_ms"] = float(value)
+        return summary
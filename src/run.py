@@ -1,28 +1,34 @@
 import argparse
 import logging
+import math
 import time
-import collections
-import numpy as np
-import mlflow
-from mlflow_run import MLflowRun
-from model.snd_model import SNDModel
-
-
-logging.basicConfig(
-    handlers=[logging.FileHandler("snd_run.log"), logging.StreamHandler()],
-    format="%(asctime)s,%(msecs)03d %(name)s %(levelname)s %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    level=logging.DEBUG,
+from logging_setup import ITERATION_LOGGER, setup_logging
+from profiling import StageTimer, stage
+
+# Reference for the time to first evaluation reported by --profile-startup
+START_TIME = time.perf_counter()
+
+# Heavy modules imported (and timed one by one) by --profile-startup, in dependency order
+STARTUP_MODULES = (
+    "numpy",
+    "torch",
+    "lume_model",
+    "lcls_beamline_toolbox.models.split_and_delay_motion",
+    "model.snd_model",
 )
+
 logger = logging.getLogger(__name__)
+# One JSON line per iteration with its inputs and outputs, see logging_setup.py
+iteration_logger = logging.getLogger(ITERATION_LOGGER)
 
 
-class MultiLineDict(collections.UserDict):
-    def __str__(self):
-        return "\n" + "\n".join(f"{k} = {v}" for k, v in self.data.items())
+# Interfaces returning {pv: {"value": ..., "posixseconds": ...}} snapshots keyed by PV name
+PV_INTERFACES = ("epics", "k2eg", "replay")
 
 
-def get_interface(interface_name, pvname_list=None):
+def get_interface(
+    interface_name, pvname_list=None, monitor=False, max_age=None, replay_file=None
+):
     if interface_name == "test":
         from interface.test_interface import TestInterface
 
@@ -30,7 +36,15 @@ def get_interface(interface_name, pvname_list=None):
     elif interface_name == "epics":
         from interface.epics_interface import EPICSInterface
 
-        return EPICSInterface(pvname_list)
+        return EPICSInterface(pvname_list, monitor=monitor, max_age=max_age)
+    elif interface_name == "k2eg":
+        from interface.k2eg_interface import K2EGInterface
+
+        return K2EGInterface("lcls", "snd-online-model", pv_name_list=pvname_list)
+    elif interface_name == "replay":
+        from interface.replay_interface import ReplayInterface
+
+        return ReplayInterface(replay_file)
     else:
         raise ValueError(f"Unknown interface: {interface_name}")
 
@@ -39,13 +53,55 @@ def get_input_vars(snd_model, interface_name):
     if interface_name == "test":
         # Use model input variable objects
         return snd_model.input_variables
-    elif interface_name == "epics":
+    elif interface_name in PV_INTERFACES:
         # Use PV names from the model's pv_map
         return [snd_model.pv_map["name"][n] for n in snd_model.input_names]
     else:
         raise ValueError(f"Unknown interface: {interface_name}")
 
 
+def has_value(value):
+    """Whether a PV value is set, i.e. neither None nor NaN."""
+    if value is None:
+        return False
+    try:
+        return not math.isnan(value)
+    except TypeError:
+        return True
+
+
+def check_pv_values(pv_values):
+    """
+    Check that every PV in an interface snapshot has a usable value.
+
+    Stale PVs (older than the monitor's ``max_age``) are logged, since their value
+    is the last one known, but a PV without a value fails the snapshot.
+
+    Parameters
+    ----------
+    pv_values : dict
+        Dictionary mapping PV names to their value dicts, as returned by the interface.
+
+    Raises
+    ------
+    RuntimeError
+        If any PV failed to be read, is disconnected or has no value (None or NaN).
+    """
+    failed = {}
+    for pv, d in pv_values.items():
+        if "error" in d:
+            failed[pv] = d["error"]
+        elif not d.get("connected", True):
+            failed[pv] = "Disconnected"
+        elif not has_value(d.get("value")):
+            failed[pv] = "No value"
+    if failed:
+        raise RuntimeError(f"Failed to read PVs: {failed}")
+    stale = [pv for pv, d in pv_values.items() if d.get("stale")]
+    if stale:
+        logger.warning("Stale PV values: %s", stale)
+
+
 def pv_mapping():
     """Loads  the PV mapping from json file."""
     import json
@@ -55,7 +111,167 @@ def pv_mapping():
     return pv_mapping
 
 
-def run_iteration(snd_model, interface, input_vars, interface_name):
+def get_output_publisher(snd_model, k2eg_interface=None):
+    """
+    Create an OutputPublisher writing model outputs to their PVs through K2EG.
+
+    Pass the input interface as `k2eg_interface` when inputs are read through K2EG, so
+    both share one K2EG client. Otherwise a new K2EGInterface is opened, which the
+    caller closes with ``publisher.interface.close()``.
+    """
+    from interface.k2eg_interface import K2EGInterface
+    from output_publisher import OutputPublisher
+
+    return OutputPublisher(
+        k2eg_interface or K2EGInterface("lcls", "snd-online-model"),
+        snd_model.pv_map["output_name"],
+        snd_model.pv_map["output_deadband"],
+    )
+
+
+def setup_metrics(port, snd_model, interface, scheduler, metric_logger):
+    """
+    Serve loop metrics in the Prometheus text format on `port`.
+
+    Covers stage latencies and events of `run_iteration` and `SNDModel._evaluate`
+    (including re-initializations), per-PV age and connection failures of the EPICS
+    interface, the scheduler queue lag, the MLflow logging backlog and process RSS.
+
+    Returns
+    -------
+    MetricsRegistry
+        The registry, to be passed as the timer of run_iteration.
+    """
+    from metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    snd_model.set_stage_timer(registry)
+
+    def collect_loop():
+        lag = scheduler.lags[-1] if scheduler.lags else float("nan")
+        yield ("snd_queue_lag_seconds", "gauge", "Queue lag of the last iteration.", [({}, lag)])
+        yield (
+            "snd_mlflow_backlog_records",
+            "gauge",
+            "Records waiting to be logged to MLflow, queued or spooled.",
+            [({}, metric_logger.backlog)],
+        )
+        yield (
+            "snd_stale_working_point",
+            "gauge",
+            "Whether outputs come from the previous working point while a new SND is built.",
+            [({}, snd_model.stale_working_point)],
+        )
+        cache = snd_model.snd_cache.stats()
+        yield (
+            "snd_cache_events_total",
+            "counter",
+            "SND instance cache hits, misses and evictions.",
+            [({"event": k}, cache[k]) for k in ("hits", "misses", "evictions")],
+        )
+
+    registry.add_collector(collect_loop)
+
+    if hasattr(interface, "pv_status"):
+
+        def collect_pvs():
+            status = interface.pv_status()
+            yield (
+                "snd_pv_age_seconds",
+                "gauge",
+                "Seconds since the timestamp of the last value of each input PV.",
+                [({"pv": pv}, s["age"]) for pv, s in status.items()],
+            )
+            yield (
+                "snd_pv_connected",
+                "gauge",
+                "Whether each input PV is connected.",
+                [({"pv": pv}, s["connected"]) for pv, s in status.items()],
+            )
+            yield (
+                "snd_pv_connection_failures_total",
+                "counter",
+                "Connection failures of each input PV.",
+                [({"pv": pv}, s["failures"]) for pv, s in status.items()],
+            )
+
+        registry.add_collector(collect_pvs)
+
+    registry.serve(port)
+    return registry
+
+
+def setup_surrogate(snd_model, path, keep_pool=False):
+    """
+    Load the surrogate at `path`, or train it at the current working point and save it there.
+
+    Training evaluates on the SND worker pool, which is shut down afterwards unless
+    `keep_pool` is set, e.g. because uncertainty sampling reuses it.
+    """
+    import os
+    from model.surrogate import PolynomialSurrogate
+
+    if os.path.exists(path):
+        logger.info("Loading surrogate from %s.", path)
+        snd_model.surrogate = PolynomialSurrogate.load(path)
+    else:
+        logger.info("No surrogate at %s, training a new one.", path)
+        snd_model.train_surrogate().save(path)
+        if not keep_pool:
+            snd_model.close_pool()
+
+
+def uncertainty_metrics(spread):
+    """
+    Flatten a SNDModel.uncertainty result into metric names and values.
+
+    Returns
+    -------
+    tuple of (tuple of str, list of float)
+        ``<output>_mean``, ``<output>_std`` and ``<output>_p<percentile>`` per output,
+        ``uncertainty_n_samples`` and ``uncertainty_skipped`` (0). If sampling was
+        skipped (`spread` is None), only ``uncertainty_skipped`` (1).
+    """
+    if spread is None:
+        return ("uncertainty_skipped",), [1]
+    names = [f"{name}_mean" for name in spread["outputs"]]
+    names += [f"{name}_std" for name in spread["outputs"]]
+    values = spread["mean"].tolist() + spread["std"].tolist()
+    for p, percentile in spread["percentiles"].items():
+        names += [f"{name}_p{p}" for name in spread["outputs"]]
+        values += percentile.tolist()
+    return (
+        tuple(names) + ("uncertainty_n_samples", "uncertainty_skipped"),
+        values + [spread["n_samples"], 0],
+    )
+
+
+def update_working_point_defaults(snd_model, t1_tth, delay):
+    """
+    Set the t1_tth/delay defaults to a new working point and re-center the motor inputs.
+
+    The defaults are what run_iteration compares incoming t1_tth/delay against, and the
+    motor ranges are used for input validation (which only throws a warning).
+    """
+    index = snd_model.get_input_state().index
+    snd_model.input_variables[index["t1_tth"]].default_value = t1_tth
+    snd_model.input_variables[index["delay"]].default_value = delay
+    logger.info("Updating default values for all motors based on new t1_tth/delay.")
+    snd_model.update_input_ranges()
+
+
+def run_iteration(
+    snd_model,
+    interface,
+    input_vars,
+    interface_name,
+    metric_logger=None,
+    publisher=None,
+    timer=None,
+    background_reinit=False,
+    uncertainty_samples=0,
+    uncertainty_budget=0.3,
+):
     """
     Run a single iteration of the SNDModel evaluation using the specified interface.
 
@@ -64,104 +280,230 @@ def run_iteration(snd_model, interface, input_vars, interface_name):
     snd_model : SNDModel
         The SNDModel instance to evaluate.
     interface : object
-        The interface instance (TestInterface or EPICSInterface) for input retrieval.
+        The interface instance (TestInterface, EPICSInterface, K2EGInterface or
+        ReplayInterface) for input retrieval.
     input_vars : list
         List of input variable names or PVs, depending on the interface.
     interface_name : str
-        The name of the interface to use ('test' or 'epics').
+        The name of the interface to use ('test', 'epics', 'k2eg' or 'replay').
+    metric_logger : AsyncMetricLogger, optional
+        Background logger for inputs and outputs. If None, metrics are logged
+        synchronously with mlflow.log_metrics.
+    publisher : OutputPublisher, optional
+        Publisher writing the outputs to PVs. If None, outputs are not published.
+    timer : StageTimer, optional
+        Timer recording the duration of each stage of the iteration.
+    background_reinit : bool, optional
+        Whether to build the SND for a new t1_tth/delay in the background and keep
+        evaluating with the current one, flagged as ``stale_working_point``, until it
+        is ready (default is False: re-initialize before evaluating).
+    uncertainty_samples : int, optional
+        Number of Monte Carlo samples of the input readback noise to evaluate per
+        iteration; their output mean, standard deviation and percentiles are logged
+        alongside the outputs (default is 0: disabled).
+    uncertainty_budget : float, optional
+        Maximum time in seconds spent on the Monte Carlo samples (default is 0.3).
 
     Returns
     -------
     None
     """
+    state = snd_model.get_input_state()
+    index = state.index
+
     # Get the input variable from the interface
-    input_dict = interface.get_input_variables(input_vars)
-    if interface_name == "epics":
-        # Map PVs back to model input names
-        logger.debug(f"Raw input values from EPICS: {MultiLineDict(input_dict)}")
-        posixseconds = int(max(d["posixseconds"] for d in input_dict.values()))
-        input_dict = {
-            snd_model.input_names[i]: input_dict[pv]["value"]
-            for i, pv in enumerate(input_vars)
-        }
-    logger.debug("Input values: %s", MultiLineDict(input_dict))
+    with stage(timer, "acquire"):
+        pv_values = interface.get_input_variables(input_vars)
+        if interface_name in PV_INTERFACES:
+            # Map PVs back to model input names, in input_names order
+            check_pv_values(pv_values)
+            state.load_pv_values(pv_values, input_vars)
+        else:
+            state.load_dict(pv_values)
+
+    if interface_name in PV_INTERFACES:
+        # Transform input from PV units to simulation units, in place
+        with stage(timer, "transform"):
+            snd_model.input_transform(state)
+
+    if background_reinit:
+        working_point = snd_model.swap_ready_working_point()
+        if working_point is not None:
+            logger.info("Swapped in SND for t1_tth=%s, delay=%s.", *working_point)
+            if timer is not None:
+                timer.increment("reinitializations")
+            update_working_point_defaults(snd_model, *working_point)
 
     # Check if t1_tth or delay have changed too much from the default value
     # if so, we need to reinitialize the model and obtain new defaults and ranges
     delay_change_threshold = 0.1  # ps
-    delay_idx = snd_model.input_names.index("delay")
-    t1_tth_idx = snd_model.input_names.index("t1_tth")
     theta_change_threshold = 3.49e-06 # radians
-    t1_tth_input_sim_units = np.deg2rad(input_dict["t1_tth"]) if interface_name == "epics" else input_dict["t1_tth"]
-
-    if (
-        abs(t1_tth_input_sim_units - snd_model.input_variables[t1_tth_idx].default_value)
-        > theta_change_threshold
-        or abs(input_dict["delay"] - snd_model.input_variables[delay_idx].default_value)
-        > delay_change_threshold
-    ):
-        logger.info("t1_tth or delay has changed significantly, reinstantiating model.")
-        logger.info(
-            f"Old t1_tth: {snd_model.input_variables[t1_tth_idx].default_value}."
-        )
-        logger.info(
-            f"New t1_tth: {t1_tth_input_sim_units}."
-        )
-        logger.info(
-            f"Old delay: {snd_model.input_variables[delay_idx].default_value}."
-        )
-        logger.info(
-            f"New delay: {input_dict['delay']}."
-        )
-        snd_model.initialize_model(
-            two_theta=t1_tth_input_sim_units, delay=input_dict["delay"]
-        )
+    t1_tth_var = snd_model.input_variables[index["t1_tth"]]
+    delay_var = snd_model.input_variables[index["delay"]]
+    t1_tth = state["t1_tth"]
+    delay = state["delay"]
+    changed = (
+        abs(t1_tth - t1_tth_var.default_value) > theta_change_threshold
+        or abs(delay - delay_var.default_value) > delay_change_threshold
+    )
 
-        # Set new default energy and delay
-        snd_model.input_variables[t1_tth_idx].default_value = t1_tth_input_sim_units
-        snd_model.input_variables[delay_idx].default_value = input_dict["delay"]
-
-        # Update default value for each motor/each input based on new energy
-        # this is needed here for validation of the input range (will only throw a warning)
-        logger.info("Updating default values for all motors based on new t1_tth/delay.")
-        # Disable validation for all inputs temporarily, since these are not scaled to simulation units yet
-        snd_model.input_validation_config = {
-            k: "none" for k in snd_model.input_names
-        }
-        for name, motor in snd_model.snd.motor_dict.items():
-            snd_model.input_variables[
-                snd_model.input_names.index(name)
-            ].default_value = motor.wm()
-            snd_model.input_variables[snd_model.input_names.index(name)].value_range = [
-                motor.wm() - 0.0001,
-                motor.wm() + 0.0001,
-            ]
+    if background_reinit:
+        if changed or snd_model.stale_working_point:
+            # Builds (or supersedes, or cancels) in the background, returns at once
+            snd_model.request_working_point(t1_tth, delay)
+    elif changed:
+        logger.info("t1_tth or delay has changed significantly, reinstantiating model.")
+        logger.info(f"Old t1_tth: {t1_tth_var.default_value}.")
+        logger.info(f"New t1_tth: {t1_tth}.")
+        logger.info(f"Old delay: {delay_var.default_value}.")
+        logger.info(f"New delay: {delay}.")
+        if timer is not None:
+            timer.increment("reinitializations")
+        with stage(timer, "reinitialize"):
+            snd_model.initialize_model(two_theta=t1_tth, delay=delay)
+        update_working_point_defaults(snd_model, t1_tth, delay)
 
         if interface_name == "test":
-            # Get new input variables from the interface, skipping t1_tth and delay
-            input_dict = interface.get_input_variables(
-                [x for x in input_vars if x.name not in ["t1_tth", "delay"]]
+            # Draw new values for the other inputs; t1_tth and delay keep the values
+            # the model was built at
+            state.load_dict(
+                interface.get_input_variables(
+                    [x for x in input_vars if x.name not in ["t1_tth", "delay"]]
+                )
             )
-            input_dict["t1_tth"] = t1_tth_input_sim_units # add back default t1_tth
-            logger.debug("Updated input values: %s", MultiLineDict(input_dict))
 
     # Evaluate the model with the input
-    snd_model.input_validation_config = {k: "warn" for k in snd_model.input_names}
-    if interface_name == "epics":
-        # Transform input from PV units to simulation units
-        input_dict = snd_model.input_transform(input_dict)
-        logger.debug("Transformed input values: %s", MultiLineDict(input_dict))
+    with stage(timer, "evaluate"):
+        output = snd_model.evaluate(state)
+    stale = snd_model.stale_working_point
+    if stale and timer is not None:
+        timer.increment("stale_evaluations")
+
+    extra_names, extra_values = ("stale_working_point",), [stale]
+    if uncertainty_samples:
+        with stage(timer, "uncertainty"):
+            spread = snd_model.uncertainty(
+                state, uncertainty_samples, time_budget=uncertainty_budget
+            )
+        names, values = uncertainty_metrics(spread)
+        extra_names += names
+        extra_values += values
 
-    # Evaluate the model
-    output = snd_model.evaluate(input_dict)
+    if publisher is not None:
+        with stage(timer, "publish"):
+            publisher.publish(output)
 
     # Log input after transformation and output
     # one line to log at same timestamp
-    mlflow.log_metrics(
-        input_dict | output,
-        timestamp=(posixseconds * 1000 if interface_name == "epics" else None),
+    timestamp = (
+        int(state.posixseconds) * 1000 if interface_name in PV_INTERFACES else None
+    )
+    with stage(timer, "log"):
+        if metric_logger is None:
+            import mlflow
+
+            mlflow.log_metrics(
+                dict(state) | output | dict(zip(extra_names, extra_values)),
+                timestamp=timestamp,
+            )
+        else:
+            metric_logger.log_arrays(
+                state.names + tuple(output) + extra_names,
+                state.vector.tolist() + list(output.values()) + extra_values,
+                timestamp=timestamp,
+            )
+    if iteration_logger.isEnabledFor(logging.INFO):
+        iteration_logger.info(
+            "iteration",
+            extra={
+                "fields": {
+                    "interface": interface_name,
+                    "posixseconds": state.posixseconds,
+                    "raw": (
+                        {pv: d["value"] for pv, d in pv_values.items()}
+                        if interface_name in PV_INTERFACES
+                        else None
+                    ),
+                    "inputs": dict(zip(state.names, state.vector.tolist())),
+                    "outputs": output,
+                    "extra": dict(zip(extra_names, extra_values)),
+                }
+            },
+        )
+
+
+def setup_mlflow_run(tracking_uri, timer=None):
+    """
+    Set up the MLflow experiment and run name.
+
+    Contacting the tracking server is slow, so main runs this in a background thread
+    while the model is being built. MLflow is imported on the main thread first (see
+    `import_mlflow`), so the thread mostly waits on the network instead of importing
+    modules concurrently with the model imports.
+    """
+    with stage(timer, "mlflow setup (background)"):
+        from mlflow_run import MLflowRun
+
+        return MLflowRun(tracking_uri=tracking_uri)
+
+
+def import_mlflow(tracking_uri):
+    """
+    Import MLflow and the modules its client loads on first use, on the calling thread.
+
+    Setting the tracking URI loads MLflow's tracing modules, which would otherwise be
+    imported by the first client call in `setup_mlflow_run`.
+    """
+    import mlflow.tracking
+    import mlflow_run
+
+    mlflow.set_tracking_uri(tracking_uri)
+
+
+def import_startup_modules(timer):
+    """Import the heavy dependencies one at a time, timing each."""
+    import importlib
+    import importlib.util
+
+    for name in STARTUP_MODULES:
+        try:
+            found = importlib.util.find_spec(name) is not None
+        except ModuleNotFoundError:
+            found = False
+        if found:
+            with stage(timer, f"import {name}"):
+                importlib.import_module(name)
+
+
+def log_startup_profile(timer):
+    """Log the startup time breakdown recorded with --profile-startup."""
+    lines = (
+        f"  {name:<60}{samples[-1]:8.3f} s" for name, samples in timer.samples.items()
     )
-    logger.debug("Output values: %s", MultiLineDict(output))
+    logger.info("Startup profile:\n%s", "\n".join(lines))
+
+
+def run_replay(iteration):
+    """
+    Run iterations back to back, as fast as the model can consume replayed snapshots,
+    until the snapshot file is exhausted.
+
+    Parameters
+    ----------
+    iteration : callable
+        Called with no arguments for each iteration.
+    """
+    n_iterations = 0
+    while True:
+        try:
+            iteration()
+        except EOFError:
+            logger.info("Replay finished after %d snapshots.", n_iterations)
+            return
+        except Exception as e:
+            # Recorded disconnects and similar are skipped, not retried
+            logger.error(f"An error occurred: {e}")
+        n_iterations += 1
 
 
 def main():
@@ -174,6 +516,9 @@ def main():
     You can run the script with:
         python run.py --interface test
         python run.py --interface epics
+        python run.py --interface epics --record recordings/shift1
+        python run.py --interface replay --replay-file recordings/shift1
+        python run.py --interface scan --scan-spec scan.yml --scan-output scans/run1
 
     Returns
     -------
@@ -185,31 +530,283 @@ def main():
     parser.add_argument(
         "--interface",
         "-i",
-        choices=["test", "epics"],
+        choices=["test", "epics", "k2eg", "replay", "scan"],
         required=True,
-        help="Interface to use",
+        help="Interface to use, or 'scan' for an offline parameter scan",
+    )
+    parser.add_argument(
+        "--monitor",
+        action="store_true",
+        help="Use CA monitors instead of blocking gets (epics interface only)",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        metavar="SECONDS",
+        help="With --monitor, warn about PVs whose timestamp is older than this "
+        "(default: no age limit). Readbacks of motors at rest only update on change",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="DIR",
+        help="Record every input snapshot to a snapshot file in DIR (epics and k2eg "
+        "interfaces only)",
+    )
+    parser.add_argument(
+        "--replay-file",
+        metavar="DIR",
+        help="Snapshot file to replay (replay interface only)",
+    )
+    parser.add_argument(
+        "--scan-spec",
+        metavar="PATH",
+        help="YAML scan spec (scan interface only, see scan.py)",
+    )
+    parser.add_argument(
+        "--scan-output",
+        metavar="DIR",
+        help="Directory for the scan results; an interrupted scan resumes from it "
+        "(scan interface only)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of SND worker processes for scans and uncertainty sampling "
+        "(default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--min-rate",
+        type=float,
+        default=1.0,
+        help="Heartbeat evaluation rate in Hz when inputs do not change (default: 1)",
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=10.0,
+        help="Maximum evaluation rate in Hz on input changes (default: 10)",
+    )
+    parser.add_argument(
+        "--surrogate",
+        metavar="PATH",
+        help="Answer evaluations from a polynomial surrogate stored at PATH (.npz), "
+        "falling back to the full SND propagation. Trained and saved if PATH does not exist",
+    )
+    parser.add_argument(
+        "--publish",
+        action="store_true",
+        help="Publish model outputs to PVs through K2EG",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve Prometheus metrics on this port (default: disabled)",
+    )
+    parser.add_argument(
+        "--tracking-uri",
+        default="https://ard-mlflow.slac.stanford.edu",
+        help="MLflow tracking URI, e.g. file:./mlruns for a local file store",
+    )
+    parser.add_argument(
+        "--uncertainty-samples",
+        type=int,
+        default=0,
+        help="Monte Carlo samples of the input readback noise (input_noise in "
+        "snd_model.yml) evaluated per iteration for output error bars (default: off)",
+    )
+    parser.add_argument(
+        "--uncertainty-budget",
+        type=float,
+        default=0.3,
+        help="Maximum seconds spent on the Monte Carlo samples per iteration "
+        "(default: 0.3)",
+    )
+    parser.add_argument(
+        "--sync-reinit",
+        action="store_true",
+        help="Re-initialize the model before evaluating on t1_tth/delay changes, instead "
+        "of building it in the background (always the case with the test and replay "
+        "interfaces)",
+    )
+    parser.add_argument(
+        "--images",
+        action="store_true",
+        help="Export the 2D beam profiles of the planes in image_outputs (snd_model.yml) "
+        "to shared-memory ring buffers named <image prefix>_<plane>",
+    )
+    parser.add_argument(
+        "--image-prefix",
+        default="snd",
+        help="Prefix of the --images shared-memory names, unique per running model "
+        "(default: snd)",
+    )
+    parser.add_argument(
+        "--thumbnail-every",
+        type=int,
+        default=0,
+        metavar="N",
+        help="With --images, log profile thumbnails as MLflow artifacts every N "
+        "iterations (default: off)",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        help="Level of snd_run.log and the console (default: INFO)",
+    )
+    parser.add_argument(
+        "--no-iteration-log",
+        action="store_true",
+        help="Do not write the per-iteration inputs and outputs to snd_iterations.jsonl",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Log a breakdown of import and initialization times after the first "
+        "evaluation",
     )
     args = parser.parse_args()
+    if args.record and args.interface not in ("epics", "k2eg"):
+        parser.error("--record requires --interface epics or k2eg")
+    if args.max_age is not None and not (args.monitor and args.interface == "epics"):
+        parser.error("--max-age requires --interface epics with --monitor")
+    setup_logging(level=args.log_level)
+    if args.no_iteration_log:
+        iteration_logger.setLevel(logging.WARNING)
     logger.info("Running with interface: %s", args.interface)
-    snd_model = SNDModel("model/snd_model.yml")
-    snd_model.pv_map = pv_mapping()
+    startup = StageTimer() if args.profile_startup else None
+
+    mlflow_future = None
+    if args.interface != "scan":
+        with stage(startup, "import mlflow"):
+            import_mlflow(args.tracking_uri)
+        # Set up MLflow in the background while the model is being built
+        from concurrent.futures import ThreadPoolExecutor
+
+        executor = ThreadPoolExecutor(1, thread_name_prefix="mlflow-setup")
+        mlflow_future = executor.submit(setup_mlflow_run, args.tracking_uri, startup)
+        executor.shutdown(wait=False)
+
+    if startup is not None:
+        import_startup_modules(startup)
+    with stage(startup, "import model.snd_model"):
+        from model.snd_model import SNDModel
+    with stage(startup, "construct SNDModel"):
+        snd_model = SNDModel("model/snd_model.yml")
+        snd_model.pv_map = pv_mapping()
+    if args.interface == "scan":
+        from scan import run_scan
+
+        if not (args.scan_spec and args.scan_output):
+            parser.error("--interface scan requires --scan-spec and --scan-output")
+        run_scan(snd_model, args.scan_spec, args.scan_output, n_workers=args.workers)
+        return
+    if args.uncertainty_samples:
+        # Start the SND workers and build their SND instances now, rather than in the
+        # first iterations' time budget
+        with stage(startup, "warm SND pool"):
+            snd_model.get_pool(args.workers).warm()
+    if args.surrogate:
+        with stage(startup, "surrogate"):
+            setup_surrogate(
+                snd_model, args.surrogate, keep_pool=bool(args.uncertainty_samples)
+            )
     input_vars = get_input_vars(snd_model, args.interface)
-    interface = get_interface(
-        args.interface, input_vars if args.interface == "epics" else None
-    )
-
-    with MLflowRun() as run:
-        while True:
-            try:
-                run_iteration(snd_model, interface, input_vars, args.interface)
-                time.sleep(1)
-            except KeyboardInterrupt:
-                logger.info("Keyboard interrupt received. Exiting.")
-                exit(0)
-            except Exception as e:
-                logger.error(f"An error occurred: {e}")
-                logger.info("Retrying in 5 seconds...")
-                time.sleep(5)
+    with stage(startup, "create interface"):
+        interface = get_interface(
+            args.interface,
+            input_vars if args.interface in ("epics", "k2eg") else None,
+            monitor=args.monitor,
+            max_age=args.max_age,
+            replay_file=args.replay_file,
+        )
+
+    publisher = None
+    if args.publish:
+        publisher = get_output_publisher(
+            snd_model, interface if args.interface == "k2eg" else None
+        )
+    if args.images:
+        snd_model.enable_image_export(prefix=args.image_prefix)
+
+    from mlflow_logger import AsyncMetricLogger, ThumbnailLogger
+    from scheduler import IterationScheduler
+
+    scheduler = IterationScheduler(min_rate=args.min_rate, max_rate=args.max_rate)
+    if args.monitor:
+        # Evaluate as soon as a monitored PV changes, not just on the heartbeat
+        interface.on_change = scheduler.notify
+    # Keep the unwrapped interface for PV health metrics
+    pv_source = interface
+    if args.record:
+        from interface.replay_interface import RecordingInterface
+
+        interface = RecordingInterface(interface, args.record, input_vars)
+
+    with stage(startup, "wait for mlflow setup"):
+        mlflow_run = mlflow_future.result()
+    with mlflow_run as run, AsyncMetricLogger(run.info.run_id) as metric_logger:
+        registry = None
+        if args.metrics_port is not None:
+            registry = setup_metrics(
+                args.metrics_port, snd_model, pv_source, scheduler, metric_logger
+            )
+
+        # The test interface redraws inputs around the new working point after a
+        # synchronous re-initialization, and replay runs snapshots back to back, where
+        # evaluations on a stale SND would depend on thread timing. Both always
+        # re-initialize synchronously
+        background_reinit = not (args.sync_reinit or args.interface in ("test", "replay"))
+        thumbnail_logger = None
+        if args.images and args.thumbnail_every > 0:
+            thumbnail_logger = ThumbnailLogger(run.info.run_id)
+        n_iterations = 0
+
+        def iteration():
+            nonlocal startup, n_iterations
+            with stage(registry, "iteration"), stage(startup, "first evaluation"):
+                run_iteration(
+                    snd_model,
+                    interface,
+                    input_vars,
+                    args.interface,
+                    metric_logger,
+                    publisher,
+                    timer=registry,
+                    background_reinit=background_reinit,
+                    uncertainty_samples=args.uncertainty_samples,
+                    uncertainty_budget=args.uncertainty_budget,
+                )
+            n_iterations += 1
+            if thumbnail_logger is not None and n_iterations % args.thumbnail_every == 0:
+                thumbnail_logger.log(snd_model.image_exporter.thumbnails(), n_iterations)
+            if startup is not None:
+                elapsed = time.perf_counter() - START_TIME
+                startup.observe("time to first evaluation", elapsed)
+                log_startup_profile(startup)
+                startup = None
+
+        try:
+            if args.interface == "replay":
+                run_replay(iteration)
+            else:
+                scheduler.run(iteration)
+        except KeyboardInterrupt:
+            logger.info("Keyboard interrupt received. Exiting.")
+            logger.info("Queue lag percentiles (s): %s", scheduler.lag_percentiles())
+        finally:
+            if publisher is not None:
+                publisher.close()
+                if publisher.interface is not pv_source:
+                    publisher.interface.close()
+            if args.record:
+                interface.close()
+            if args.interface == "k2eg":
+                pv_source.close()
+            if registry is not None:
+                registry.close()
+            if thumbnail_logger is not None:
+                thumbnail_logger.close()
+            snd_model.close_image_export()
 
 
 if __name__ == "__main__":
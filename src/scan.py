@@ -0,0 +1,258 @@
+"""
+scan.py
+-------
+Offline parameter scans of the SND model.
+
+A scan samples a subset of the inputs on a grid, a Latin hypercube or uniformly at
+random, optionally at several t1_tth/delay working points, evaluates the samples on a
+pool of SND workers and streams the results to a directory of chunk files. Every chunk
+is written atomically once complete, so a scan that is interrupted resumes where it
+stopped when run again with the same spec and output directory.
+
+Scan spec (YAML), in simulation units:
+
+    method: lhs            # grid, lhs or random
+    n_samples: 2000        # lhs and random only
+    seed: 0
+    chunk_size: 250
+    variables:
+      t2_x: {low: -0.001, high: 0.001, relative: true}   # offset from the default
+      t3_th: {low: 0.3466, high: 0.3469, n: 21}          # n: grid points
+    working_points:        # optional, default is the model's current working point
+      - {t1_tth: 0.6935635, delay: 0.28}
+      - {t1_tth: 0.6935635, delay: 100}
+
+Inputs not in `variables` stay at their default value at each working point.
+
+Run from the src/ directory:
+    python run.py --interface scan --scan-spec scan.yml --scan-output scans/commissioning
+"""
+
+import json
+import logging
+import os
+from concurrent.futures import as_completed
+
+import numpy as np
+import yaml
+
+logger = logging.getLogger(__name__)
+
+SCAN_METHODS = ("grid", "lhs", "random")
+
+
+def load_scan_spec(path):
+    """Load a scan spec from a YAML file and check it."""
+    with open(path, "r") as file:
+        spec = yaml.safe_load(file)
+    if spec.get("method") not in SCAN_METHODS:
+        raise ValueError(
+            f"Scan method must be one of {SCAN_METHODS}, got {spec.get('method')!r}."
+        )
+    if not spec.get("variables"):
+        raise ValueError("Scan spec has no variables.")
+    if spec["method"] == "grid":
+        missing = [name for name, v in spec["variables"].items() if "n" not in v]
+        if missing:
+            raise ValueError(f"Grid scan variables need a number of points n: {missing}")
+    elif "n_samples" not in spec:
+        raise ValueError(f"{spec['method']} scans need n_samples.")
+    return spec
+
+
+def sample_unit_cube(spec):
+    """
+    Draw the scan samples in the unit cube.
+
+    Parameters
+    ----------
+    spec : dict
+        Scan spec, see the module docstring.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n_samples, n_variables) with values in [0, 1], columns in the
+        order of ``spec["variables"]``.
+    """
+    variables = spec["variables"]
+    rng = np.random.default_rng(spec.get("seed", 0))
+    if spec["method"] == "grid":
+        axes = [np.linspace(0.0, 1.0, v["n"]) for v in variables.values()]
+        return np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(axes))
+    n = spec["n_samples"]
+    if spec["method"] == "random":
+        return rng.uniform(size=(n, len(variables)))
+    # Latin hypercube: one sample per stratum in every dimension
+    strata = np.stack([rng.permutation(n) for _ in variables], axis=1)
+    return (strata + rng.uniform(size=strata.shape)) / n
+
+
+def scan_rows(snd_model, spec, unit_samples, working_point):
+    """
+    Build the full input rows of a scan at one working point.
+
+    Re-initializes `snd_model` at the working point, so motor defaults (and relative
+    variables) are taken at the motor positions of that working point.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n_samples, len(input_names)) in simulation units.
+    """
+    t1_tth, delay = working_point
+    snd_model.initialize_model(two_theta=t1_tth, delay=delay)
+    snd_model.update_input_ranges()
+    base = np.array([var.default_value for var in snd_model.input_variables], dtype=float)
+    base[snd_model.validator.index["t1_tth"]] = t1_tth
+    base[snd_model.validator.index["delay"]] = delay
+
+    rows = np.tile(base, (len(unit_samples), 1))
+    for j, (name, v) in enumerate(spec["variables"].items()):
+        col = snd_model.validator.index[name]
+        values = v["low"] + unit_samples[:, j] * (v["high"] - v["low"])
+        rows[:, col] = base[col] + values if v.get("relative") else values
+    return rows
+
+
+def chunk_path(output_dir, wp_index, chunk_index):
+    return os.path.join(output_dir, f"wp{wp_index:03d}_chunk{chunk_index:05d}.npz")
+
+
+def write_chunk(path, inputs, outputs):
+    """Write a chunk file atomically, so a chunk on disk is always complete."""
+    tmp_path = path[: -len(".npz")] + ".tmp.npz"
+    np.savez(tmp_path, inputs=inputs, outputs=outputs)
+    os.replace(tmp_path, path)
+
+
+def prepare_output(output_dir, spec, snd_model):
+    """Create the output directory, or check that it holds a scan of the same spec."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {
+        "spec": spec,
+        "input_names": list(snd_model.input_names),
+        "output_names": list(snd_model.output_names),
+    }
+    path = os.path.join(output_dir, "scan.json")
+    if os.path.exists(path):
+        with open(path, "r") as file:
+            if json.load(file) != json.loads(json.dumps(manifest)):
+                raise ValueError(
+                    f"{output_dir} holds a different scan, use a new output directory."
+                )
+        logger.info("Resuming scan in %s.", output_dir)
+    else:
+        with open(path, "w") as file:
+            json.dump(manifest, file, indent=2)
+
+
+def run_scan(snd_model, spec_path, output_dir, n_workers=None):
+    """
+    Run (or resume) a parameter scan and write its results to `output_dir`.
+
+    Parameters
+    ----------
+    snd_model : SNDModel
+        The model to scan. It is left initialized at the last working point.
+    spec_path : str
+        Path to the YAML scan spec.
+    output_dir : str
+        Directory for the manifest (``scan.json``) and the chunk files.
+    n_workers : int, optional
+        Number of SND worker processes (default is the number of CPUs).
+
+    Returns
+    -------
+    int
+        Number of chunks that failed and will be retried on the next run.
+    """
+    spec = load_scan_spec(spec_path)
+    prepare_output(output_dir, spec, snd_model)
+    unit_samples = sample_unit_cube(spec)
+    chunk_size = spec.get("chunk_size", 250)
+    default_point = tuple(
+        snd_model.input_variables[snd_model.validator.index[name]].default_value
+        for name in ("t1_tth", "delay")
+    )
+    working_points = [
+        (wp["t1_tth"], wp["delay"]) for wp in spec.get("working_points") or []
+    ] or [default_point]
+    n_chunks = -(-len(unit_samples) // chunk_size)
+    logger.info(
+        "Scanning %d samples at %d working point(s) in %d chunks each.",
+        len(unit_samples),
+        len(working_points),
+        n_chunks,
+    )
+
+    failed = 0
+    try:
+        for wp_index, working_point in enumerate(working_points):
+            pending = [
+                c
+                for c in range(n_chunks)
+                if not os.path.exists(chunk_path(output_dir, wp_index, c))
+            ]
+            if not pending:
+                continue
+            rows = scan_rows(snd_model, spec, unit_samples, working_point)
+            pool = snd_model.get_pool(n_workers)
+            futures = {}
+            for c in pending:
+                block = rows[c * chunk_size : (c + 1) * chunk_size]
+                futures[pool.submit(snd_model.input_names, block)] = (c, block)
+            for done, future in enumerate(as_completed(futures), start=1):
+                c, block = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    logger.error(f"Chunk {c} at working point {working_point} failed: {e}")
+                    failed += 1
+                    continue
+                outputs = np.array(
+                    [[r[name] for name in snd_model.output_names] for r in results]
+                )
+                write_chunk(chunk_path(output_dir, wp_index, c), block, outputs)
+                logger.info(
+                    "Working point %d/%d: %d/%d chunks done.",
+                    wp_index + 1,
+                    len(working_points),
+                    done,
+                    len(pending),
+                )
+    finally:
+        snd_model.close_pool()
+    if failed:
+        logger.warning("%d chunks failed; run the scan again to retry them.", failed)
+    return failed
+
+
+def load_scan(output_dir):
+    """
+    Load the completed chunks of a scan.
+
+    Returns
+    -------
+    tuple of (dict, numpy.ndarray, numpy.ndarray)
+        The manifest (spec, input and output names), and the inputs and outputs of
+        all completed chunks, e.g. as surrogate training data.
+    """
+    with open(os.path.join(output_dir, "scan.json"), "r") as file:
+        manifest = json.load(file)
+    names = sorted(
+        name
+        for name in os.listdir(output_dir)
+        if name.endswith(".npz") and not name.endswith(".tmp.npz")
+    )
+    inputs, outputs = [], []
+    for name in names:
+        with np.load(os.path.join(output_dir, name)) as chunk:
+            inputs.append(chunk["inputs"])
+            outputs.append(chunk["outputs"])
+    n_inputs, n_outputs = len(manifest["input_names"]), len(manifest["output_names"])
+    return (
+        manifest,
+        np.concatenate(inputs) if inputs else np.zeros((0, n_inputs)),
+        np.concatenate(outputs) if outputs else np.zeros((0, n_outputs)),
+    )
@@ -0,0 +1,145 @@
+"""
+scheduler.py
+------------
+Event-driven scheduling of model iterations.
+
+Classes
+-------
+IterationScheduler
+    Runs an iteration when inputs change, coalescing bursts of updates, bounded by a
+    maximum rate, with a drift-free heartbeat at a minimum rate.
+"""
+
+import collections
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class IterationScheduler:
+    """
+    Schedule model iterations on input change with a heartbeat fallback.
+
+    Input sources call `notify` whenever a value changes. A burst of notifications
+    is coalesced into a single iteration and change-triggered iterations never start
+    closer together than ``1 / max_rate``. A heartbeat iteration also runs on a fixed
+    ``1 / min_rate`` grid that does not drift with evaluation time, so the model is
+    evaluated at least at `min_rate` even when nothing changes.
+
+    Parameters
+    ----------
+    min_rate : float, optional
+        Heartbeat rate in Hz, used when no input changes (default is 1).
+    max_rate : float, optional
+        Maximum iteration rate in Hz (default is 10).
+    coalesce_window : float, optional
+        Time in seconds to wait after the first notification for more updates to
+        arrive before evaluating (default is 0.05).
+    error_delay : float, optional
+        Time in seconds to wait after a failed iteration (default is 5).
+    """
+
+    def __init__(self, min_rate=1.0, max_rate=10.0, coalesce_window=0.05, error_delay=5.0):
+        self.heartbeat_period = 1.0 / min_rate
+        self.min_period = 1.0 / max_rate
+        self.coalesce_window = coalesce_window
+        self.error_delay = error_delay
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.pending_since = None
+        self.iterations = 0
+        # Time from the first pending notification (or heartbeat tick) to iteration start
+        self.lags = collections.deque(maxlen=1000)
+
+    def notify(self, *args, **kwargs):
+        """Signal that an input changed. Safe to call from any thread or as a CA callback."""
+        with self.lock:
+            if self.pending_since is None:
+                self.pending_since = time.monotonic()
+        self.event.set()
+
+    def wait(self, next_tick, last_start):
+        """
+        Block until the next iteration is due.
+
+        Parameters
+        ----------
+        next_tick : float
+            Monotonic time of the next heartbeat tick.
+        last_start : float
+            Monotonic start time of the previous iteration.
+
+        Returns
+        -------
+        tuple of (str, float)
+            The trigger ('change' or 'heartbeat') and the monotonic time it became due.
+        """
+        if self.event.wait(timeout=max(0.0, next_tick - time.monotonic())):
+            time.sleep(self.coalesce_window)
+            time.sleep(max(0.0, last_start + self.min_period - time.monotonic()))
+            # Clear before running, so changes during the iteration trigger the next one
+            self.event.clear()
+            with self.lock:
+                due, self.pending_since = self.pending_since, None
+            return "change", due if due is not None else time.monotonic()
+        return "heartbeat", next_tick
+
+    def run(self, iteration):
+        """
+        Run iterations forever.
+
+        Exceptions raised by `iteration` are logged and retried after `error_delay`;
+        KeyboardInterrupt is propagated to the caller.
+
+        Parameters
+        ----------
+        iteration : callable
+            Called with no arguments for each iteration.
+        """
+        last_start = -np.inf
+        origin = next_tick = time.monotonic()
+        while True:
+            trigger, due = self.wait(next_tick, last_start)
+            start = time.monotonic()
+            # Next heartbeat is the first tick on the fixed grid after this start, so
+            # slow iterations skip missed ticks instead of drifting or bunching up
+            ticks = np.floor((start - origin) / self.heartbeat_period) + 1
+            next_tick = origin + ticks * self.heartbeat_period
+            lag = start - due
+            self.lags.append(lag)
+            last_start = start
+            logger.debug("Running %s iteration, queue lag %.3f s.", trigger, lag)
+            try:
+                iteration()
+                self.iterations += 1
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                # One record per failure, so repeats of the same error are rate limited
+                logger.error(
+                    f"An error occurred: {e}. Retrying in {self.error_delay} seconds..."
+                )
+                time.sleep(self.error_delay)
+
+    def lag_percentiles(self, percentiles=(50, 90, 99)):
+        """
+        Return percentiles of the recorded queue lag.
+
+        Parameters
+        ----------
+        percentiles : tuple of float, optional
+            Percentiles to compute (default is (50, 90, 99)).
+
+        Returns
+        -------
+        dict
+            Mapping of percentile to lag in seconds, empty if no iteration ran yet.
+        """
+        if not self.lags:
+            return {}
+        values = np.percentile(np.fromiter(self.lags, dtype=float), percentiles)
+        return dict(zip(percentiles, values))
@@ -0,0 +1,397 @@
+"""
+server.py
+---------
+Local model-serving endpoint for "what if" evaluations of the SND model.
+
+Loads SNDModel once and answers evaluate requests over HTTP, so alignment scripts,
+optimizers and control-room panels do not each pay the lcls_beamline_toolbox import
+and SND construction cost. Requests arriving within a short window are micro-batched
+and evaluated together on the pool of warm SND workers.
+
+Protocol (JSON over HTTP):
+    POST /evaluate  {"inputs": {"t2_x": 0.0001}}            -> {"outputs": {...}}
+    POST /evaluate  {"inputs": [{"t2_x": 0.0001}, {...}]}    -> {"outputs": [{...}, ...]}
+    GET  /health                                             -> {"working_point": [...], ...}
+
+Inputs are in simulation units; inputs left out take their default value. Requests
+must be at the working point (t1_tth, delay) the server was started at.
+
+Run from the src/ directory:
+    python server.py --port 8765 --workers 4
+
+Classes
+-------
+MicroBatcher
+    Collects concurrent row submissions into batches for a single evaluation call.
+ModelServer
+    HTTP server evaluating requests on SNDModel through a MicroBatcher.
+ModelClient
+    Loopback client for ModelServer.
+"""
+
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Micro-batch row submissions from many threads into single evaluation calls.
+
+    The first submission opens a batch; submissions arriving within `batch_window`
+    seconds (up to `max_batch` rows) join it. Submissions arriving while a batch is
+    being evaluated form the next batch.
+
+    Parameters
+    ----------
+    evaluate_rows : callable
+        Called with a 2D array of input rows, returns a dict of output names to 1D
+        arrays with one value per row, e.g. ``SNDModel.evaluate_batch``.
+    batch_window : float, optional
+        Time in seconds to wait for more submissions after the first (default is 0.005).
+    max_batch : int, optional
+        Maximum number of rows in a batch (default is 256).
+    """
+
+    def __init__(self, evaluate_rows, batch_window=0.005, max_batch=256):
+        self.evaluate_rows = evaluate_rows
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.rows = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, name="micro-batcher", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, rows):
+        """
+        Queue input rows for evaluation.
+
+        Parameters
+        ----------
+        rows : numpy.ndarray
+            2D array of input rows.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Future resolving to a dict of output names to 1D arrays, one value per row.
+        """
+        future = Future()
+        self.queue.put((rows, future))
+        return future
+
+    def close(self, timeout=30.0):
+        """Evaluate the submissions already queued and stop the batching thread."""
+        self.stop_event.set()
+        self.thread.join(timeout)
+
+    def _collect(self):
+        """Block for the first submission, then collect a batch behind it."""
+        batch = [self.queue.get(timeout=0.5)]
+        n_rows = len(batch[0][0])
+        deadline = time.monotonic() + self.batch_window
+        while n_rows < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+            n_rows += len(batch[-1][0])
+        return batch
+
+    def _run(self):
+        while not (self.stop_event.is_set() and self.queue.empty()):
+            try:
+                batch = self._collect()
+            except queue.Empty:
+                continue
+            rows = np.concatenate([rows for rows, _ in batch])
+            self.batches += 1
+            self.rows += len(rows)
+            logger.debug("Evaluating %d rows from %d requests.", len(rows), len(batch))
+            try:
+                outputs = self.evaluate_rows(rows)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for request_rows, future in batch:
+                stop = start + len(request_rows)
+                future.set_result(
+                    {name: values[start:stop] for name, values in outputs.items()}
+                )
+                start = stop
+
+
+class ModelServer:
+    """
+    HTTP endpoint evaluating SNDModel on a pool of warm SND workers.
+
+    Parameters
+    ----------
+    snd_model : SNDModel
+        The model to serve, initialized at the working point to serve.
+    port : int, optional
+        Port to listen on (default is 8765).
+    host : str, optional
+        Address to bind (default is loopback only).
+    n_workers : int, optional
+        Number of SND worker processes (default is the number of CPUs).
+    batch_window : float, optional
+        Micro-batching window in seconds (default is 0.005).
+    max_batch : int, optional
+        Maximum number of rows per batch (default is 256).
+    timeout : float, optional
+        Maximum time in seconds to wait for an evaluation (default is 30).
+    """
+
+    def __init__(
+        self,
+        snd_model,
+        port=8765,
+        host="127.0.0.1",
+        n_workers=None,
+        batch_window=0.005,
+        max_batch=256,
+        timeout=30.0,
+    ):
+        self.snd_model = snd_model
+        self.timeout = timeout
+        self.index = {name: i for i, name in enumerate(snd_model.input_names)}
+        # Start every worker and build its SND instance before accepting requests
+        snd_model.get_pool(n_workers).warm()
+        self.batcher = MicroBatcher(
+            lambda rows: snd_model.evaluate_batch(rows, n_workers),
+            batch_window=batch_window,
+            max_batch=max_batch,
+        )
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def evaluate(self, inputs):
+        """
+        Evaluate one input dictionary or a list of them through the micro-batcher.
+
+        Raises
+        ------
+        ValueError
+            If an input is unknown, out of range in "error" validation mode, or not at
+            the served working point.
+        """
+        single = isinstance(inputs, dict)
+        inputs = [inputs] if single else list(inputs)
+        if not inputs:
+            raise ValueError("No inputs given.")
+        unknown = {name for d in inputs for name in d} - self.index.keys()
+        if unknown:
+            raise ValueError(f"Unknown inputs: {sorted(unknown)}")
+        rows = self.snd_model.batch_to_array(inputs)
+        working_points = np.unique(
+            rows[:, [self.index["t1_tth"], self.index["delay"]]], axis=0
+        )
+        for two_theta, delay in working_points:
+            if not self.snd_model.at_working_point(two_theta, delay):
+                raise ValueError(
+                    f"Working point t1_tth={two_theta}, delay={delay} is not served; "
+                    "only motor moves at the current working point are."
+                )
+        self.snd_model.validator.validate(rows)
+        outputs = self.batcher.submit(rows).result(self.timeout)
+        results = [
+            {name: float(values[i]) for name, values in outputs.items()}
+            for i in range(len(rows))
+        ]
+        return results[0] if single else results
+
+    def health(self):
+        """Return the served working point and batching statistics."""
+        index = self.index
+        defaults = self.snd_model.input_variables
+        return {
+            "working_point": [
+                defaults[index["t1_tth"]].default_value,
+                defaults[index["delay"]].default_value,
+            ],
+            "batches": self.batcher.batches,
+            "rows": self.batcher.rows,
+        }
+
+    def _handler(self):
+        model_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/health":
+                    self.send_error(404)
+                    return
+                self._reply(200, model_server.health())
+
+            def do_POST(self):
+                if self.path.split("?")[0] != "/evaluate":
+                    self.send_error(404)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    request = json.loads(self.rfile.read(length))
+                    outputs = model_server.evaluate(request["inputs"])
+                except (ValueError, KeyError, TypeError) as e:
+                    self._reply(400, {"error": str(e)})
+                    return
+                except Exception as e:
+                    logger.error(f"Evaluation failed: {e}")
+                    self._reply(500, {"error": str(e)})
+                    return
+                self._reply(200, {"outputs": outputs})
+
+            def log_message(self, format, *args):
+                logger.debug("%s - %s", self.address_string(), format % args)
+
+        return Handler
+
+    def start(self):
+        """Serve requests from a background thread."""
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="model-server", daemon=True
+        )
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        logger.info("Serving SNDModel on http://%s:%d/evaluate", host, port)
+
+    def close(self):
+        """Stop serving, finish queued evaluations and shut down the SND workers."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.batcher.close()
+        self.snd_model.close_pool()
+
+
+class ModelClient:
+    """
+    Client for a ModelServer.
+
+    Parameters
+    ----------
+    url : str, optional
+        Base URL of the server (default is 'http://127.0.0.1:8765').
+    timeout : float, optional
+        Request timeout in seconds (default is 60).
+    """
+
+    def __init__(self, url="http://127.0.0.1:8765", timeout=60.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path, body=None):
+        data = None if body is None else json.dumps(body).encode()
+        request = urllib.request.Request(
+            self.url + path, data=data, headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read())["error"]
+            except (ValueError, KeyError):
+                message = str(e)
+            raise RuntimeError(f"Model server error: {message}") from None
+
+    def evaluate(self, inputs):
+        """
+        Evaluate one input dictionary, or a list of them, on the server.
+
+        Parameters
+        ----------
+        inputs : dict or list of dict
+            Input names and values in simulation units; missing inputs take their
+            default value.
+
+        Returns
+        -------
+        dict or list of dict
+            Output names and values, one dictionary per input dictionary.
+        """
+        return self._request("/evaluate", {"inputs": inputs})["outputs"]
+
+    def health(self):
+        """Return the served working point and batching statistics."""
+        return self._request("/health")
+
+
+def main():
+    """
+    Start the model server and serve until interrupted.
+
+    You can run the script with:
+        python server.py
+        python server.py --port 8765 --workers 4 --batch-window 0.01
+    """
+    from model.snd_model import SNDModel
+
+    parser = argparse.ArgumentParser(description="Serve SNDModel evaluations over HTTP.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--workers", type=int, help="Number of SND worker processes")
+    parser.add_argument(
+        "--batch-window",
+        type=float,
+        default=0.005,
+        help="Micro-batching window in seconds (default: 0.005)",
+    )
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    logging.basicConfig(
+        format="%(asctime)s,%(msecs)03d %(name)s %(levelname)s %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        level=args.log_level,
+    )
+
+    snd_model = SNDModel("model/snd_model.yml")
+    with ModelServer(
+        snd_model,
+        port=args.port,
+        host=args.host,
+        n_workers=args.workers,
+        batch_window=args.batch_window,
+    ):
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            logger.info("Keyboard interrupt received. Exiting.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules under test are imported the way run.py imports them, from src/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
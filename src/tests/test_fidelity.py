@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from model.fidelity import (
+    level_factory,
+    needs_escalation,
+    single_precision,
+    supported_kwargs,
+)
+
+
+class Optics:
+    def __init__(self):
+        self.wave = np.ones((8, 8), dtype=np.complex128)
+        self.index = np.arange(4)
+
+
+class StubSND:
+    def __init__(self, two_theta=0.0, delay=0.0, N=16):
+        self.two_theta = two_theta
+        self.delay = delay
+        self.grid = np.linspace(0, 1, N)
+        self.optics = {"t1": Optics(), "list": [np.zeros(3)]}
+        self.shared = self.grid
+        self.fixed = (np.zeros(2),)
+
+
+def test_single_precision_casts_reachable_arrays():
+    snd = StubSND()
+    saved = single_precision(snd)
+    assert snd.grid.dtype == np.float32
+    assert snd.shared is snd.grid
+    assert snd.optics["t1"].wave.dtype == np.complex64
+    assert snd.optics["list"][0].dtype == np.float32
+    # Integer arrays and arrays inside tuples are left alone
+    assert snd.optics["t1"].index.dtype == np.arange(4).dtype
+    assert snd.fixed[0].dtype == np.float64
+    assert saved == 16 * 4 + 64 * 8 + 3 * 4
+
+
+def test_supported_kwargs_drops_unknown_arguments():
+    assert supported_kwargs(StubSND, "coarse", {"N": 8, "bogus": 1}) == {"N": 8}
+    assert supported_kwargs(StubSND, "full") == {}
+
+
+def test_level_factory():
+    assert level_factory(StubSND, "full", {}) is None
+    assert level_factory(StubSND, "unknown", {"snd_kwargs": {"bogus": 1}}) is None
+
+    coarse = level_factory(StubSND, "coarse", {"snd_kwargs": {"N": 8}})(
+        two_theta=1.0, delay=2.0
+    )
+    assert coarse.grid.shape == (8,) and coarse.grid.dtype == np.float64
+
+    single = level_factory(StubSND, "single", {"precision": "single"})(
+        two_theta=1.0, delay=2.0
+    )
+    assert (single.two_theta, single.delay) == (1.0, 2.0)
+    assert single.grid.dtype == np.float32
+
+    with pytest.raises(ValueError):
+        level_factory(StubSND, "half", {"precision": "half"})
+
+
+def test_needs_escalation():
+    escalation = {"IP_cx": {"target": 0.0, "tolerance": 5e-6}}
+    assert needs_escalation({"IP_cx": 1e-6}, escalation)
+    assert not needs_escalation({"IP_cx": 1e-5}, escalation)
@@ -0,0 +1,141 @@
+import os
+
+import numpy as np
+import pytest
+
+from model.images import (
+    ImageExporter,
+    ImageRing,
+    ImageRingReader,
+    find_profile,
+    resolve_path,
+    thumbnail,
+)
+
+
+class PPM:
+    def __init__(self, name, shape=(8, 6)):
+        self.name = name
+        self.profile = np.zeros(shape)
+        self.cx = 0.0
+
+
+class Beamline:
+    def __init__(self, devices):
+        for device in devices:
+            setattr(self, device.name, device)
+
+
+class StubSND:
+    """SND-like layout: detectors on beamlines, in a dict and as getters."""
+
+    def __init__(self):
+        self.delay_line = Beamline([PPM("t1_dh"), PPM("dd")])
+        self.devices = {"detector": PPM("IP", shape=(4, 4))}
+        self.do = PPM("do")
+        self.do.profile = np.zeros(5)
+
+    def get_t4_dh_profile(self):
+        return np.ones((3, 3))
+
+    def propagate(self, value):
+        for device in (self.delay_line.t1_dh, self.delay_line.dd, self.devices["detector"]):
+            device.profile = np.full(device.profile.shape, value)
+
+
+@pytest.fixture
+def prefix():
+    return f"test_{os.getpid()}"
+
+
+def test_find_profile():
+    snd = StubSND()
+    assert find_profile(snd, "dd") == "delay_line.dd.profile"
+    # Matched by the detector's name, through a dict
+    assert find_profile(snd, "IP") == "devices.detector.profile"
+    # A 1D profile is not a match
+    assert find_profile(snd, "do") is None
+    assert find_profile(snd, "missing") is None
+
+
+def test_resolve_path():
+    snd = StubSND()
+    assert resolve_path(snd, "devices.detector.profile").shape == (4, 4)
+    assert resolve_path(snd, "get_t4_dh_profile").shape == (3, 3)
+    with pytest.raises(AttributeError):
+        resolve_path(snd, "devices.missing.profile")
+
+
+def test_exporter_resolves_and_exports(prefix):
+    snd = StubSND()
+    exporter = ImageExporter(
+        {"dd": None, "IP": None, "t4_dh": "get_t4_dh_profile", "do": None, "xx": "x.y"},
+        prefix=prefix,
+    )
+    problems = exporter.check(snd)
+    assert set(problems) == {"do", "xx"}
+    assert exporter.planes["dd"] == "delay_line.dd.profile"
+    exporter.remove(problems)
+    exporter.open(snd)
+    try:
+        snd.propagate(2.0)
+        exporter.export(snd)
+        reader = ImageRingReader(f"{prefix}_dd")
+        try:
+            seq, image = reader.read()
+            assert seq == 1
+            assert image.dtype == np.float32 and np.all(image == 2.0)
+        finally:
+            reader.close()
+        assert set(exporter.thumbnails(size=2)) == {"dd", "IP", "t4_dh"}
+    finally:
+        exporter.close()
+
+
+def test_ring_refuses_existing_name(prefix):
+    ring = ImageRing(f"{prefix}_ring", (2, 2))
+    try:
+        with pytest.raises(FileExistsError):
+            ImageRing(f"{prefix}_ring", (2, 2))
+        # The existing ring is untouched
+        ring.write(np.ones((2, 2)))
+        reader = ImageRingReader(f"{prefix}_ring")
+        assert reader.latest_seq == 1
+        reader.close()
+    finally:
+        ring.close()
+
+
+def test_exporter_open_cleans_up_on_conflict(prefix):
+    snd = StubSND()
+    taken = ImageRing(f"{prefix}_IP", (2, 2))
+    exporter = ImageExporter(["dd", "IP"], prefix=prefix)
+    try:
+        exporter.check(snd)
+        with pytest.raises(FileExistsError):
+            exporter.open(snd)
+        assert not exporter.rings
+    finally:
+        taken.close()
+
+
+def test_reader_detects_overwritten_slot(prefix):
+    ring = ImageRing(f"{prefix}_slots", (2, 2), n_slots=2)
+    reader = ImageRingReader(f"{prefix}_slots")
+    try:
+        assert reader.read() is None
+        for value in range(3):
+            ring.write(np.full((2, 2), value))
+        assert reader.read(1) is None
+        seq, image = reader.read()
+        assert seq == 3 and np.all(image == 2)
+    finally:
+        reader.close()
+        ring.close()
+
+
+def test_thumbnail_block_mean():
+    image = np.arange(16, dtype=float).reshape(4, 4)
+    small = thumbnail(image, size=2)
+    assert small.shape == (2, 2)
+    assert small[0, 0] == pytest.approx(np.mean([0, 1, 4, 5]))
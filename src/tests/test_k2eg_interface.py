@@ -0,0 +1,108 @@
+import math
+import time
+
+from interface.k2eg_interface import K2EGInterface
+
+
+class StubK2EGClient:
+    """
+    Local stand-in for k2eg.dml.
+
+    Each PV answers after its delay in `delays` (default 0.1 s), whatever the timeout,
+    like a hung connection; PVs in `failing` raise, PVs in `silent` return None as
+    k2eg does on timeout.
+    """
+
+    def __init__(self, delays=None, failing=(), silent=(), timestamp=True):
+        self.delays = delays or {}
+        self.failing = set(failing)
+        self.silent = set(silent)
+        self.timestamp = timestamp
+        self.puts = []
+        self.closed = False
+
+    def get(self, pv_uri, timeout):
+        pv = pv_uri.split("://", 1)[1]
+        time.sleep(self.delays.get(pv, 0.1))
+        if pv in self.failing:
+            raise RuntimeError(f"Channel {pv} not found")
+        if pv in self.silent:
+            return None
+        reply = {"value": float(len(pv))}
+        if self.timestamp:
+            reply["timeStamp"] = {"secondsPastEpoch": 1000, "nanoseconds": 500_000_000}
+        return reply
+
+    def put(self, pv_uri, value, timeout):
+        self.puts.append((pv_uri, value))
+
+    def close(self):
+        self.closed = True
+
+
+PVS = [f"SND:PV{i}" for i in range(24)]
+
+
+def test_results_have_epics_shape():
+    interface = K2EGInterface(client=StubK2EGClient(), pv_name_list=PVS)
+    results = interface.get_input_variables(PVS)
+    assert list(results) == PVS
+    assert results["SND:PV1"] == {"value": 7.0, "posixseconds": 1000.5}
+    interface.close()
+
+
+def test_missing_timestamp_falls_back_to_read_time():
+    interface = K2EGInterface(client=StubK2EGClient(timestamp=False))
+    before = time.time()
+    result = interface.get_input_variables(["SND:PV0"])["SND:PV0"]
+    assert before <= result["posixseconds"] <= time.time()
+    interface.close()
+
+
+def test_latency_is_close_to_slowest_get():
+    delays = {pv: 0.05 for pv in PVS}
+    delays["SND:PV3"] = 0.3
+    interface = K2EGInterface(client=StubK2EGClient(delays), pv_name_list=PVS)
+    start = time.perf_counter()
+    interface.get_input_variables(PVS)
+    elapsed = time.perf_counter() - start
+    # Waits for the slowest get, but far less than sequential gets would take; the
+    # ratio leaves room for a slow machine
+    sequential = sum(delays.values())
+    assert elapsed >= 0.3
+    assert elapsed < sequential / 2
+    interface.close()
+
+
+def test_per_pv_errors_do_not_fail_the_snapshot():
+    client = StubK2EGClient(failing={"SND:PV1"}, silent={"SND:PV2"})
+    interface = K2EGInterface(client=client, pv_name_list=PVS[:4])
+    results = interface.get_input_variables(PVS[:4])
+    assert results["SND:PV1"] == {"error": "Channel SND:PV1 not found"}
+    assert "error" in results["SND:PV2"]
+    assert results["SND:PV0"]["value"] == 7.0
+    status = interface.pv_status()
+    assert status["SND:PV1"]["failures"] == 1
+    assert not status["SND:PV1"]["connected"]
+    assert status["SND:PV0"]["connected"]
+    assert math.isnan(status["SND:PV1"]["age"])
+    interface.close()
+
+
+def test_timed_out_gets_are_reported():
+    client = StubK2EGClient(delays={"SND:PV0": 3.0})
+    interface = K2EGInterface(client=client)
+    start = time.perf_counter()
+    results = interface.get_input_variables(["SND:PV0", "SND:PV1"], timeout=0.2)
+    # Gave up after timeout + 1 s, without waiting for the hung get
+    assert time.perf_counter() - start < 2.5
+    assert results["SND:PV1"]["value"] == 7.0
+    assert results["SND:PV0"] == {"error": "Timed out"}
+    assert interface.pv_status()["SND:PV0"]["failures"] == 1
+    interface.close()
+
+
+def test_close_closes_client():
+    client = StubK2EGClient()
+    K2EGInterface(client=client).close()
+    assert client.closed
@@ -0,0 +1,99 @@
+import atexit
+import json
+import logging
+import queue
+
+import numpy as np
+import pytest
+
+import logging_setup
+from logging_setup import (
+    ITERATION_LOGGER,
+    JsonLinesFormatter,
+    LazyQueueHandler,
+    RateLimitFilter,
+    setup_logging,
+)
+
+
+def make_record(msg, *args, level=logging.WARNING, lineno=1, **extra):
+    record = logging.LogRecord("test", level, __file__, lineno, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_lazy_queue_handler_leaves_formatting_to_listener():
+    log_queue = queue.SimpleQueue()
+    handler = LazyQueueHandler(log_queue)
+    values = [1, 2]
+    handler.handle(make_record("values %s", values))
+    record = log_queue.get_nowait()
+    # Not merged into the message, so the caller paid no formatting cost
+    assert record.msg == "values %s" and record.args == (values,)
+    assert record.getMessage() == "values [1, 2]"
+
+
+def test_rate_limit_filter(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(logging_setup.time, "monotonic", lambda: now[0])
+    limit = RateLimitFilter(interval=60.0)
+
+    assert limit.filter(make_record("failed"))
+    assert not limit.filter(make_record("failed"))
+    assert not limit.filter(make_record("failed"))
+    # Other call sites, messages and lower levels are not limited
+    assert limit.filter(make_record("failed", lineno=2))
+    assert limit.filter(make_record("other"))
+    assert limit.filter(make_record("failed", level=logging.INFO))
+    assert limit.filter(make_record("failed", level=logging.INFO))
+
+    now[0] += 61.0
+    record = make_record("failed")
+    assert limit.filter(record)
+    assert record.getMessage() == "failed (2 similar messages suppressed)"
+    assert not limit.filter(make_record("failed"))
+
+
+def test_json_lines_formatter():
+    formatter = JsonLinesFormatter()
+    record = make_record(
+        "iteration",
+        level=logging.INFO,
+        fields={"inputs": {"a": np.float64(1.5)}, "outputs": np.arange(2)},
+    )
+    line = json.loads(formatter.format(record))
+    assert line == {"time": record.created, "inputs": {"a": 1.5}, "outputs": [0, 1]}
+    # Records without fields keep their message
+    assert json.loads(formatter.format(make_record("hello %s", "x")))["message"] == "hello x"
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    iterations = logging.getLogger(ITERATION_LOGGER)
+    iterations_level = iterations.level
+    yield
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    iterations.setLevel(iterations_level)
+
+
+def test_setup_logging_routes_records(tmp_path, restore_logging):
+    path = tmp_path / "run.log"
+    iteration_path = tmp_path / "iterations.jsonl"
+    listener = setup_logging(str(path), str(iteration_path), level=logging.WARNING)
+    try:
+        logging.getLogger("test").info("not logged")
+        logging.getLogger("test").warning("warned %d", 1)
+        logging.getLogger(ITERATION_LOGGER).info("iteration", extra={"fields": {"i": 1}})
+    finally:
+        atexit.unregister(listener.stop)
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+    log = path.read_text()
+    assert "warned 1" in log and "not logged" not in log and "iteration" not in log
+    lines = iteration_path.read_text().splitlines()
+    assert len(lines) == 1 and json.loads(lines[0])["i"] == 1
@@ -0,0 +1,156 @@
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("mlflow")
+
+from mlflow.tracking import MlflowClient
+
+from mlflow_logger import AsyncMetricLogger
+
+
+class StubClient:
+    """Stand-in tracking client whose log_batch fails the first `failures` calls."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    def log_batch(self, run_id, metrics):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("tracking server unreachable")
+        self.batches.append((run_id, list(metrics)))
+
+    def logged(self):
+        return sorted(
+            (run_id, m.key, m.value, m.step)
+            for run_id, metrics in self.batches
+            for m in metrics
+        )
+
+
+def spool_files(spool_dir):
+    return sorted(
+        name for name in os.listdir(spool_dir) if name.endswith((".jsonl", ".replay"))
+    )
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def make_logger(client, spool_dir, run_id="run1"):
+    return AsyncMetricLogger(
+        run_id, client=client, batch_size=10, flush_interval=0.05, spool_dir=spool_dir
+    )
+
+
+def test_batches_are_sent(tmp_path):
+    client = StubClient()
+    with make_logger(client, str(tmp_path)) as metric_logger:
+        for step in range(3):
+            metric_logger.log_metrics({"x": step}, step=step)
+        metric_logger.log_arrays(("a", "b"), np.array([1.0, 2.0]), step=3)
+    assert client.logged() == [
+        ("run1", "a", 1.0, 3),
+        ("run1", "b", 2.0, 3),
+        ("run1", "x", 0.0, 0),
+        ("run1", "x", 1.0, 1),
+        ("run1", "x", 2.0, 2),
+    ]
+    assert spool_files(tmp_path) == []
+
+
+def test_failed_records_are_spooled_and_replayed(tmp_path):
+    spool_dir = str(tmp_path)
+    down = StubClient(failures=1000)
+    with make_logger(down, spool_dir) as metric_logger:
+        metric_logger.log_metrics({"x": 1.0}, step=1)
+        metric_logger.log_arrays(("y",), np.array([2.0]), step=2)
+    assert spool_files(spool_dir) == ["run1.jsonl"]
+    assert metric_logger.backlog == 2
+
+    # A later process finds the spool; its first flush fails and is spooled too, and
+    # everything is replayed after the next successful flush
+    recovering = StubClient(failures=1)
+    with make_logger(recovering, spool_dir, run_id="run2") as metric_logger:
+        assert metric_logger.spooled == 2
+        metric_logger.log_metrics({"z": 3.0}, step=3)
+        wait_for(lambda: metric_logger.spooled == 3)
+        metric_logger.log_metrics({"z": 4.0}, step=4)
+    assert recovering.logged() == [
+        ("run1", "x", 1.0, 1),
+        ("run1", "y", 2.0, 2),
+        ("run2", "z", 3.0, 3),
+        ("run2", "z", 4.0, 4),
+    ]
+    assert spool_files(spool_dir) == []
+    assert metric_logger.backlog == 0
+
+
+def test_leftover_replay_files_are_replayed(tmp_path):
+    def write(name, steps, tail=""):
+        with open(tmp_path / name, "w") as file:
+            for step in steps:
+                record = {"metrics": {"x": float(step)}, "timestamp": 0, "step": step}
+                file.write(json.dumps(record) + "\n")
+            file.write(tail)
+
+    # Left by processes that stopped mid-replay, by either naming scheme, next to a
+    # spool file whose last line was cut short
+    write("run0.jsonl.replay", [0])
+    write("run1.jsonl.1700000000000000000.replay", [1, 2])
+    write("run1.jsonl", [3], tail='{"metrics": {"x"')
+
+    client = StubClient()
+    with make_logger(client, str(tmp_path), run_id="run2") as metric_logger:
+        # Lines are counted, the truncated one included
+        assert metric_logger.spooled == 5
+        metric_logger.log_metrics({"x": 4.0}, step=4)
+    assert client.logged() == [
+        ("run0", "x", 0.0, 0),
+        ("run1", "x", 1.0, 1),
+        ("run1", "x", 2.0, 2),
+        ("run1", "x", 3.0, 3),
+        ("run2", "x", 4.0, 4),
+    ]
+    assert spool_files(tmp_path) == []
+
+
+def test_full_queue_spools_instead_of_blocking(tmp_path):
+    client = StubClient()
+    metric_logger = AsyncMetricLogger(
+        "run1", client=client, max_queue=1, flush_interval=0.05, spool_dir=str(tmp_path)
+    )
+    start = time.monotonic()
+    for step in range(50):
+        metric_logger.log_metrics({"x": step}, step=step)
+    assert time.monotonic() - start < 0.5
+    metric_logger.close()
+    # Records that overflowed the queue are replayed from the spool after a flush, or
+    # left there for the next process if no flush followed
+    steps = [step for _, _, _, step in client.logged()]
+    for name in spool_files(tmp_path):
+        with open(tmp_path / name) as file:
+            steps += [json.loads(line)["step"] for line in file]
+    assert sorted(steps) == list(range(50))
+
+
+def test_local_file_store(tmp_path, monkeypatch):
+    # Recent MLflow versions only allow the file store on request
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    client = MlflowClient(tracking_uri=f"file:{tmp_path}/mlruns")
+    experiment_id = client.create_experiment("test")
+    run_id = client.create_run(experiment_id).info.run_id
+    with make_logger(client, str(tmp_path / "spool"), run_id=run_id) as metric_logger:
+        for step in range(3):
+            metric_logger.log_arrays(("x",), np.array([step * 0.5]), step=step)
+    history = client.get_metric_history(run_id, "x")
+    assert [(m.step, m.value) for m in history] == [(0, 0.0), (1, 0.5), (2, 1.0)]
@@ -0,0 +1,60 @@
+import numpy as np
+
+from model.output_memo import OutputMemo
+from model.state import InputState
+
+NAMES = ["a", "b", "c"]
+
+
+def test_inputs_within_deadband_share_key():
+    memo = OutputMemo(NAMES, {"a": 0.1, "b": 0.5})
+    key = memo.key({"a": 1.01, "b": 2.1, "c": 3.0})
+    assert memo.key({"a": 0.99, "b": 1.9, "c": 3.0}) == key
+    # Inputs without a deadband must match exactly
+    assert memo.key({"a": 1.01, "b": 2.1, "c": 3.0 + 1e-12}) != key
+    assert memo.key({"a": 1.2, "b": 2.1, "c": 3.0}) != key
+
+
+def test_get_put_returns_copies_and_counts():
+    memo = OutputMemo(NAMES, {"a": 0.1})
+    key = memo.key({"a": 1.0, "b": 2.0, "c": 3.0})
+    assert memo.get(key) is None
+    outputs = {"y": 1.0}
+    memo.put(key, outputs)
+    outputs["y"] = 2.0
+    cached = memo.get(key)
+    assert cached == {"y": 1.0}
+    cached["y"] = 3.0
+    assert memo.get(key) == {"y": 1.0}
+    assert (memo.hits, memo.misses) == (2, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    memo = OutputMemo(NAMES, max_entries=2)
+    keys = [memo.key({"a": i, "b": 0.0, "c": 0.0}) for i in range(3)]
+    memo.put(keys[0], {"y": 0})
+    memo.put(keys[1], {"y": 1})
+    memo.get(keys[0])
+    memo.put(keys[2], {"y": 2})
+    assert memo.get(keys[1]) is None
+    assert memo.get(keys[0]) == {"y": 0}
+    assert memo.get(keys[2]) == {"y": 2}
+
+
+def test_clear():
+    memo = OutputMemo(NAMES)
+    key = memo.key({"a": 1.0, "b": 2.0, "c": 3.0})
+    memo.put(key, {"y": 1.0})
+    memo.clear()
+    assert memo.get(key) is None
+
+
+def test_input_state_key_matches_dict_key():
+    memo = OutputMemo(NAMES, {"a": 0.1, "b": 0.5})
+    values = {"a": 1.04, "b": 2.2, "c": -3.0}
+    state = InputState(NAMES)
+    state.load_dict(values)
+    assert memo.key(state) == memo.key(values)
+    state["c"] = -3.0 + 1e-9
+    assert memo.key(state) != memo.key(values)
+    assert isinstance(state.vector, np.ndarray)
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from output_publisher import OutputPublisher
+
+PV_NAMES = {"x": "PV:X", "y": "PV:Y"}
+
+
+class StubInterface:
+    """Records puts; a put blocks while `gate` is clear."""
+
+    def __init__(self):
+        self.puts = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Event()
+        self.fail = set()
+
+    def put_pv(self, pv_name, value, timeout):
+        self.started.set()
+        assert self.gate.wait(5.0)
+        if pv_name in self.fail:
+            raise TimeoutError("put timed out")
+        self.puts.append((pv_name, value))
+
+
+@pytest.fixture
+def interface():
+    return StubInterface()
+
+
+def test_deadbands(interface):
+    publisher = OutputPublisher(interface, PV_NAMES, {"x": 0.5})
+    publisher.publish({"x": 1.0, "y": 1.0, "other": 3.0})
+    publisher.close()
+    assert sorted(interface.puts) == [("PV:X", 1.0), ("PV:Y", 1.0)]
+
+    interface.puts.clear()
+    publisher = OutputPublisher(interface, PV_NAMES, {"x": 0.5})
+    publisher.last_published = {"x": 1.0, "y": 1.0}
+    # x within its deadband, y without a deadband changed
+    publisher.publish({"x": 1.4, "y": 1.0 + 1e-9})
+    publisher.close()
+    assert interface.puts == [("PV:Y", 1.0 + 1e-9)]
+
+
+def test_nan_is_a_change(interface):
+    publisher = OutputPublisher(interface, {"x": "PV:X"})
+    publisher.last_published = {"x": 1.0}
+    publisher.publish({"x": float("nan")})
+    publisher.close()
+    assert len(interface.puts) == 1
+
+
+def test_latest_value_wins(interface):
+    publisher = OutputPublisher(interface, {"x": "PV:X"})
+    interface.gate.clear()
+    publisher.publish({"x": 1.0})
+    assert interface.started.wait(5.0)
+    # Published while the first write is in flight: only the last one is written
+    for value in (2.0, 3.0, 4.0):
+        publisher.publish({"x": value})
+    interface.gate.set()
+    publisher.close()
+    assert interface.puts == [("PV:X", 1.0), ("PV:X", 4.0)]
+
+
+def test_close_writes_pending_outputs(interface):
+    publisher = OutputPublisher(interface, PV_NAMES)
+    interface.gate.clear()
+    publisher.publish({"x": 1.0})
+    assert interface.started.wait(5.0)
+    publisher.publish({"x": 2.0, "y": 5.0})
+    closer = threading.Thread(target=publisher.close)
+    closer.start()
+    interface.gate.set()
+    closer.join(5.0)
+    assert not closer.is_alive()
+    assert sorted(interface.puts) == [("PV:X", 1.0), ("PV:X", 2.0), ("PV:Y", 5.0)]
+
+
+def test_failed_write_is_retried(interface):
+    publisher = OutputPublisher(interface, PV_NAMES)
+    interface.fail.add("PV:Y")
+    publisher.publish({"x": 1.0, "y": 1.0})
+    publisher.close()
+    assert publisher.last_published == {"x": 1.0}
+
+    interface.fail.clear()
+    publisher = OutputPublisher(interface, PV_NAMES)
+    publisher.last_published = {"x": 1.0}
+    publisher.publish({"x": 1.0, "y": 1.0})
+    publisher.close()
+    assert interface.puts == [("PV:X", 1.0), ("PV:Y", 1.0)]
@@ -0,0 +1,102 @@
+from model.propagation import OUTPUT_GETTERS, IncrementalPropagator, propagate
+
+INPUT_NAMES = ["delay", "t1_th1", "t2_x"]
+BRANCHES = {
+    "delay": {
+        "propagate": "propagate_delay",
+        "inputs": ["t1_th1"],
+        "outputs": ["t1_dh_sum", "dd_sum", "dd_cx", "dd_cy", "t4_dh_sum"],
+    },
+    "cc": {
+        "propagate": "propagate_cc",
+        "inputs": ["t2_x"],
+        "outputs": ["do_sum", "do_cx", "do_cy"],
+    },
+}
+
+
+class FakeMotor:
+    def __init__(self):
+        self.position = 0.0
+
+    def mv(self, value):
+        self.position = value
+
+
+class FakeSND:
+    """Stand-in for SND: each branch records the motor positions it propagated with."""
+
+    def __init__(self):
+        self.motor_dict = {name: FakeMotor() for name in INPUT_NAMES}
+        self.calls = []
+        self.delay_state = None
+        self.cc_state = None
+
+    def _positions(self):
+        return sum(m.position for m in self.motor_dict.values())
+
+    def propagate_delay(self):
+        self.calls.append("delay")
+        self.delay_state = self._positions()
+
+    def propagate_cc(self):
+        self.calls.append("cc")
+        self.cc_state = self._positions()
+
+    def __getattr__(self, name):
+        getter = {v: k for k, v in OUTPUT_GETTERS.items()}.get(name)
+        if getter is None:
+            raise AttributeError(name)
+        cc_outputs = BRANCHES["cc"]["outputs"]
+        state = self.cc_state if getter in cc_outputs else self.delay_state
+        return lambda: state
+
+
+def test_first_call_propagates_everything():
+    snd = FakeSND()
+    propagator = IncrementalPropagator(INPUT_NAMES, BRANCHES)
+    output = propagator.propagate(snd, {"delay": 0.0, "t1_th1": 1.0, "t2_x": 2.0})
+    assert snd.calls == ["delay", "cc"]
+    assert output == propagate(FakeSND(), {"delay": 0.0, "t1_th1": 1.0, "t2_x": 2.0})
+
+
+def test_only_dirty_branch_is_propagated():
+    snd = FakeSND()
+    propagator = IncrementalPropagator(INPUT_NAMES, BRANCHES)
+    propagator.propagate(snd, {"delay": 0.0, "t1_th1": 1.0, "t2_x": 2.0})
+    snd.calls.clear()
+    output = propagator.propagate(snd, {"delay": 0.0, "t1_th1": 1.0, "t2_x": 5.0})
+    assert snd.calls == ["cc"]
+    assert output["do_sum"] == 6.0
+    # Outputs of the clean branch are reused
+    assert output["dd_sum"] == 3.0
+    # Unmapped outputs (IP_*) are re-read after any propagation
+    assert propagator.unmapped_outputs == {"IP_sum", "IP_cx", "IP_cy"}
+
+
+def test_unchanged_inputs_skip_propagation():
+    snd = FakeSND()
+    propagator = IncrementalPropagator(INPUT_NAMES, BRANCHES)
+    inputs = {"delay": 0.0, "t1_th1": 1.0, "t2_x": 2.0}
+    first = propagator.propagate(snd, inputs)
+    snd.calls.clear()
+    assert propagator.propagate(snd, dict(inputs)) == first
+    assert snd.calls == []
+
+
+def test_unlisted_input_dirties_every_branch():
+    propagator = IncrementalPropagator(INPUT_NAMES, BRANCHES)
+    propagator.propagate(FakeSND(), {"delay": 0.0, "t1_th1": 1.0, "t2_x": 2.0})
+    dirty = propagator.dirty_branches({"delay": 0.5, "t1_th1": 1.0, "t2_x": 2.0})
+    assert dirty == {"delay", "cc"}
+
+
+def test_reset_forces_full_propagation():
+    snd = FakeSND()
+    propagator = IncrementalPropagator(INPUT_NAMES, BRANCHES)
+    inputs = {"delay": 0.0, "t1_th1": 1.0, "t2_x": 2.0}
+    propagator.propagate(snd, inputs)
+    propagator.reset()
+    snd.calls.clear()
+    propagator.propagate(snd, inputs)
+    assert snd.calls == ["delay", "cc"]
@@ -0,0 +1,142 @@
+import collections
+import queue
+import threading
+import time
+
+import pytest
+
+from model.reinit import BackgroundReinitializer
+
+TIMEOUT = 5.0
+
+
+class GatedBuilder:
+    """Builds a fake SND per working point once that working point is released."""
+
+    def __init__(self):
+        self.started = queue.Queue()
+        self.gates = collections.defaultdict(threading.Event)
+        self.fail = set()
+
+    def __call__(self, two_theta, delay):
+        self.started.put((two_theta, delay))
+        assert self.gates[(two_theta, delay)].wait(TIMEOUT)
+        if (two_theta, delay) in self.fail:
+            raise RuntimeError("build failed")
+        return ("snd", two_theta, delay)
+
+    def release(self, working_point):
+        self.gates[working_point].set()
+
+    def next_started(self):
+        return self.started.get(timeout=TIMEOUT)
+
+
+def key(two_theta, delay):
+    return round(two_theta, 3), round(delay, 1)
+
+
+def wait_for(predicate):
+    deadline = time.monotonic() + TIMEOUT
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def builder():
+    return GatedBuilder()
+
+
+@pytest.fixture
+def reinit(builder):
+    reinit = BackgroundReinitializer(builder, key)
+    yield reinit
+    for gate in builder.gates.values():
+        gate.set()
+    reinit.close(TIMEOUT)
+
+
+def take(reinit):
+    wait_for(lambda: reinit.ready is not None)
+    return reinit.take()
+
+
+def test_build_and_take(builder, reinit):
+    reinit.request(1.0, 2.0)
+    assert reinit.pending
+    assert builder.next_started() == (1.0, 2.0)
+    builder.release((1.0, 2.0))
+    assert take(reinit) == ((1.0, 2.0), ("snd", 1.0, 2.0))
+    assert not reinit.pending
+    assert reinit.take() is None
+
+
+def test_same_key_does_not_supersede(builder, reinit):
+    reinit.request(1.0, 2.0)
+    assert builder.next_started() == (1.0, 2.0)
+    # Readback noise within the cache quantum
+    reinit.request(1.0001, 2.01)
+    builder.release((1.0, 2.0))
+    assert take(reinit)[0] == (1.0, 2.0)
+    assert reinit.superseded == 0
+
+
+def test_supersede_builds_only_latest_request(builder, reinit):
+    reinit.request(1.0, 0.0)
+    assert builder.next_started() == (1.0, 0.0)
+    # Both arrive while the first build runs; the second replaces the first
+    reinit.request(2.0, 0.0)
+    reinit.request(3.0, 0.0)
+    builder.release((1.0, 0.0))
+    assert builder.next_started() == (3.0, 0.0)
+    builder.release((3.0, 0.0))
+    assert take(reinit) == ((3.0, 0.0), ("snd", 3.0, 0.0))
+    assert builder.started.empty()
+    assert (reinit.builds, reinit.superseded) == (2, 1)
+
+
+def test_cancel_discards_running_build(builder, reinit):
+    reinit.request(1.0, 0.0)
+    assert builder.next_started() == (1.0, 0.0)
+    # The working point changed back to the current one
+    reinit.cancel()
+    assert not reinit.pending
+    builder.release((1.0, 0.0))
+    wait_for(lambda: reinit.builds == 1)
+    assert reinit.take() is None
+    assert reinit.superseded == 1
+    assert not reinit.pending
+
+
+def test_finished_build_is_discarded_by_new_request(builder, reinit):
+    reinit.request(1.0, 0.0)
+    builder.release((1.0, 0.0))
+    wait_for(lambda: reinit.ready is not None)
+    reinit.request(2.0, 0.0)
+    assert reinit.take() is None
+    assert builder.next_started() == (1.0, 0.0)
+    assert builder.next_started() == (2.0, 0.0)
+    builder.release((2.0, 0.0))
+    assert take(reinit)[0] == (2.0, 0.0)
+
+
+def test_finished_build_is_discarded_by_cancel(builder, reinit):
+    reinit.request(1.0, 0.0)
+    builder.release((1.0, 0.0))
+    wait_for(lambda: reinit.ready is not None)
+    reinit.cancel()
+    assert reinit.take() is None
+    assert not reinit.pending
+
+
+def test_failed_build_clears_pending(builder, reinit):
+    builder.fail.add((1.0, 0.0))
+    reinit.request(1.0, 0.0)
+    builder.release((1.0, 0.0))
+    wait_for(lambda: not reinit.pending)
+    assert reinit.take() is None
+    # A later request is still built
+    reinit.request(2.0, 0.0)
+    builder.release((2.0, 0.0))
+    assert take(reinit)[0] == (2.0, 0.0)
@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+
+from interface.replay_interface import RecordingInterface, ReplayInterface, SnapshotFile
+
+PVS = ["PV:A", "PV:B"]
+
+
+class StubInterface:
+    def __init__(self):
+        self.n = 0
+
+    def get_input_variables(self, input_pvs):
+        self.n += 1
+        return {
+            "PV:A": {"value": float(self.n), "posixseconds": 100.0 + self.n},
+            "PV:B": {
+                "value": -float(self.n),
+                "posixseconds": 200.0 + self.n,
+                "connected": True,
+                "stale": self.n % 2 == 0,
+            },
+        }
+
+
+def record(path, n, interface=None):
+    recorder = RecordingInterface(interface or StubInterface(), path, PVS)
+    for _ in range(n):
+        recorder.get_input_variables(PVS)
+    recorder.close()
+
+
+def test_record_and_replay(tmp_path):
+    path = str(tmp_path)
+    record(path, 3)
+    replay = ReplayInterface(path)
+    rows = [replay.get_input_variables(PVS) for _ in range(3)]
+    assert [r["PV:A"]["value"] for r in rows] == [1.0, 2.0, 3.0]
+    assert [r["PV:B"]["posixseconds"] for r in rows] == [201.0, 202.0, 203.0]
+    assert [r["PV:B"]["stale"] for r in rows] == [False, True, False]
+    assert not rows[0]["PV:A"]["stale"]
+
+
+def test_append_after_interrupted_write_stays_aligned(tmp_path):
+    path = str(tmp_path)
+    interface = StubInterface()
+    record(path, 2, interface)
+    # A crash mid-row: half a row in one field, a whole extra row in another
+    with open(SnapshotFile.field_path(path, "value"), "ab") as file:
+        file.write(np.zeros(1).tobytes())
+    with open(SnapshotFile.field_path(path, "connected"), "ab") as file:
+        file.write(np.ones(2, dtype=np.uint8).tobytes())
+    record(path, 2, interface)
+
+    sizes = SnapshotFile.complete_rows(path, len(PVS))
+    assert set(sizes.values()) == {4}
+    pvs, arrays = SnapshotFile.open(path)
+    np.testing.assert_array_equal(arrays["value"][:, 0], [1.0, 2.0, 3.0, 4.0])
+    np.testing.assert_array_equal(arrays["posixseconds"][:, 1], [201.0, 202.0, 203.0, 204.0])
+
+
+def test_recording_without_stale_field(tmp_path):
+    path = str(tmp_path)
+    record(path, 2)
+    os.remove(SnapshotFile.field_path(path, "stale"))
+    _, arrays = SnapshotFile.open(path)
+    assert arrays["stale"].shape == (2, 2) and not arrays["stale"].any()
+    # Appending creates the field for the earlier rows
+    record(path, 1)
+    _, arrays = SnapshotFile.open(path)
+    assert arrays["stale"].shape == (3, 2)
+    np.testing.assert_array_equal(arrays["value"][:, 0], [1.0, 2.0, 1.0])
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import IterationScheduler
+
+
+def run_for(scheduler, n_iterations, iteration=None):
+    """Run the scheduler until `n_iterations` iterations were attempted."""
+    starts = []
+
+    def wrapped():
+        starts.append(time.monotonic())
+        if len(starts) > n_iterations:
+            raise KeyboardInterrupt
+        if iteration is not None:
+            iteration()
+
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.run(wrapped)
+    return starts[:n_iterations]
+
+
+# Assertions on elapsed time are one-sided, or bounded far from the expected value,
+# since sleeps and waits never return early but may return late on a loaded machine
+
+
+def test_heartbeat_runs_at_min_rate():
+    scheduler = IterationScheduler(min_rate=20.0, max_rate=100.0)
+    starts = run_for(scheduler, 5)
+    # The first iteration runs at once, the others on the 0.05 s grid after it; a
+    # late iteration shortens the gap to the next tick, so only the span is checked
+    assert starts[-1] - starts[0] >= 3 * 0.05
+    assert starts[-1] - starts[0] < 2.0
+    assert scheduler.iterations == 5
+
+
+def test_notification_triggers_iteration_before_heartbeat():
+    scheduler = IterationScheduler(min_rate=0.1, max_rate=100.0, coalesce_window=0.01)
+    start = time.monotonic()
+    threading.Timer(0.05, scheduler.notify).start()
+    trigger, due = scheduler.wait(start + 10.0, -float("inf"))
+    assert trigger == "change"
+    # Due when notified, and returned long before the heartbeat tick
+    assert start + 0.05 <= due <= time.monotonic()
+    assert time.monotonic() - start < 5.0
+
+
+def test_idle_wait_returns_heartbeat_at_tick():
+    scheduler = IterationScheduler(min_rate=0.2, max_rate=100.0)
+    tick = time.monotonic() + 0.05
+    assert scheduler.wait(tick, -float("inf")) == ("heartbeat", tick)
+    assert time.monotonic() >= tick
+
+
+def test_burst_of_notifications_is_coalesced():
+    scheduler = IterationScheduler(min_rate=0.2, max_rate=100.0, coalesce_window=0.05)
+    for _ in range(10):
+        scheduler.notify()
+    trigger, _ = scheduler.wait(time.monotonic() + 5.0, -float("inf"))
+    assert trigger == "change"
+    assert not scheduler.event.is_set()
+    assert scheduler.pending_since is None
+
+
+def test_change_iterations_respect_max_rate():
+    scheduler = IterationScheduler(min_rate=0.2, max_rate=10.0, coalesce_window=0.0)
+    last_start = time.monotonic()
+    scheduler.notify()
+    scheduler.wait(time.monotonic() + 5.0, last_start)
+    assert time.monotonic() - last_start >= 0.099
+
+
+def test_failed_iteration_is_retried():
+    scheduler = IterationScheduler(min_rate=50.0, max_rate=100.0, error_delay=0.01)
+    failures = []
+
+    def iteration():
+        if not failures:
+            failures.append(1)
+            raise RuntimeError("boom")
+
+    run_for(scheduler, 3, iteration)
+    assert failures == [1]
+    assert scheduler.iterations == 2
+
+
+def test_lag_percentiles():
+    scheduler = IterationScheduler()
+    assert scheduler.lag_percentiles() == {}
+    scheduler.lags.extend([0.0, 1.0, 2.0])
+    assert scheduler.lag_percentiles((50,)) == {50: 1.0}
@@ -0,0 +1,123 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from server import MicroBatcher, ModelClient, ModelServer
+
+INPUT_NAMES = ["t1_tth", "delay", "t2_x"]
+DEFAULTS = [0.5, 0.0, 0.0]
+
+
+def fake_evaluate_rows(rows):
+    return {"y": rows.sum(axis=1), "n": np.full(len(rows), len(rows))}
+
+
+class FakeModel:
+    """Stand-in for SNDModel exposing what ModelServer uses; y is the sum of the inputs."""
+
+    def __init__(self):
+        self.input_names = INPUT_NAMES
+        self.input_variables = [SimpleNamespace(default_value=v) for v in DEFAULTS]
+        self.validator = SimpleNamespace(validate=self.validate)
+        self.warmed = False
+        self.pool_closed = False
+
+    def validate(self, rows):
+        if (np.abs(rows) > 10).any():
+            raise ValueError("Inputs out of range")
+
+    def get_pool(self, n_workers=None):
+        return SimpleNamespace(warm=lambda: setattr(self, "warmed", True))
+
+    def close_pool(self):
+        self.pool_closed = True
+
+    def batch_to_array(self, inputs):
+        return np.array([[d.get(n, v) for n, v in zip(INPUT_NAMES, DEFAULTS)] for d in inputs])
+
+    def at_working_point(self, two_theta, delay):
+        return (two_theta, delay) == (DEFAULTS[0], DEFAULTS[1])
+
+    def evaluate_batch(self, rows, n_workers=None):
+        return fake_evaluate_rows(rows)
+
+
+@pytest.fixture
+def client():
+    model = FakeModel()
+    with ModelServer(model, port=0, batch_window=0.05) as model_server:
+        host, port = model_server.server.server_address[:2]
+        yield ModelClient(f"http://{host}:{port}", timeout=5.0), model_server
+    assert model.pool_closed
+
+
+def test_micro_batcher_splits_results_per_submission():
+    batcher = MicroBatcher(fake_evaluate_rows, batch_window=0.05)
+    futures = [batcher.submit(np.full((i + 1, 2), float(i))) for i in range(3)]
+    results = [f.result(timeout=5) for f in futures]
+    batcher.close()
+    assert [r["y"].tolist() for r in results] == [[0.0], [2.0, 2.0], [4.0, 4.0, 4.0]]
+    # Submitted within the window, all rows are evaluated in one batch
+    assert results[0]["n"][0] == 6
+    assert (batcher.batches, batcher.rows) == (1, 6)
+
+
+def test_micro_batcher_respects_max_batch():
+    batcher = MicroBatcher(fake_evaluate_rows, batch_window=0.05, max_batch=2)
+    futures = [batcher.submit(np.ones((1, 2))) for _ in range(4)]
+    assert [f.result(timeout=5)["n"][0] for f in futures] == [2, 2, 2, 2]
+    batcher.close()
+
+
+def test_micro_batcher_propagates_errors():
+    def failing(rows):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(failing, batch_window=0.0)
+    with pytest.raises(RuntimeError, match="boom"):
+        batcher.submit(np.ones((1, 2))).result(timeout=5)
+    batcher.close()
+
+
+def test_client_round_trip(client):
+    model_client, model_server = client
+    assert model_server.snd_model.warmed
+    assert model_client.evaluate({"t2_x": 1.0}) == {"y": 1.5, "n": 1.0}
+    outputs = model_client.evaluate([{"t2_x": 1.0}, {"t2_x": 2.0}])
+    assert [o["y"] for o in outputs] == [1.5, 2.5]
+    health = model_client.health()
+    assert health["working_point"] == [0.5, 0.0]
+    assert health["rows"] == 3
+
+
+def test_concurrent_requests_are_batched(client):
+    model_client, model_server = client
+    results = [None] * 8
+
+    def request(i):
+        results[i] = model_client.evaluate({"t2_x": float(i)})
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [r["y"] for r in results] == [0.5 + i for i in range(8)]
+    assert model_server.batcher.batches < 8
+
+
+@pytest.mark.parametrize(
+    "inputs, message",
+    [
+        ({"unknown": 1.0}, "Unknown inputs"),
+        ({"delay": 1.0}, "is not served"),
+        ({"t2_x": 100.0}, "out of range"),
+        ([], "No inputs"),
+    ],
+)
+def test_bad_requests_are_rejected(client, inputs, message):
+    model_client, _ = client
+    with pytest.raises(RuntimeError, match=message):
+        model_client.evaluate(inputs)
@@ -0,0 +1,113 @@
+import numpy as np
+
+from model.snd_cache import SNDCache, estimate_nbytes
+
+
+class Motor:
+    def __init__(self, position):
+        self.position = position
+
+    def mv(self, position):
+        self.position = position
+
+    def wm(self):
+        return self.position
+
+
+class Crystal:
+    def __init__(self, n):
+        self.wave = np.zeros((n, n), dtype=np.complex128)
+
+
+class StubSND:
+    def __init__(self, two_theta, delay, n=10):
+        self.two_theta = two_theta
+        self.delay = delay
+        self.motor_dict = {"t1_th1": Motor(two_theta / 2), "delay": Motor(delay)}
+        self.crystals = {"t1": Crystal(n), "t4": Crystal(n)}
+        self.grid = np.zeros(n)
+        # Shared and nested references are counted once
+        self.beamline = [self.crystals["t1"], (self.grid,)]
+        self.cls = StubSND
+
+
+class Factory:
+    def __init__(self, n=10):
+        self.n = n
+        self.calls = []
+
+    def __call__(self, two_theta, delay):
+        self.calls.append((two_theta, delay))
+        return StubSND(two_theta, delay, self.n)
+
+
+def test_estimate_nbytes_counts_each_array_once():
+    snd = StubSND(0.0, 0.0, n=10)
+    assert estimate_nbytes(snd) == 2 * 10 * 10 * 16 + 10 * 8
+
+
+def test_key_quantization():
+    cache = SNDCache(Factory(), two_theta_quantum=1e-3, delay_quantum=0.1)
+    assert cache.key(0.5, 1.0) == cache.key(0.5004, 1.04)
+    assert cache.key(0.5, 1.0) != cache.key(0.5006, 1.0)
+    assert cache.key(0.5, 1.0) != cache.key(0.5, 1.06)
+
+
+def test_hit_restores_motor_positions():
+    factory = Factory()
+    cache = SNDCache(factory, two_theta_quantum=1e-3, delay_quantum=0.1)
+    snd = cache.get(0.5, 1.0)
+    snd.motor_dict["t1_th1"].mv(9.0)
+    snd.motor_dict["delay"].mv(-1.0)
+    # Within the quantum: the same instance, with its motors back where they started
+    assert cache.get(0.5002, 1.01) is snd
+    assert snd.motor_dict["t1_th1"].wm() == 0.25
+    assert snd.motor_dict["delay"].wm() == 1.0
+    assert len(factory.calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_eviction_by_entries():
+    factory = Factory()
+    cache = SNDCache(factory, two_theta_quantum=1e-3, max_entries=2)
+    a = cache.get(0.1, 0.0)
+    cache.get(0.2, 0.0)
+    assert cache.get(0.1, 0.0) is a
+    cache.get(0.3, 0.0)
+    assert cache.stats()["entries"] == 2
+    assert cache.evictions == 1
+    # 0.2 was least recently used
+    assert cache.get(0.1, 0.0) is a
+    cache.get(0.2, 0.0)
+    assert factory.calls == [(0.1, 0.0), (0.2, 0.0), (0.3, 0.0), (0.2, 0.0)]
+
+
+def test_eviction_by_memory():
+    factory = Factory(n=100)
+    nbytes = estimate_nbytes(factory(0.0, 0.0))
+    factory.calls.clear()
+    cache = SNDCache(
+        factory, two_theta_quantum=1e-3, max_entries=8, max_mb=2.5 * nbytes / 1e6
+    )
+    for two_theta in (0.1, 0.2, 0.3):
+        cache.get(two_theta, 0.0)
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["nbytes"] == 2 * nbytes
+    assert cache.evictions == 1
+
+
+def test_entry_over_memory_cap_is_kept():
+    cache = SNDCache(Factory(n=100), max_mb=1e-6)
+    snd = cache.get(0.1, 0.0)
+    assert cache.get(0.1, 0.0) is snd
+    assert cache.stats()["entries"] == 1
+
+
+def test_clear():
+    factory = Factory()
+    cache = SNDCache(factory)
+    cache.get(0.1, 0.0)
+    cache.clear()
+    assert cache.stats()["entries"] == 0 and cache.nbytes == 0
+    cache.get(0.1, 0.0)
+    assert len(factory.calls) == 2
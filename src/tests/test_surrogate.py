@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from model.state import InputState
+from model.surrogate import PolynomialSurrogate
+
+INPUTS = ["energy", "a", "b"]
+OUTPUTS = ["y1", "y2"]
+
+
+def target(x):
+    a, b = x[:, 1], x[:, 2]
+    return np.column_stack([1.0 + 2.0 * a - b + 0.5 * a * b, 3.0 * a**2 + b])
+
+
+def training_data(n=200, seed=1):
+    rng = np.random.default_rng(seed)
+    x = np.column_stack(
+        [np.full(n, 9500.0), rng.uniform(-1e-4, 1e-4, n), rng.uniform(0.0, 2.0, n)]
+    )
+    return x, target(x)
+
+
+@pytest.fixture
+def surrogate():
+    x, y = training_data()
+    return PolynomialSurrogate.fit(
+        x, y, INPUTS, OUTPUTS, ["a", "b"], (0.69, 0.28), max_uncertainty=0.01
+    )
+
+
+def test_fits_quadratic_within_envelope(surrogate):
+    inputs = {"energy": 9500.0, "a": 5e-5, "b": 1.5}
+    outputs = surrogate.evaluate(inputs)
+    expected = target(np.array([[9500.0, 5e-5, 1.5]]))[0]
+    assert outputs is not None
+    np.testing.assert_allclose([outputs[n] for n in OUTPUTS], expected, rtol=1e-6)
+
+
+def test_inputs_outside_envelope_fall_back(surrogate):
+    assert surrogate.evaluate({"energy": 9500.0, "a": 2e-4, "b": 1.0}) is None
+    assert surrogate.evaluate({"energy": 9500.0, "a": 0.0, "b": -0.1}) is None
+    # Inactive inputs are not part of the envelope
+    assert surrogate.evaluate({"energy": 8000.0, "a": 0.0, "b": 1.0}) is not None
+    envelope = surrogate.in_envelope(
+        np.array([[9500.0, 0.0, 1.0], [9500.0, 0.0, 3.0]])
+    )
+    assert envelope.tolist() == [True, False]
+
+
+def test_uncertain_prediction_falls_back():
+    x, y = training_data()
+    # Outputs a quadratic cannot represent: the bootstrap fits disagree
+    y = y + np.column_stack([np.sin(40 * x[:, 2]), np.zeros(len(x))])
+    surrogate = PolynomialSurrogate.fit(
+        x, y, INPUTS, OUTPUTS, ["a", "b"], (0.0, 0.0), max_uncertainty=1e-3
+    )
+    inputs = {"energy": 9500.0, "a": 0.0, "b": 1.0}
+    _, std = surrogate.predict(np.array([[9500.0, 0.0, 1.0]]))
+    assert std[0, 0] > 1e-3 * surrogate.y_std[0]
+    assert surrogate.evaluate(inputs) is None
+    surrogate.max_uncertainty = np.inf
+    assert surrogate.evaluate(inputs) is not None
+
+
+def test_input_state_matches_dict(surrogate):
+    values = {"energy": 9500.0, "a": -3e-5, "b": 0.7}
+    state = InputState(INPUTS)
+    state.load_dict(values)
+    assert surrogate.evaluate(state) == surrogate.evaluate(values)
+
+
+def test_save_load_round_trip(surrogate, tmp_path):
+    path = tmp_path / "surrogate.npz"
+    surrogate.save(path)
+    loaded = PolynomialSurrogate.load(path)
+    assert loaded.input_names == INPUTS
+    assert loaded.output_names == OUTPUTS
+    assert loaded.active_inputs == ["a", "b"]
+    assert loaded.working_point == pytest.approx((0.69, 0.28))
+    assert loaded.max_uncertainty == surrogate.max_uncertainty
+    x, _ = training_data(n=20, seed=2)
+    for expected, actual in zip(surrogate.predict(x), loaded.predict(x)):
+        np.testing.assert_array_equal(expected, actual)
+    inputs = {"energy": 9500.0, "a": 1e-5, "b": 0.2}
+    assert loaded.evaluate(inputs) == surrogate.evaluate(inputs)
@@ -0,0 +1,68 @@
+import logging
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from model.validation import RangeValidator
+
+NAMES = ["a", "b", "c"]
+
+
+def make_validator(config=None):
+    return RangeValidator(NAMES, [0.0, -1.0, 10.0], [1.0, 1.0, 20.0], config)
+
+
+def test_out_of_range_flags_bounds_and_nan():
+    validator = make_validator()
+    x = np.array([[0.5, 0.0, 15.0], [1.5, -1.0, np.nan]])
+    assert validator.out_of_range(x).tolist() == [
+        [False, False, False],
+        [True, False, True],
+    ]
+
+
+def test_error_mode_raises_with_description():
+    validator = make_validator({"a": "error"})
+    with pytest.raises(ValueError, match=r"a=2 not in \[0, 1\]"):
+        validator.validate(np.array([2.0, 0.0, 15.0]))
+
+
+def test_warn_mode_logs_row_counts_for_batches(caplog):
+    validator = make_validator()
+    x = np.array([[0.5, 0.0, 25.0], [0.5, 0.0, 30.0], [0.5, 0.0, 15.0]])
+    with caplog.at_level(logging.WARNING, logger="model.validation"):
+        validator.validate(x)
+    assert "c=2 of 3 rows not in [10, 20]" in caplog.text
+
+
+def test_none_mode_skips_input(caplog):
+    validator = make_validator({"a": "none"})
+    with caplog.at_level(logging.WARNING, logger="model.validation"):
+        validator.validate(np.array([5.0, 0.0, 15.0]))
+    assert caplog.text == ""
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError, match="Unknown validation mode"):
+        make_validator({"a": "strict"})
+
+
+def test_set_bounds_updates_in_place():
+    validator = make_validator({"b": "error"})
+    validator.set_bounds(["b"], [2.0], [3.0])
+    validator.validate(np.array([0.5, 2.5, 15.0]))
+    with pytest.raises(ValueError):
+        validator.validate(np.array([0.5, 0.0, 15.0]))
+
+
+def test_from_variables():
+    variables = [
+        SimpleNamespace(name="a", value_range=(0.0, 1.0)),
+        SimpleNamespace(name="b", value_range=(-2.0, 2.0)),
+    ]
+    validator = RangeValidator.from_variables(variables, {"b": "error"})
+    assert validator.input_names == ["a", "b"]
+    assert validator.lower.tolist() == [0.0, -2.0]
+    assert validator.error.tolist() == [False, True]
+    assert validator.warn.tolist() == [True, False]